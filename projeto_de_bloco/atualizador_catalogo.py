@@ -0,0 +1,130 @@
+# atualizador_catalogo.py
+"""
+Atualização de preços e estoque durante o dia, com os caixas abertos.
+
+Uma thread em segundo plano refaz a raspagem (pelo cache HTTP: sem mudança
+no site é só um 304) a cada intervalo, compara o produtos.csv novo com o
+último aplicado e grava só os produtos que mudaram, em transações curtas
+(crud_produtos.aplicar_mudancas_catalogo). Os ids alterados saem do
+catálogo em memória do caixa. As mensagens dela vão pelo logger
+"atualizador_catalogo" para dados/atualizador_catalogo.log, para não
+bagunçar a tela do operador.
+
+Teste (tempo das vendas durante uma atualização grande):
+python -m medicoes.vendas_com_atualizador --produtos 20000 --mudancas 10000
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+ARQUIVO_LOG = Path(__file__).parent / "dados" / "atualizador_catalogo.log"
+CSV_PRODUTOS = Path(__file__).parent / "dados" / "produtos.csv"
+
+log = logging.getLogger("atualizador_catalogo")
+
+
+def ler_catalogo_csv(caminho: str | Path) -> dict[str, tuple[int, float]]:
+    """nome → (quantidade, preço) de um produtos.csv (a última linha de um nome vale)."""
+    from crud_produtos import _ler_csv_em_lotes, _normalizar_linha
+
+    catalogo_csv = {}
+    for lote in _ler_csv_em_lotes(caminho, 5000):
+        for linha in lote:
+            normalizada = _normalizar_linha(*linha)
+            if normalizada:
+                catalogo_csv[normalizada["nome"]] = (normalizada["quantidade"], normalizada["preco"])
+    return catalogo_csv
+
+
+def calcular_mudancas(anterior: dict[str, tuple[int, float]], novo: dict[str, tuple[int, float]]) -> list[dict]:
+    """Produtos novos e os que mudaram preço ou quantidade entre duas raspagens."""
+    mudancas = []
+    for nome, (quantidade, preco) in novo.items():
+        antes = anterior.get(nome)
+        if antes is None:
+            mudancas.append({"nome": nome, "quantidade": quantidade, "preco": preco})
+        elif antes != (quantidade, preco):
+            mudancas.append({"nome": nome, "preco": preco, "diferenca_qtd": quantidade - antes[0]})
+    return mudancas
+
+
+class AtualizadorCatalogo:
+    """Guarda o último catálogo aplicado; cada `executar` raspa, compara e aplica a diferença."""
+
+    def __init__(self, caminho_csv: str | Path = CSV_PRODUTOS, tamanho_lote: int = 100):
+        self.caminho_csv = caminho_csv
+        self.tamanho_lote = tamanho_lote
+        self.assinatura = None
+        self.aplicado: dict[str, tuple[int, float]] = {}
+        if os.path.exists(caminho_csv):
+            from commons.fontes import hash_arquivo
+            self.assinatura = hash_arquivo(caminho_csv)
+            self.aplicado = ler_catalogo_csv(caminho_csv)
+
+    def executar(self) -> dict | None:
+        """Uma rodada. Retorna as contagens de aplicar_mudancas_catalogo (None se nada mudou)."""
+        from commons.db import get_session, trava_carga
+        from commons.fontes import hash_arquivo, registrar_carga
+        from crud_produtos import FONTE_PRODUTOS, aplicar_mudancas_catalogo
+        from web_scraping import atualizar_catalogo_web
+
+        atualizar_catalogo_web(self.caminho_csv, intervalo=timedelta(0), avisar=log.info)
+        if not os.path.exists(self.caminho_csv):
+            return None
+        # compara com o último aplicado, não com a raspagem anterior: se uma rodada
+        # falhou no meio, a seguinte aplica de novo o que faltou
+        assinatura = hash_arquivo(self.caminho_csv)
+        if assinatura == self.assinatura:
+            log.info("Catálogo sem mudança desde a última atualização.")
+            return None
+
+        novo = ler_catalogo_csv(self.caminho_csv)
+        mudancas = calcular_mudancas(self.aplicado, novo)
+        contagem = aplicar_mudancas_catalogo(mudancas, self.tamanho_lote)
+
+        # o próximo boot não reimporta este CSV (o que sobrescreveria o estoque vendido)
+        with trava_carga, get_session() as session:
+            registrar_carga(session, FONTE_PRODUTOS, assinatura)
+            session.commit()
+        self.assinatura, self.aplicado = assinatura, novo
+
+        log.info(f"Catálogo atualizado: {contagem['atualizados']} alterados, {contagem['inseridos']} novos "
+                 f"em {contagem['lotes']} transações (maior: {contagem['maior_transacao_ms']:.1f} ms).")
+        return contagem
+
+
+def _log_em_arquivo(arquivo_log: str | Path) -> None:
+    """Manda o logger do atualizador para o arquivo (uma vez por arquivo), e não para a tela."""
+    caminho = os.path.abspath(arquivo_log)
+    if any(isinstance(h, logging.FileHandler) and h.baseFilename == caminho for h in log.handlers):
+        return
+    handler = logging.FileHandler(caminho, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def iniciar_atualizador(intervalo_segundos: float = 1800.0, caminho_csv: str | Path = CSV_PRODUTOS,
+                        arquivo_log: str | Path = ARQUIVO_LOG) -> threading.Event:
+    """
+    Sobe uma thread daemon que atualiza o catálogo a cada intervalo.
+    Retorna um Event: chamar .set() nele para o atualizador.
+    """
+    parar = threading.Event()
+    _log_em_arquivo(arquivo_log)
+
+    def _loop():
+        atualizador = AtualizadorCatalogo(caminho_csv)
+        while not parar.wait(intervalo_segundos):
+            try:
+                atualizador.executar()
+            except Exception as e:
+                log.error(f"Erro ao atualizar o catálogo: {e}")
+
+    threading.Thread(target=_loop, name="atualizador-catalogo", daemon=True).start()
+    return parar
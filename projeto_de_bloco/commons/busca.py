@@ -0,0 +1,24 @@
+# busca.py
+"""
+Busca de produtos pelo nome (tabela FTS5 produtos_busca, criada pelas
+migrações e mantida por triggers).
+
+O texto digitado vira uma consulta FTS5 em que cada palavra casa pelo
+começo ("choc amarg" acha "Chocolate Amargo") e sem acento nem maiúscula
+("po" acha "Pó"). Os resultados vêm ordenados pela relevância (bm25), a não
+ser que as palavras casem com nomes demais (crud_produtos.buscar_produtos).
+
+Teste (FTS5 x LIKE '%palavra%' num catálogo grande):
+python -m medicoes.busca_nome --produtos 1000000
+"""
+from __future__ import annotations
+
+import re
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def consulta_fts(texto: str) -> str:
+    """Texto do operador → consulta FTS5 (palavras entre aspas, com *). Vazio se não há palavra."""
+    # as aspas impedem que o que foi digitado seja lido como operador (AND, NEAR, -...)
+    return " ".join(f'"{palavra}"*' for palavra in _PALAVRA.findall(texto))
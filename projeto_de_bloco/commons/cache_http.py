@@ -0,0 +1,115 @@
+# cache_http.py
+"""
+Cache em disco para o web scraping, com requisição condicional.
+
+Guarda o corpo da última resposta de cada URL e os cabeçalhos ETag /
+Last-Modified. Na próxima busca manda If-None-Match / If-Modified-Since:
+se o servidor responder 304, devolve o corpo guardado marcado como
+`inalterada` (quem chamou pode pular o parse e a importação).
+
+Teste contra um http.server local (200 → 304 → 200):
+python -m medicoes.requisicao_condicional
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+PASTA_CACHE_HTTP = Path(__file__).resolve().parent.parent / "dados" / ".cache" / "http"
+
+
+@dataclass(slots=True)
+class RespostaHttp:
+    url: str
+    conteudo: bytes
+    inalterada: bool          # True quando veio 304 e o conteudo é o do cache
+    bytes_baixados: int
+    segundos: float
+
+
+class CacheHttp:
+    def __init__(self, pasta: str | Path = PASTA_CACHE_HTTP):
+        self.pasta = Path(pasta)
+        self.requisicoes = 0
+        self.respostas_304 = 0
+        self.bytes_baixados = 0
+        self.bytes_economizados = 0
+        self.segundos_economizados = 0.0
+        self._lock = threading.Lock()   # contadores (o motor_scraping busca de várias threads)
+
+    def _arquivos(self, url: str) -> tuple[Path, Path]:
+        chave = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.pasta / f"{chave}.corpo", self.pasta / f"{chave}.json"
+
+    def _ler(self, url: str) -> tuple[dict, bytes] | None:
+        corpo, meta = self._arquivos(url)
+        try:
+            return json.loads(meta.read_text(encoding="utf-8")), corpo.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _gravar(self, url: str, conteudo: bytes, cabecalhos, segundos: float) -> None:
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        corpo, meta = self._arquivos(url)
+        # grava em arquivo temporário e troca: um processo caindo no meio não deixa cache pela metade
+        for destino, dados in (
+            (corpo, conteudo),
+            (meta, json.dumps({
+                "url": url,
+                "etag": cabecalhos.get("ETag"),
+                "last_modified": cabecalhos.get("Last-Modified"),
+                "tamanho": len(conteudo),
+                "segundos_download": segundos,
+            }).encode("utf-8")),
+        ):
+            temporario = destino.with_suffix(destino.suffix + ".tmp")
+            temporario.write_bytes(dados)
+            os.replace(temporario, destino)
+
+    def buscar(self, url: str, timeout: float = 10, forcar: bool = False) -> RespostaHttp:
+        """
+        GET condicional. Com `forcar`, baixa de novo mesmo tendo cache.
+        Erros de rede (requests.exceptions.RequestException) sobem para quem chamou.
+        """
+        import requests
+
+        guardado = None if forcar else self._ler(url)
+        cabecalhos = {}
+        if guardado:
+            meta, _ = guardado
+            if meta.get("etag"):
+                cabecalhos["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                cabecalhos["If-Modified-Since"] = meta["last_modified"]
+
+        t0 = time.perf_counter()
+        resposta = requests.get(url, headers=cabecalhos, timeout=timeout)
+        segundos = time.perf_counter() - t0
+        with self._lock:
+            self.requisicoes += 1
+            self.bytes_baixados += len(resposta.content)
+
+        if resposta.status_code == 304 and guardado:
+            meta, conteudo = guardado
+            with self._lock:
+                self.respostas_304 += 1
+                self.bytes_economizados += len(conteudo)
+                self.segundos_economizados += max(0.0, meta.get("segundos_download", 0.0) - segundos)
+            return RespostaHttp(url, conteudo, True, len(resposta.content), segundos)
+
+        resposta.raise_for_status()
+        self._gravar(url, resposta.content, resposta.headers, segundos)
+        return RespostaHttp(url, resposta.content, False, len(resposta.content), segundos)
+
+    def resumo(self) -> str:
+        return (
+            f"{self.requisicoes} requisições ({self.respostas_304} sem mudança/304), "
+            f"{self.bytes_baixados} bytes transferidos, {self.bytes_economizados} bytes e "
+            f"~{self.segundos_economizados:.2f}s poupados pelo cache"
+        )
+
@@ -0,0 +1,66 @@
+# carrinho.py
+from __future__ import annotations
+
+import uuid
+from typing import Iterator
+
+
+class ItemCarrinho:
+    """Uma linha do carrinho: o mesmo produto passado várias vezes vira uma linha só."""
+    __slots__ = ("id_produto", "nome", "preco", "quantidade")
+
+    def __init__(self, id_produto: int, nome: str, preco: float, quantidade: int = 0):
+        self.id_produto = id_produto
+        self.nome = nome
+        self.preco = preco
+        self.quantidade = quantidade
+
+    @property
+    def total(self) -> float:
+        return self.preco * self.quantidade
+
+    def __repr__(self):
+        return f"<ItemCarrinho(produto={self.id_produto}, qtd={self.quantidade}, preco={self.preco:.2f})>"
+
+
+class Carrinho:
+    """
+    Carrinho do atendimento no caixa. As linhas ficam por id_produto, na
+    ordem em que cada produto foi passado pela primeira vez, e o total é
+    somado a cada item (não recalculado no fim).
+    O preço de uma linha é o da primeira passada do produto.
+    """
+    __slots__ = ("id", "_itens", "total")
+
+    def __init__(self, id_carrinho: str | None = None):
+        self.id = id_carrinho or uuid.uuid4().hex   # chave das reservas de estoque
+        self._itens: dict[int, ItemCarrinho] = {}
+        self.total = 0.0
+
+    def adicionar(self, id_produto: int, nome: str, preco: float, quantidade: int) -> ItemCarrinho:
+        item = self._itens.get(id_produto)
+        if item is None:
+            item = self._itens[id_produto] = ItemCarrinho(id_produto, nome, preco)
+        item.quantidade += quantidade
+        self.total += item.preco * quantidade
+        return item
+
+    def quantidade_de(self, id_produto: int) -> int:
+        item = self._itens.get(id_produto)
+        return item.quantidade if item else 0
+
+    def itens_para_registro(self) -> list[dict]:
+        """Formato que o registrar_venda / efetivar_venda recebem."""
+        return [
+            {'id_produto': i.id_produto, 'quantidade': i.quantidade, 'preco': i.preco}
+            for i in self._itens.values()
+        ]
+
+    def __iter__(self) -> Iterator[ItemCarrinho]:
+        return iter(self._itens.values())
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def __bool__(self) -> bool:
+        return bool(self._itens)
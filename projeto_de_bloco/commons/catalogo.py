@@ -0,0 +1,184 @@
+# catalogo.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable
+
+
+@dataclass(frozen=True, slots=True)
+class ProdutoCatalogo:
+    """Cópia leve de um Produto (sem sessão, sem relacionamentos) usada no caixa."""
+    id: int
+    nome: str
+    preco: float
+    quantidade: int
+
+    @classmethod
+    def de_produto(cls, produto) -> ProdutoCatalogo:
+        return cls(id=produto.id, nome=produto.nome, preco=produto.preco, quantidade=produto.quantidade)
+
+
+class CatalogoCache:
+    """
+    Cache read-through de produtos por id, com limite de itens (LRU)
+    e contadores de acerto/falha. Quem escreve em produtos avisa o cache.
+
+    A leitura do banco numa falha roda fora do lock. Se o produto for
+    invalidado/ajustado/atualizado enquanto ela roda, o que ela leu pode ser
+    de antes da escrita: o resultado volta para quem pediu, mas não entra no
+    cache (a próxima leitura busca de novo).
+    """
+
+    def __init__(self, max_itens: int = 10_000):
+        self.max_itens = max_itens
+        self.hits = 0
+        self.misses = 0
+        self._itens: OrderedDict[int, ProdutoCatalogo] = OrderedDict()
+        self._lock = Lock()
+        self._em_carga: dict[int, int] = {}   # id → leituras do banco em andamento
+        self._vencidos: set[int] = set()       # ids escritos durante uma dessas leituras
+        self._geracao = 0                      # muda a cada limpar()
+
+    def obter(self, produto_id: int, carregar: Callable[[int], ProdutoCatalogo | None]) -> ProdutoCatalogo | None:
+        with self._lock:
+            produto = self._itens.get(produto_id)
+            if produto is not None:
+                self._itens.move_to_end(produto_id)
+                self.hits += 1
+                return produto
+            self.misses += 1
+            self._em_carga[produto_id] = self._em_carga.get(produto_id, 0) + 1
+            geracao = self._geracao
+
+        # Busca fora do lock pra não segurar os outros caixas durante o SELECT
+        produto = None
+        try:
+            produto = carregar(produto_id)
+        finally:
+            with self._lock:
+                vencido = produto_id in self._vencidos or geracao != self._geracao
+                restantes = self._em_carga.pop(produto_id) - 1
+                if restantes:
+                    self._em_carga[produto_id] = restantes
+                else:
+                    self._vencidos.discard(produto_id)
+                if produto is not None and not vencido:
+                    self._guardar(produto)
+        return produto
+
+    def _guardar(self, produto: ProdutoCatalogo) -> None:
+        self._itens[produto.id] = produto
+        self._itens.move_to_end(produto.id)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def _escrito(self, produto_id: int) -> None:
+        # leitura em andamento deste id começou antes da escrita: não entra no cache
+        if produto_id in self._em_carga:
+            self._vencidos.add(produto_id)
+
+    def atualizar(self, produto: ProdutoCatalogo) -> None:
+        with self._lock:
+            self._escrito(produto.id)
+            self._guardar(produto)
+
+    def ajustar_estoque(self, produto_id: int, diferenca_qtd: int) -> None:
+        """Aplica uma baixa/entrada já gravada no banco, sem precisar reler o produto."""
+        with self._lock:
+            self._escrito(produto_id)
+            produto = self._itens.get(produto_id)
+            if produto is not None:
+                nova_qtd = max(0, produto.quantidade + diferenca_qtd)
+                self._itens[produto_id] = replace(produto, quantidade=nova_qtd)
+
+    def invalidar(self, produto_id: int) -> None:
+        with self._lock:
+            self._escrito(produto_id)
+            self._itens.pop(produto_id, None)
+
+    def invalidar_varios(self, ids) -> None:
+        with self._lock:
+            for produto_id in ids:
+                self._escrito(produto_id)
+                self._itens.pop(produto_id, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": (self.hits / total) if total else 0.0,
+            }
+
+
+catalogo = CatalogoCache()
+
+
+class IndiceCodigos:
+    """
+    codigo_barras → id do produto, com todos os códigos em memória (um dict).
+    Carregado de uma vez (carregar); código que não está nele (cadastrado por
+    outro caixa depois da carga) é procurado no banco e acrescentado.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._ids: dict[str, int] | None = None
+        self._lock = Lock()
+
+    @property
+    def carregado(self) -> bool:
+        return self._ids is not None
+
+    def carregar(self, pares) -> None:
+        """Substitui o índice pelos pares (codigo, id)."""
+        ids = dict(pares)
+        with self._lock:
+            self._ids = ids
+
+    def obter(self, codigo: str, carregar: Callable[[str], int | None]) -> int | None:
+        # leitura sem lock: o dict só é trocado inteiro ou recebe chaves novas
+        ids = self._ids
+        if ids is not None:
+            produto_id = ids.get(codigo)
+            if produto_id is not None:
+                self.hits += 1
+                return produto_id
+        self.misses += 1
+        produto_id = carregar(codigo)
+        if produto_id is not None:
+            self.definir(codigo, produto_id)
+        return produto_id
+
+    def definir(self, codigo: str, produto_id: int) -> None:
+        with self._lock:
+            if self._ids is not None:
+                self._ids[codigo] = produto_id
+
+    def remover(self, codigo: str | None) -> None:
+        with self._lock:
+            if self._ids is not None and codigo:
+                self._ids.pop(codigo, None)
+
+    def limpar(self) -> None:
+        """Descarta o índice (recarregado na próxima leitura)."""
+        with self._lock:
+            self._ids = None
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"codigos": len(self._ids or {}), "hits": self.hits, "misses": self.misses}
+
+
+codigos = IndiceCodigos()
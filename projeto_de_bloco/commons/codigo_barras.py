@@ -0,0 +1,40 @@
+# codigo_barras.py
+"""
+Códigos de barras EAN-13 dos produtos.
+
+Os códigos vêm do produtos.csv (coluna opcional `codigo_barras`) ou são
+gerados pela loja para quem não tem: prefixo 20 (faixa de circulação
+restrita, uso interno) + id do produto com 10 dígitos + dígito verificador
+(python main.py --atribuir-codigos).
+
+No caixa o código lido é resolvido pelo índice em memória (IndiceCodigos,
+em commons.catalogo), sem ir ao banco.
+
+Teste (leitura pelo índice em memória x SELECT no índice único):
+python -m medicoes.leitura_codigos --produtos 50000
+"""
+from __future__ import annotations
+
+PREFIXO_INTERNO = "20"
+
+
+def digito_verificador(doze_digitos: str) -> int:
+    """Dígito verificador EAN-13: pesos 1 e 3 alternados da esquerda para a direita."""
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(doze_digitos))
+    return (10 - soma % 10) % 10
+
+
+def ean13_valido(codigo: str) -> bool:
+    return len(codigo) == 13 and codigo.isdigit() and digito_verificador(codigo[:12]) == int(codigo[12])
+
+
+def normalizar_codigo(texto: str | None) -> str | None:
+    """Código EAN-13 limpo (sem espaços), ou None se vazio ou inválido."""
+    codigo = "".join((texto or "").split())
+    return codigo if ean13_valido(codigo) else None
+
+
+def codigo_interno(id_produto: int) -> str:
+    """EAN-13 da loja para o produto: 20 + id com 10 dígitos + verificador."""
+    doze = f"{PREFIXO_INTERNO}{id_produto:010d}"
+    return doze + str(digito_verificador(doze))
@@ -1,24 +1,321 @@
 # db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""
+Engine/sessões do banco e o perfil de armazenamento (PRAGMAs do SQLite).
+
+O banco e o perfil vêm, nesta ordem de prioridade, das variáveis de ambiente
+MERCADO_DB_URL / MERCADO_DB_PERFIL, do arquivo dados/banco.json e dos
+padrões abaixo (dados/mercado_sqlalchemy.db, perfil "durable"). Exemplo de
+banco.json (caminho relativo à pasta do projeto; "pragmas" sobrepõe valores
+do perfil):
+
+    {"url": "sqlite:///dados/mercado_sqlalchemy.db", "perfil": "fast-lane",
+     "pragmas": {"cache_size": -65536}}
+
+Relatórios e consultas do SIG usam get_read_session(): um segundo engine,
+somente leitura (mode=ro + query_only), com o perfil "analytics". Com WAL
+essas leituras não seguram o lock de escrita nem disputam as conexões do
+caixa. Por padrão o engine de leitura abre o mesmo arquivo do banco
+principal; MERCADO_DB_URL_LEITURA / "url_leitura" apontam para outro (uma
+cópia, por exemplo) e vazio manda as leituras para o engine principal.
+"perfil_leitura" troca o perfil.
+
+Uma ação inteira (atendimento, opção do SIG) roda dentro de
+unidade_de_trabalho(): os get_session()/get_read_session() de dentro dela
+reaproveitam a mesma sessão. contar_consultas() mede quantos comandos SQL e
+conexões uma ação usa.
+
+Teste de commits/s de cada perfil: python -m medicoes.perfis_banco --vendas 2000
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from urllib.parse import quote
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from contextlib import contextmanager
+from contextvars import ContextVar
 
 Base = declarative_base()
 
-DATABASE_URL = "sqlite:///dados/mercado_sqlalchemy.db"
+PASTA_PROJETO = Path(__file__).resolve().parent.parent
+CAMINHO_BANCO = PASTA_PROJETO / "dados" / "mercado_sqlalchemy.db"
+ARQUIVO_CONFIG = PASTA_PROJETO / "dados" / "banco.json"
+
+_VALORES_TEXTO = {
+    "journal_mode": {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+@dataclass(frozen=True)
+class PerfilArmazenamento:
+    """PRAGMAs aplicados em cada conexão nova."""
+    journal_mode: str = "WAL"      # WAL deixa vários caixas lerem enquanto um grava
+    synchronous: str = "FULL"      # FULL: fsync a cada commit; NORMAL (com WAL): só nos checkpoints
+    cache_size: int = -8_000       # páginas em cache; negativo = KiB
+    mmap_size: int = 0             # bytes lidos por mmap (0 desliga)
+    busy_timeout: int = 5_000      # ms que uma conexão espera quando outro caixa está gravando
+    temp_store: str = "DEFAULT"    # MEMORY: ordenações/agrupamentos temporários em memória
+
+    def __post_init__(self):
+        # os valores vão direto no texto do PRAGMA: só passa o que o SQLite aceita
+        for campo in fields(self):
+            valor = getattr(self, campo.name)
+            if campo.name in _VALORES_TEXTO:
+                valor = str(valor).upper()
+                if valor not in _VALORES_TEXTO[campo.name]:
+                    raise ValueError(f"Valor inválido para {campo.name}: {getattr(self, campo.name)!r}")
+            else:
+                valor = int(valor)
+            object.__setattr__(self, campo.name, valor)
+
+    def aplicar(self, dbapi_conn, somente_leitura: bool = False) -> None:
+        cursor = dbapi_conn.cursor()
+        for campo in fields(self):
+            # quem decide o journal_mode é o engine que grava; mudar exige escrita
+            if somente_leitura and campo.name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {campo.name}={getattr(self, campo.name)}")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+PERFIS = {
+    # cada venda confirmada sobrevive a queda de energia
+    "durable": PerfilArmazenamento(),
+    # caixa: com WAL, NORMAL não corrompe o banco, mas uma queda de energia
+    # (não do programa) pode perder as últimas vendas antes do checkpoint
+    "fast-lane": PerfilArmazenamento(synchronous="NORMAL", cache_size=-32_000, mmap_size=256 * 2**20,
+                                     temp_store="MEMORY"),
+    # SIG/relatórios: cache e mmap grandes para varrer tabelas, espera mais pelo lock
+    "analytics": PerfilArmazenamento(synchronous="NORMAL", cache_size=-256_000, mmap_size=2**30,
+                                     busy_timeout=30_000, temp_store="MEMORY"),
+}
+PERFIL_PADRAO = "durable"
+PERFIL_LEITURA_PADRAO = "analytics"
+
+
+def _ler_config(arquivo: str | Path) -> dict:
+    try:
+        return json.loads(Path(arquivo).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def _resolver_url(url: str) -> str:
+    # caminho relativo do arquivo de configuração é relativo à pasta do projeto,
+    # não à pasta de onde o programa foi chamado
+    banco = make_url(url).database
+    if banco and banco != ":memory:" and not banco.startswith("file:") and not os.path.isabs(banco):
+        url = make_url(url).set(database=str(PASTA_PROJETO / banco)).render_as_string(hide_password=False)
+    return url
+
+
+def _validar_perfil(nome: str) -> None:
+    if nome not in PERFIS:
+        raise ValueError(f"Perfil de armazenamento desconhecido: {nome!r} (use um de {', '.join(PERFIS)})")
+
+
+def _validar_pragmas(pragmas, arquivo: str | Path) -> dict:
+    campos = [campo.name for campo in fields(PerfilArmazenamento)]
+    if not isinstance(pragmas, dict):
+        raise ValueError(f'"pragmas" em {arquivo} deve ser um objeto (ex.: {{"cache_size": -65536}})')
+    desconhecidos = sorted(set(pragmas) - set(campos))
+    if desconhecidos:
+        raise ValueError(f"PRAGMA desconhecido em {arquivo}: {', '.join(desconhecidos)} "
+                         f"(use um de {', '.join(campos)})")
+    return pragmas
+
+
+def carregar_configuracao(arquivo: str | Path = ARQUIVO_CONFIG) -> tuple[str, str, PerfilArmazenamento]:
+    """(url do banco, nome do perfil, perfil com os ajustes do arquivo)."""
+    config = _ler_config(arquivo)
+
+    url = os.environ.get("MERCADO_DB_URL") or _resolver_url(config.get("url") or f"sqlite:///{CAMINHO_BANCO}")
+
+    nome = os.environ.get("MERCADO_DB_PERFIL") or config.get("perfil") or PERFIL_PADRAO
+    _validar_perfil(nome)
+    return url, nome, replace(PERFIS[nome], **_validar_pragmas(config.get("pragmas", {}), arquivo))
+
+
+def url_somente_leitura(url: str) -> str | None:
+    """A mesma base SQLite aberta como URI mode=ro; None se não for um arquivo SQLite."""
+    endereco = make_url(url)
+    banco = endereco.database
+    if endereco.get_backend_name() != "sqlite" or not banco or banco == ":memory:" or banco.startswith("file:"):
+        return None
+    return endereco.set(database=f"file:{quote(banco)}",
+                        query={**endereco.query, "mode": "ro", "uri": "true"}).render_as_string(hide_password=False)
+
+
+def carregar_configuracao_leitura(url_principal: str,
+                                  arquivo: str | Path = ARQUIVO_CONFIG) -> tuple[str | None, str, PerfilArmazenamento]:
+    """
+    (url do engine de leitura, nome do perfil, perfil). Url None = leituras
+    vão para o engine principal (url_leitura vazia ou banco que não é arquivo).
+    """
+    config = _ler_config(arquivo)
+
+    if "MERCADO_DB_URL_LEITURA" in os.environ:
+        url = os.environ["MERCADO_DB_URL_LEITURA"]
+    elif "url_leitura" in config and not os.environ.get("MERCADO_DB_URL"):
+        # com MERCADO_DB_URL (testes, banco temporário) a leitura segue o banco dele
+        url = config["url_leitura"] and _resolver_url(config["url_leitura"])
+    else:
+        url = url_somente_leitura(url_principal)
+
+    nome = config.get("perfil_leitura") or PERFIL_LEITURA_PADRAO
+    _validar_perfil(nome)
+    return url or None, nome, PERFIS[nome]
+
+
+def criar_engine(url: str, perfil: PerfilArmazenamento, somente_leitura: bool = False) -> Engine:
+    novo = create_engine(url, echo=False, future=True)
+
+    @event.listens_for(novo, "connect")
+    def _configurar_sqlite(dbapi_conn, _record):
+        perfil.aplicar(dbapi_conn, somente_leitura)
+
+    return novo
+
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+try:
+    DATABASE_URL, NOME_PERFIL, PERFIL = carregar_configuracao()
+    DATABASE_URL_LEITURA, NOME_PERFIL_LEITURA, PERFIL_LEITURA = carregar_configuracao_leitura(DATABASE_URL)
+except ValueError as erro:
+    # configuração errada: a mensagem, sem traceback, e o programa não sobe
+    raise SystemExit(f"Configuração do banco inválida: {erro}")
+
+engine = criar_engine(DATABASE_URL, PERFIL)
+
+# Sem url de leitura, os relatórios dividem o engine principal
+engine_leitura = criar_engine(DATABASE_URL_LEITURA, PERFIL_LEITURA, somente_leitura=True) \
+    if DATABASE_URL_LEITURA else engine
+
+# As cargas do boot rodam em paralelo (commons/inicio.py); só as gravações
+# delas passam por aqui, uma de cada vez, em vez de disputarem o lock do SQLite
+trava_carga = threading.Lock()
 
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+ReadSessionLocal = sessionmaker(bind=engine_leitura, expire_on_commit=False, future=True)
 
 def init_db():
-    from commons.models import Cliente, Produto 
+    from commons import models  # registra todas as tabelas no Base
+    from commons.migracoes import migrar
     Base.metadata.create_all(bind=engine)
+    migrar(engine)
+
+# ---------------------------------------------------------------------------
+# Unidade de trabalho: uma ação inteira (um atendimento no caixa, uma opção do
+# SIG) dividindo a mesma sessão, em vez de uma sessão por função do crud_*.
+
+_unidade_atual: ContextVar[dict | None] = ContextVar("unidade_atual", default=None)
+
 
 @contextmanager
-def get_session():
-    db = SessionLocal()
+def unidade_de_trabalho():
+    """
+    Dentro do `with`, get_session() e get_read_session() devolvem sempre a
+    mesma sessão (uma de escrita e uma de leitura, abertas só se usadas):
+    um mapa de identidade e uma conexão do pool para a ação inteira.
+    Cada função do crud_* continua dando o próprio commit. Uma unidade
+    aberta dentro de outra só junta na de fora. Depois de um rollback os
+    objetos da ação são relidos do banco se usados dentro dela; fora do
+    `with` eles ficam desligados da sessão.
+    """
+    if _unidade_atual.get() is not None:
+        yield
+        return
+    sessoes: dict = {}
+    token = _unidade_atual.set(sessoes)
+    try:
+        yield
+    finally:
+        _unidade_atual.reset(token)
+        for db in sessoes.values():
+            db.close()
+
+
+def _descartar_pendente(db: Session) -> None:
+    # o que um bloco deixou sem commit (saiu no meio, deu erro) é descartado ao
+    # fim dele, como quando cada bloco tinha a própria sessão; o que foi lido
+    # continua no mapa de identidade para os próximos blocos
+    if db.new or db.dirty or db.deleted:
+        db.rollback()
+    elif db.in_transaction() and db.connection().connection.dbapi_connection.in_transaction:
+        db.rollback()
+
+
+@contextmanager
+def _sessao(fabrica: sessionmaker):
+    sessoes = _unidade_atual.get()
+    if sessoes is None:
+        db = fabrica()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+
+    db = sessoes.get(fabrica)
+    if db is None:
+        db = sessoes[fabrica] = fabrica()
     try:
         yield db
     finally:
-        db.close()
+        _descartar_pendente(db)
+
+
+def get_session():
+    """Sessão no engine principal (a da unidade de trabalho, se houver uma aberta)."""
+    return _sessao(SessionLocal)
+
+
+def get_read_session():
+    """Sessão para relatórios/consultas: não grava (query_only) e não ocupa o engine do caixa."""
+    return _sessao(ReadSessionLocal)
+
+
+# ---------------------------------------------------------------------------
+# Contagem de comandos SQL e de conexões tiradas do pool
+
+@dataclass
+class ContadorConsultas:
+    consultas: int = 0
+    conexoes: int = 0
+
+
+_contador_atual: ContextVar[ContadorConsultas | None] = ContextVar("contador_atual", default=None)
+
+
+@contextmanager
+def contar_consultas():
+    """Conta o SQL emitido (nos dois engines) pela thread atual dentro do `with`."""
+    contador = ContadorConsultas()
+    token = _contador_atual.set(contador)
+    try:
+        yield contador
+    finally:
+        _contador_atual.reset(token)
+
+
+def _contar_consulta(*_args):
+    contador = _contador_atual.get()
+    if contador is not None:
+        contador.consultas += 1
+
+
+def _contar_conexao(*_args):
+    contador = _contador_atual.get()
+    if contador is not None:
+        contador.conexoes += 1
+
+
+for _engine in {engine, engine_leitura}:
+    event.listen(_engine, "before_cursor_execute", _contar_consulta)
+    event.listen(_engine, "checkout", _contar_conexao)
@@ -0,0 +1,40 @@
+# fontes.py
+"""
+Manifesto do boot: assinatura dos arquivos de dados iniciais (planilhas, CSV, JSON).
+
+Cada loader guarda em `cargas_fonte` a assinatura e a hora do que carregou;
+no boot seguinte, se a assinatura não mudou, a carga é pulada. O web
+scraping, que não tem arquivo de entrada, usa a hora da última raspagem.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from commons.models import CargaFonte
+
+
+def hash_arquivo(caminho: str | Path) -> str:
+    """sha256 do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def ultima_carga(session: Session, fonte: str) -> CargaFonte | None:
+    return session.get(CargaFonte, fonte)
+
+
+def assinatura_registrada(session: Session, fonte: str) -> str | None:
+    carga = ultima_carga(session, fonte)
+    return carga.assinatura if carga else None
+
+
+def registrar_carga(session: Session, fonte: str, assinatura: str) -> None:
+    """Grava a assinatura da carga (sem commit: entra na transação da própria carga)."""
+    session.merge(CargaFonte(fonte=fonte, assinatura=assinatura, carregado_em=datetime.now()))
@@ -0,0 +1,100 @@
+# inicio.py
+"""
+Etapas do boot e relatório de inicialização (python main.py --relatorio-inicio).
+
+executar_etapas roda as cargas iniciais num pool de threads, cada uma assim
+que as etapas de que depende terminam: raspagem, leitura do JSON e da
+planilha acontecem ao mesmo tempo. As gravações no banco continuam uma de
+cada vez (commons.db.trava_carga).
+
+O relatório mostra quanto levaram os imports e cada etapa, se a etapa rodou
+ou foi pulada pelo manifesto (commons/fontes.py), e quais dependências
+pesadas chegaram a ser importadas. Para o detalhe módulo a módulo:
+python -X importtime main.py
+"""
+from __future__ import annotations
+
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+# Só devem aparecer carregadas quando o boot precisou raspar/reimportar
+MODULOS_PESADOS = ("pandas", "requests", "bs4", "openpyxl")
+
+
+@dataclass(frozen=True)
+class Etapa:
+    nome: str
+    funcao: Callable[[], object]
+    depende_de: tuple[str, ...] = ()
+
+
+class RelatorioInicio:
+    def __init__(self, inicio: float, fim_imports: float):
+        self.inicio = inicio
+        self.fim_imports = fim_imports
+        # (nome, situação, início relativo ao boot, duração)
+        self.etapas: list[tuple[str, str, float, float]] = []
+
+    def medir(self, nome: str, funcao: Callable, *args, **kwargs):
+        """Roda uma etapa do boot anotando o tempo. Retornar False marca a etapa como pulada."""
+        t0 = time.perf_counter()
+        situacao = "erro"
+        try:
+            resultado = funcao(*args, **kwargs)
+            situacao = "pulada" if resultado is False else "executada"
+            return resultado
+        finally:
+            self.etapas.append((nome, situacao, t0 - self.inicio, time.perf_counter() - t0))
+
+    def imprimir(self) -> None:
+        from tabulate import tabulate
+
+        agora = time.perf_counter()
+        tabela = [["imports do sistema", "", 0, f"{(self.fim_imports - self.inicio) * 1000:.0f}"]]
+        tabela += [
+            [nome, situacao, f"{inicio * 1000:.0f}", f"{segundos * 1000:.0f}"]
+            for nome, situacao, inicio, segundos in self.etapas
+        ]
+        tabela.append(["total até o menu", "", "", f"{(agora - self.inicio) * 1000:.0f}"])
+
+        print("\n---- Relatório de inicialização ----")
+        print(tabulate(tabela, headers=["Etapa", "Situação", "Início (ms)", "Tempo (ms)"], tablefmt="fancy_grid"))
+        carregados = [m for m in MODULOS_PESADOS if m in sys.modules]
+        print("Dependências pesadas importadas:", ", ".join(carregados) if carregados else "nenhuma")
+
+
+def executar_etapas(etapas: list[Etapa], relatorio: RelatorioInicio, max_threads: int = 4) -> None:
+    """
+    Roda as etapas em paralelo respeitando as dependências e imprime o tempo
+    de cada uma ao terminar. Uma etapa que falha não impede as seguintes
+    (os loaders já avisam o erro e o sistema abre com o que tiver no banco).
+    """
+    pendentes = {etapa.nome: etapa for etapa in etapas}
+    faltando = {d for etapa in etapas for d in etapa.depende_de} - pendentes.keys()
+    if faltando:
+        raise ValueError(f"Etapas de boot inexistentes: {sorted(faltando)}")
+
+    concluidas: set[str] = set()
+    rodando = {}
+
+    with ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="boot") as pool:
+        while pendentes or rodando:
+            for nome, etapa in list(pendentes.items()):
+                if concluidas.issuperset(etapa.depende_de):
+                    rodando[pool.submit(relatorio.medir, nome, etapa.funcao)] = nome
+                    del pendentes[nome]
+
+            if not rodando:
+                raise ValueError(f"Dependência circular entre as etapas de boot: {sorted(pendentes)}")
+
+            prontas, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in prontas:
+                nome = rodando.pop(futuro)
+                concluidas.add(nome)
+                if futuro.exception():
+                    print(f"Erro na etapa '{nome}' do boot: {futuro.exception()}")
+                _, situacao, _, segundos = next(e for e in reversed(relatorio.etapas) if e[0] == nome)
+                print(f"[boot] {nome}: {situacao} em {segundos * 1000:.0f} ms")
@@ -0,0 +1,43 @@
+# medicao.py
+"""
+O que os testes de medicoes/ dividem: o banco temporário em que rodam
+(nunca o banco de verdade) e o resumo dos tempos medidos.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def banco_temporario(prefixo: str, pasta: str | None = None, arquivo: str = "teste.db") -> Iterator[str]:
+    """
+    Pasta temporária (dentro de `pasta`, se dada) com MERCADO_DB_URL apontando
+    para um banco novo nela. commons.db lê a variável ao criar o engine, então
+    isto vem antes do primeiro import dele (e dos crud_*). No fim fecha os
+    engines e apaga a pasta.
+    """
+    if "commons.db" in sys.modules:
+        raise RuntimeError("commons.db já foi importado: o teste abriria o banco de verdade")
+    with tempfile.TemporaryDirectory(prefix=prefixo, dir=pasta) as temporaria:
+        os.environ["MERCADO_DB_URL"] = f"sqlite:///{os.path.join(temporaria, arquivo)}"
+        try:
+            yield temporaria
+        finally:
+            db = sys.modules.get("commons.db")
+            if db is not None:
+                db.engine_leitura.dispose()
+                db.engine.dispose()
+
+
+def percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0.0
+
+
+def resumo_tempos(tempos: list[float]) -> dict:
+    """p50, p99 e máximo de uma lista de tempos (na unidade em que vieram)."""
+    return {"p50": percentil(tempos, 0.5), "p99": percentil(tempos, 0.99), "maximo": max(tempos, default=0.0)}
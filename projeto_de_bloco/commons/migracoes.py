@@ -0,0 +1,133 @@
+# migracoes.py
+"""
+Versão do schema guardada no próprio arquivo do banco (PRAGMA user_version).
+
+O create_all só cria tabelas que não existem. Bancos antigos passam por aqui:
+cada passo de MIGRACOES roda uma vez só, na ordem, e no fim o banco é marcado
+com SCHEMA_VERSAO. Ao acrescentar colunas/índices em tabelas que já existiam
+nos modelos, acrescente um passo com o DDL só dessa versão (o passo não lê os
+modelos: eles mudam depois, o passo não). Um banco novo também passa por
+todos os passos, por isso cada um tolera o que o create_all já criou.
+python verificar_migracoes.py confere um banco antigo contra um novo.
+"""
+from sqlalchemy.engine import Connection, Engine
+
+
+def _adicionar_coluna(conn: Connection, tabela: str, coluna: str, tipo: str) -> None:
+    """ALTER TABLE ... ADD COLUMN, se a coluna ainda não existe (banco novo já nasce com ela)."""
+    existentes = {linha[1] for linha in conn.exec_driver_sql(f"PRAGMA table_info({tabela})")}
+    if coluna not in existentes:
+        conn.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+
+def _criar_indice(conn: Connection, nome: str, tabela: str, colunas: str, unico: bool = False) -> None:
+    unique = "UNIQUE " if unico else ""
+    conn.exec_driver_sql(f"CREATE {unique}INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})")
+
+
+def _turnos_reservas_paginacao(conn: Connection) -> None:
+    """Venda ligada ao turno do caixa, paginação de vendas e índices das reservas de estoque."""
+    _adicionar_coluna(conn, "vendas", "id_turno", "INTEGER")
+    _criar_indice(conn, "ix_vendas_data_hora_id", "vendas", "data_hora, id")
+    _criar_indice(conn, "ix_vendas_cliente_data_hora_id", "vendas", "id_cliente, data_hora, id")
+    _criar_indice(conn, "ix_reservas_produto_expira", "reservas_estoque", "id_produto, expira_em, id_carrinho, quantidade")
+    _criar_indice(conn, "ix_reservas_carrinho", "reservas_estoque", "id_carrinho")
+    _criar_indice(conn, "ix_reservas_expira", "reservas_estoque", "expira_em")
+
+
+def _indices_consultas_quentes(conn: Connection) -> None:
+    """Índices de FK/filtros usados pelo caixa e pelo SIG + estatísticas pro planejador."""
+    _criar_indice(conn, "ix_itens_venda_venda", "itens_venda", "id_venda, quantidade, preco_unitario")
+    _criar_indice(conn, "ix_itens_venda_produto", "itens_venda", "id_produto")
+    _criar_indice(conn, "ix_produtos_quantidade", "produtos", "quantidade, id")
+    _criar_indice(conn, "ix_produto_fornecedor_fornecedor", "produto_fornecedor", "id_fornecedor, id_produto")
+    _criar_indice(conn, "ix_vendas_turno", "vendas", "id_turno")
+    _criar_indice(conn, "ix_turnos_caixa_aberto", "turnos", "numero_caixa, fechado_em")
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _nome_produto_unico(conn: Connection) -> None:
+    """
+    O nome passa a ser a chave natural do produto (importação por upsert).
+    Nomes repetidos de bancos antigos ganham o id no final antes do índice único.
+    """
+    conn.exec_driver_sql(
+        "UPDATE produtos SET nome = nome || ' (' || id || ')' "
+        "WHERE id NOT IN (SELECT MIN(id) FROM produtos GROUP BY nome)"
+    )
+    _criar_indice(conn, "ux_produtos_nome", "produtos", "nome", unico=True)
+
+
+def _chave_venda(conn: Connection) -> None:
+    """Chave do carrinho na venda: a releitura do diário no boot não grava a venda duas vezes."""
+    _adicionar_coluna(conn, "vendas", "chave", "VARCHAR")
+    _criar_indice(conn, "ux_vendas_chave", "vendas", "chave", unico=True)
+
+
+def _codigo_barras_produto(conn: Connection) -> None:
+    """EAN-13 do produto, lido no caixa (nenhum código em dois produtos)."""
+    _adicionar_coluna(conn, "produtos", "codigo_barras", "VARCHAR")
+    _criar_indice(conn, "ux_produtos_codigo_barras", "produtos", "codigo_barras", unico=True)
+
+
+def _busca_produtos(conn: Connection) -> None:
+    """
+    Busca por nome (FTS5) sobre produtos.nome: sem acento/maiúscula, com prefixo.
+    A tabela virtual só guarda o índice (content=produtos); os triggers a
+    mantêm em dia a cada INSERT/DELETE e a cada UPDATE do nome (mudança de
+    preço/estoque não mexe nela).
+    """
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5("
+        "nome, content='produtos', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_insert AFTER INSERT ON produtos BEGIN "
+        "INSERT INTO produtos_busca(rowid, nome) VALUES (new.id, new.nome); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_delete AFTER DELETE ON produtos BEGIN "
+        "INSERT INTO produtos_busca(produtos_busca, rowid, nome) VALUES ('delete', old.id, old.nome); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_update AFTER UPDATE OF nome ON produtos BEGIN "
+        "INSERT INTO produtos_busca(produtos_busca, rowid, nome) VALUES ('delete', old.id, old.nome); "
+        "INSERT INTO produtos_busca(rowid, nome) VALUES (new.id, new.nome); END"
+    )
+    # produtos que já existiam entram no índice
+    conn.exec_driver_sql("INSERT INTO produtos_busca(produtos_busca) VALUES ('rebuild')")
+
+
+# (versão, passo) — só cresce, nunca reordene nem apague passos antigos
+MIGRACOES = [
+    (1, _turnos_reservas_paginacao),       # vendas.id_turno, paginação de vendas, reservas
+    (2, _indices_consultas_quentes),       # itens_venda, produtos.quantidade, produto_fornecedor...
+    (3, _nome_produto_unico),              # ux_produtos_nome
+    (4, _chave_venda),                     # vendas.chave + ux_vendas_chave (diário de vendas)
+    (5, _codigo_barras_produto),           # produtos.codigo_barras + ux_produtos_codigo_barras
+    (6, _busca_produtos),                  # produtos_busca (FTS5) + triggers
+]
+
+SCHEMA_VERSAO = MIGRACOES[-1][0]
+
+
+def versao_atual(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def migrar(engine: Engine) -> int:
+    """Aplica os passos pendentes numa transação. Retorna a versão final do schema."""
+    with engine.begin() as conn:
+        versao = versao_atual(conn)
+        if versao >= SCHEMA_VERSAO:
+            return versao
+
+        for numero, passo in MIGRACOES:
+            if numero > versao:
+                passo(conn)
+
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSAO}")
+        if versao:
+            print(f"Banco migrado da versão {versao} para {SCHEMA_VERSAO}.")
+        return SCHEMA_VERSAO
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, PrimaryKeyConstraint
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, PrimaryKeyConstraint, Index, DDL, event
 from sqlalchemy.orm import relationship
 from commons.db import Base
 from datetime import datetime
@@ -11,6 +11,11 @@ class ProdutoFornecedor(Base):
     id_produto = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
     id_fornecedor = Column(Integer, ForeignKey("fornecedores.id_fornecedor", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
 
+    __table_args__ = (
+        # a PK já cobre busca por produto; este cobre busca por fornecedor
+        Index("ix_produto_fornecedor_fornecedor", "id_fornecedor", "id_produto"),
+    )
+
     def __repr__(self):
         return f"<ProdutoFornecedor(produto={self.id_produto}, fornecedor={self.id_fornecedor})>"
 
@@ -32,11 +37,21 @@ class Produto(Base):
     nome = Column(String, nullable=False)
     quantidade = Column(Integer, nullable=False)
     preco = Column(Float, nullable=False)
+    codigo_barras = Column(String, nullable=True)   # EAN-13 (commons/codigo_barras.py)
     
     fornecedores = relationship("Fornecedor", secondary="produto_fornecedor", back_populates="produtos")
     
     itens_venda = relationship("ItemVenda", back_populates="produto")
 
+    __table_args__ = (
+        # filtro de pouco estoque / sem estoque, já na ordem do relatório
+        Index("ix_produtos_quantidade", "quantidade", "id"),
+        # chave natural do catálogo: a importação casa as linhas do CSV pelo nome
+        Index("ux_produtos_nome", "nome", unique=True),
+        # leitura do código de barras no caixa (e nenhum código em dois produtos)
+        Index("ux_produtos_codigo_barras", "codigo_barras", unique=True),
+    )
+
     def __repr__(self):
         fornecedores_nomes = ", ".join([f.nome for f in self.fornecedores])
         return f"<Produto(id={self.id}, nome={self.nome!r}, qtd={self.quantidade}, preco={self.preco:.2f}, fornecedores=[{fornecedores_nomes}])>"
@@ -60,9 +75,22 @@ class Venda(Base):
     
     id_cliente = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE", onupdate="CASCADE"))
     cliente = relationship("Cliente", back_populates="vendas")
+
+    id_turno = Column(Integer, ForeignKey("turnos.id"), nullable=True)
+
+    # chave da venda no diário do caixa (id do carrinho): a releitura no boot não grava duas vezes
+    chave = Column(String, nullable=True)
     
     itens = relationship("ItemVenda", back_populates="venda", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # paginação por (data_hora, id) na listagem de vendas
+        Index("ix_vendas_data_hora_id", "data_hora", "id"),
+        Index("ix_vendas_cliente_data_hora_id", "id_cliente", "data_hora", "id"),
+        Index("ix_vendas_turno", "id_turno"),
+        Index("ux_vendas_chave", "chave", unique=True),
+    )
+
     def __repr__(self):
         return f"<Venda(id={self.id}, cliente={self.cliente.nome}, data={self.data_hora.strftime('%d/%m/%Y %H:%M')})>"
 
@@ -79,5 +107,137 @@ class ItemVenda(Base):
     id_produto = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE", onupdate="CASCADE"))
     produto = relationship("Produto", back_populates="itens_venda")
 
+    __table_args__ = (
+        # total da venda sai só do índice (cobre quantidade e preço)
+        Index("ix_itens_venda_venda", "id_venda", "quantidade", "preco_unitario"),
+        Index("ix_itens_venda_produto", "id_produto"),
+    )
+
     def __repr__(self):
         return f"<ItemVenda(id={self.id}, produto={self.produto.nome}, qtd={self.quantidade}, preco={self.preco_unitario:.2f})>"
+
+# ReservaEstoque
+class ReservaEstoque(Base):
+    """Itens segurados por um carrinho aberto; viram baixa de estoque no registro da venda."""
+    __tablename__ = "reservas_estoque"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    id_carrinho = Column(String, nullable=False)
+    quantidade = Column(Integer, nullable=False)
+    expira_em = Column(DateTime, nullable=False)
+
+    id_produto = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        # soma do reservado por produto sai só do índice (sem ler a tabela)
+        Index("ix_reservas_produto_expira", "id_produto", "expira_em", "id_carrinho", "quantidade"),
+        Index("ix_reservas_carrinho", "id_carrinho"),
+        Index("ix_reservas_expira", "expira_em"),
+    )
+
+    def __repr__(self):
+        return f"<ReservaEstoque(carrinho={self.id_carrinho}, produto={self.id_produto}, qtd={self.quantidade})>"
+
+# Resumos diários de vendas (mantidos a cada venda registrada)
+class ResumoProdutoDia(Base):
+    """Quanto cada produto vendeu por dia: base das consultas de mais/menos vendidos."""
+    __tablename__ = "resumo_vendas_produto_dia"
+
+    id_produto = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    dia = Column(Date, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0.0)
+    num_vendas = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ResumoProdutoDia(produto={self.id_produto}, dia={self.dia}, qtd={self.quantidade})>"
+
+class ResumoClienteDia(Base):
+    """Quanto cada cliente comprou por dia: base dos rankings de clientes."""
+    __tablename__ = "resumo_vendas_cliente_dia"
+
+    id_cliente = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    dia = Column(Date, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0.0)
+    num_vendas = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ResumoClienteDia(cliente={self.id_cliente}, dia={self.dia}, total={self.receita:.2f})>"
+
+# Turno (abertura/fechamento de um caixa)
+class Turno(Base):
+    """Turno de um operador num caixa. Os totais são somados a cada venda registrada."""
+    __tablename__ = "turnos"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    numero_caixa = Column(Integer, nullable=False)
+    operador = Column(String, nullable=False)
+    aberto_em = Column(DateTime, default=datetime.now, nullable=False)
+    fechado_em = Column(DateTime, nullable=True)
+
+    num_vendas = Column(Integer, nullable=False, default=0)
+    total_vendas = Column(Float, nullable=False, default=0.0)
+
+    totais_clientes = relationship("TurnoCliente", back_populates="turno")
+
+    __table_args__ = (
+        Index("ix_turnos_caixa_aberto", "numero_caixa", "fechado_em"),
+    )
+
+    def __repr__(self):
+        return f"<Turno(id={self.id}, caixa={self.numero_caixa}, operador={self.operador!r}, total={self.total_vendas:.2f})>"
+
+# TurnoCliente (total de cada cliente dentro do turno)
+class TurnoCliente(Base):
+    __tablename__ = "turno_clientes"
+
+    id_turno = Column(Integer, ForeignKey("turnos.id", ondelete="CASCADE"), primary_key=True)
+    id_cliente = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    num_vendas = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+    turno = relationship("Turno", back_populates="totais_clientes")
+    cliente = relationship("Cliente")
+
+    def __repr__(self):
+        return f"<TurnoCliente(turno={self.id_turno}, cliente={self.id_cliente}, total={self.total:.2f})>"
+
+# FechamentoCaixa (resumo gravado no fechamento; não pode ser alterado)
+class FechamentoCaixa(Base):
+    __tablename__ = "fechamentos_caixa"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    id_turno = Column(Integer, ForeignKey("turnos.id"), nullable=False, unique=True)
+    numero_caixa = Column(Integer, nullable=False)
+    operador = Column(String, nullable=False)
+    aberto_em = Column(DateTime, nullable=False)
+    fechado_em = Column(DateTime, nullable=False)
+    num_vendas = Column(Integer, nullable=False)
+    num_clientes = Column(Integer, nullable=False)
+    total_vendas = Column(Float, nullable=False)
+    resumo_clientes = Column(String, nullable=False)  # JSON: [[nome, num_vendas, total], ...]
+
+    def __repr__(self):
+        return f"<FechamentoCaixa(turno={self.id_turno}, caixa={self.numero_caixa}, total={self.total_vendas:.2f})>"
+
+
+# O fechamento é um registro histórico: o banco recusa UPDATE/DELETE nele
+for _operacao in ("UPDATE", "DELETE"):
+    event.listen(
+        FechamentoCaixa.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS trg_fechamentos_caixa_sem_{_operacao.lower()} "
+            f"BEFORE {_operacao} ON fechamentos_caixa "
+            f"BEGIN SELECT RAISE(ABORT, 'fechamento de caixa não pode ser alterado'); END"
+        ),
+    )
+
+
+# CargaFonte (assinatura da última carga de cada arquivo de dados iniciais)
+class CargaFonte(Base):
+    __tablename__ = "cargas_fonte"
+    fonte = Column(String, primary_key=True)          # ex.: "fornecedores.xlsx"
+    assinatura = Column(String, nullable=False)       # hash do(s) arquivo(s) carregado(s)
+    carregado_em = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<CargaFonte(fonte={self.fonte!r}, carregado_em={self.carregado_em})>"
@@ -27,6 +27,17 @@ def entrar_float(mensagem: str, min_val: float = 0.0) -> float:
         except ValueError:
             print("Erro: Digite um número decimal válido.")
 
+def entrar_data(mensagem: str) -> datetime | None:
+    '''tratamento pra data dd/mm/aaaa. ENTER vazio retorna None.'''
+    while True:
+        valor = input(mensagem).strip()
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%d/%m/%Y')
+        except ValueError:
+            print("Erro: Digite a data no formato dd/mm/aaaa.")
+
 def obter_data() -> str:
     
     return datetime.now().strftime('%d/%m/%Y %H:%M')
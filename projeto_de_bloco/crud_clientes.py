@@ -1,40 +1,66 @@
 # crud_clientes.py
 from __future__ import annotations
+from pathlib import Path
 
-import pandas as pd
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 
-from commons.db import get_session
+from commons.db import get_read_session, get_session, trava_carga
+from commons.fontes import assinatura_registrada, hash_arquivo, registrar_carga
 from commons.models import Cliente
 
+FONTE_CLIENTES = "clientes.json"
+JSON_CLIENTES = Path(__file__).parent / "dados" / "clientes.json"
 
-def carregar_clientes_iniciais(caminho_json: str = "dados/clientes.json") -> None: #atualizei aqui
-    """Carrega clientes do JSON se a tabela estiver vazia."""
+
+def carregar_clientes_iniciais(caminho_json: str | Path = JSON_CLIENTES, forcar: bool = False) -> bool: #atualizei aqui
+    """
+    Carrega clientes do JSON se a tabela estiver vazia.
+    Pula sem abrir o arquivo quando o JSON é o mesmo da última carga.
+    Retorna False se a carga foi pulada.
+    """
     try:
-        df_clientes = pd.read_json(caminho_json)
+        assinatura = hash_arquivo(caminho_json)
 
         with get_session() as session:
-            if session.query(Cliente).count() == 0:
+            if not forcar and assinatura_registrada(session, FONTE_CLIENTES) == assinatura:
+                print("Clientes iniciais já carregados (clientes.json sem mudança).")
+                return False
+            vazia = session.query(Cliente).count() == 0
+
+        df_clientes = None
+        if vazia:
+            import pandas as pd
+
+            # leitura fora da trava: roda junto com as outras cargas do boot
+            df_clientes = pd.read_json(caminho_json)
+
+        with trava_carga, get_session() as session:
+            if df_clientes is not None:
                 df_clientes.to_sql(
                     Cliente.__tablename__,
-                    session.bind,
+                    session.connection(),
                     if_exists="append",
                     index=False
                 )
-                session.commit()
                 print(f"{len(df_clientes)} clientes iniciais carregados com sucesso.")
             else:
                 print("Clientes iniciais já carregados.")
 
+            registrar_carga(session, FONTE_CLIENTES, assinatura)
+            session.commit()
+            return True
+
     except FileNotFoundError:
         print(f"Aviso: Arquivo {caminho_json} não encontrado. Nenhum cliente inicial carregado.")
     except Exception as e:
         print(f"Erro ao carregar clientes iniciais: {e}")
+    return False
 
 
 def consultar_clientes() -> list[Cliente]:
     """Lista todos os clientes."""
-    with get_session() as session:
+    with get_read_session() as session:
         return session.query(Cliente).order_by(Cliente.id).all()
 
 
@@ -51,14 +77,13 @@ def cadastrar_cliente(nome: str) -> Cliente | None:
     with get_session() as session:
         try:
             if not nome:
-                ultimo_id = session.query(Cliente.id).order_by(Cliente.id.desc()).first()
-                proximo_id = (ultimo_id[0] + 1) if ultimo_id else 1
+                ultimo_id = session.query(func.max(Cliente.id)).scalar()
+                proximo_id = (ultimo_id or 0) + 1
                 nome = f"Cliente {proximo_id}"
 
             cliente = Cliente(nome=nome)
             session.add(cliente)
-            session.commit()
-            session.refresh(cliente)
+            session.commit()  # expire_on_commit=False: id e nome já estão no objeto
             print(f"Cliente '{cliente.nome}' cadastrado com ID {cliente.id}.")
             return cliente
 
@@ -1,91 +1,186 @@
 # crud_fornecedores.py
 from __future__ import annotations
+import json
 from pathlib import Path
-import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from commons.db import get_session
-from commons.models import Fornecedor, ProdutoFornecedor
+from commons.db import get_session, trava_carga
+from commons.fontes import assinatura_registrada, hash_arquivo, registrar_carga
+from commons.models import Fornecedor, Produto, ProdutoFornecedor
 
+PASTA_DADOS = Path(__file__).parent / "dados"
+EXCEL_FORNECEDORES = PASTA_DADOS / "fornecedores.xlsx"
+PASTA_CACHE = PASTA_DADOS / ".cache"
+FONTE_FORNECEDORES = "fornecedores.xlsx"
 
-# Importando da minha planilha do excel
-def carregar_fornecedores_iniciais() -> None:
-    """Abre session e chama o loader de Excel."""
-    with get_session() as session:
-        carregar_fornecedores_iniciais_db(session)
-        print("fornecedores no db =", session.query(Fornecedor).count())
-        print("associacoes no db =", session.query(ProdutoFornecedor).count())
-
-def carregar_fornecedores_iniciais_db(session: Session) -> None:
-    print("-> Carregando fornecedores e associações...")
 
-    excel_path = Path(__file__).parent / "dados" / "fornecedores.xlsx"
-    
+# Importando da minha planilha do excel
+def carregar_fornecedores_iniciais(forcar: bool = False) -> bool:
+    """Abre session e chama o loader de Excel. Retorna False se a carga foi pulada."""
+    preparar_planilha_fornecedores()  # abre o xlsx (se preciso) antes de pegar a trava
+
+    with trava_carga, get_session() as session:
+        carregou = carregar_fornecedores_iniciais_db(session, forcar)
+        if carregou:
+            print("fornecedores no db =", session.query(Fornecedor).count())
+            print("associacoes no db =", session.query(ProdutoFornecedor).count())
+        return carregou
+
+
+def _arquivo_cache(hash_excel: str) -> Path:
+    # "v2": as associações passaram a vir pelo nome/código do produto, não pela posição
+    return PASTA_CACHE / f"fornecedores-v2-{hash_excel[:16]}.json"
+
+
+def _coluna_texto(df, coluna: str) -> list[str]:
+    if coluna not in df.columns:
+        return [""] * len(df)
+    return [texto.removesuffix(".0") for texto in df[coluna].fillna("").astype(str).str.strip()]
+
+
+def _ler_planilha(excel_path: Path, hash_excel: str) -> dict:
+    """
+    Abas da planilha já convertidas em listas simples.
+    O resultado fica em dados/.cache com o hash no nome do arquivo: enquanto
+    a planilha não mudar, ela não é reaberta (abrir xlsx é a parte lenta).
+    """
+    cache = _arquivo_cache(hash_excel)
+    if cache.exists():
+        return json.loads(cache.read_text(encoding="utf-8"))
+
+    import pandas as pd
+
+    df_fornecedores = pd.read_excel(excel_path, sheet_name="fornecedores")
+    COL_ID_EXCEL = "id_fornecedor" if "id_fornecedor" in df_fornecedores.columns else "id"
+
+    # o produto vem pelo nome (nome_produto) ou pelo EAN-13 (codigo_barras)
+    df_prod_forn = pd.read_excel(excel_path, sheet_name="produto_fornecedor")
+
+    planilha = {
+        "fornecedores": [
+            [int(excel_id), str(nome).strip()]
+            for excel_id, nome in zip(df_fornecedores[COL_ID_EXCEL], df_fornecedores["nome"])
+        ],
+        # [id_fornecedor do excel, nome do produto ou "", código de barras ou ""]
+        "produto_fornecedor": [
+            [int(id_forn), nome, codigo]
+            for id_forn, nome, codigo in zip(df_prod_forn["id_fornecedor"],
+                                             _coluna_texto(df_prod_forn, "nome_produto"),
+                                             _coluna_texto(df_prod_forn, "codigo_barras"))
+        ],
+    }
+
+    PASTA_CACHE.mkdir(exist_ok=True)
+    for antigo in PASTA_CACHE.glob("fornecedores-*.json"):
+        antigo.unlink()
+    cache.write_text(json.dumps(planilha, ensure_ascii=False), encoding="utf-8")
+    return planilha
+
+
+def preparar_planilha_fornecedores() -> bool:
+    """
+    Só lê a planilha para o cache (sem tocar no banco), para poder rodar em
+    paralelo com as outras cargas. Retorna False se o cache já estava pronto.
+    """
     try:
-        # Limpaa associação primeiro (evita FK/ordem ruim)
-        session.query(ProdutoFornecedor).delete()
-        session.query(Fornecedor).delete()
-        session.commit()
-
-        # Fornecedores
-        df_fornecedores = pd.read_excel(excel_path, sheet_name="fornecedores")
-
-        COL_ID_EXCEL = "id_fornecedor" if "id_fornecedor" in df_fornecedores.columns else "id"
-
-        excel_to_db: dict[int, int] = {}
-
-        for _, row in df_fornecedores.iterrows():
-            excel_id = int(row[COL_ID_EXCEL])
-            nome = str(row["nome"]).strip()
-
-            if not nome:
-                continue
-
-            existente = session.query(Fornecedor).filter(Fornecedor.nome == nome).first()
-            if existente:
-                excel_to_db[excel_id] = existente.id
-                continue
-
-            fornecedor = Fornecedor(nome=nome)
-            session.add(fornecedor)
-            session.flush()  # Pega fornecedor.id_fornecedor
-            excel_to_db[excel_id] = fornecedor.id_fornecedor 
-
-        session.commit()
-        print(f"Concluído, {len(excel_to_db)} fornecedores inseridos na tabela.")
-
-        # Associações Produto-Fornecedor
-        df_prod_forn = pd.read_excel(excel_path, sheet_name="produto_fornecedor")
+        hash_excel = hash_arquivo(EXCEL_FORNECEDORES)
+    except FileNotFoundError:
+        return False
+    if _arquivo_cache(hash_excel).exists():
+        return False
+    _ler_planilha(EXCEL_FORNECEDORES, hash_excel)
+    return True
 
-        # Remove duplicados do excel
-        if "id_produto" in df_prod_forn.columns and "id_fornecedor" in df_prod_forn.columns:
-            df_prod_forn = df_prod_forn.drop_duplicates(subset=["id_produto", "id_fornecedor"])
 
-        assoc_count = 0
-        puladas = 0
+def carregar_fornecedores_iniciais_db(session: Session, forcar: bool = False) -> bool:
+    print("-> Carregando fornecedores e associações...")
 
-        for _, row in df_prod_forn.iterrows():
-            id_produto = int(row["id_produto"])
-            excel_id_fornecedor = int(row["id_fornecedor"])
+    excel_path = EXCEL_FORNECEDORES
 
+    try:
+        hash_excel = hash_arquivo(excel_path)
+        planilha = _ler_planilha(excel_path, hash_excel)
+
+        # A posição no produtos.csv não identifica o produto (o scraping regrava o
+        # arquivo com o catálogo do site, que muda): sem nome nem código, recusa
+        sem_chave = sum(1 for _, nome, codigo in planilha["produto_fornecedor"] if not nome and not codigo)
+        if sem_chave:
+            print(f"ERRO, planilha recusada: {sem_chave} linha(s) da aba produto_fornecedor sem "
+                  f"nome_produto nem codigo_barras.")
+            print("   (a aba precisa da coluna nome_produto ou codigo_barras; id_produto não é mais usado)")
+            return False
+
+        if not forcar and assinatura_registrada(session, FONTE_FORNECEDORES) == hash_excel:
+            print("Planilha de fornecedores sem mudança desde a última carga.")
+            return False
+
+        # Fornecedores: resolve todos os nomes numa consulta e insere só os que faltam
+        nomes = {nome for _, nome in planilha["fornecedores"] if nome}
+        ids_por_nome = dict(session.execute(
+            select(Fornecedor.nome, Fornecedor.id_fornecedor).where(Fornecedor.nome.in_(nomes))
+        ).all())
+        novos = [{"nome": nome} for nome in sorted(nomes - ids_por_nome.keys())]
+        if novos:
+            session.execute(insert(Fornecedor), novos)
+            ids_por_nome.update(session.execute(
+                select(Fornecedor.nome, Fornecedor.id_fornecedor)
+                .where(Fornecedor.nome.in_([n["nome"] for n in novos]))
+            ).all())
+
+        excel_to_db = {excel_id: ids_por_nome[nome] for excel_id, nome in planilha["fornecedores"] if nome}
+        print(f"Concluído, {len(novos)} fornecedores inseridos na tabela ({len(excel_to_db)} na planilha).")
+
+        # Associações Produto-Fornecedor, casadas pelo código de barras ou pelo nome do produto
+        associacoes = planilha["produto_fornecedor"]
+        nomes_produto = {nome for _, nome, codigo in associacoes if nome and not codigo}
+        codigos = {codigo for _, _, codigo in associacoes if codigo}
+        ids_por_nome_produto = dict(session.execute(
+            select(Produto.nome, Produto.id).where(Produto.nome.in_(nomes_produto))
+        ).all()) if nomes_produto else {}
+        ids_por_codigo = dict(session.execute(
+            select(Produto.codigo_barras, Produto.id).where(Produto.codigo_barras.in_(codigos))
+        ).all()) if codigos else {}
+
+        pares = set()
+        puladas = sem_produto = 0
+        for excel_id_fornecedor, nome, codigo in associacoes:
             id_fornecedor_db = excel_to_db.get(excel_id_fornecedor)
+            id_produto = ids_por_codigo.get(codigo) if codigo else ids_por_nome_produto.get(nome)
             if not id_fornecedor_db:
                 puladas += 1
-                continue
-
-            session.add(ProdutoFornecedor(id_produto=id_produto, id_fornecedor=id_fornecedor_db))
-            assoc_count += 1
-
+            elif not id_produto:
+                sem_produto += 1
+            else:
+                pares.add((id_produto, id_fornecedor_db))
+
+        # Só acrescenta: associações feitas no SIG (ou de cargas anteriores) ficam
+        inseridas = 0
+        if pares:
+            inseridas = session.connection().execute(
+                sqlite_insert(ProdutoFornecedor).on_conflict_do_nothing(),
+                [{"id_produto": p, "id_fornecedor": f} for p, f in sorted(pares)],
+            ).rowcount
+
+        # Só marca como carregada se tudo casou; senão tenta de novo no próximo boot
+        if not puladas and not sem_produto:
+            registrar_carga(session, FONTE_FORNECEDORES, hash_excel)
         session.commit()
-        print(f"Concluído, {assoc_count} associações inseridas em produto_fornecedor.")
+
+        print(f"Concluído, {inseridas} associações novas em produto_fornecedor ({len(pares)} na planilha).")
         if puladas:
             print(f"ERRO, {puladas} associações puladas porque id_fornecedor do Excel não foi encontrado no mapa.")
             print("   (confira se o id_fornecedor da aba produto_fornecedor combina com o ID da aba fornecedores)")
+        if sem_produto:
+            print(f"Aviso, {sem_produto} associações puladas porque o produto ainda não está no catálogo.")
+        return True
 
     except FileNotFoundError:
         print(f"Erro: Arquivo {excel_path} não encontrado.")
     except Exception as e:
         session.rollback()
         print(f"Erro ao carregar fornecedores/associações: {e}")
+    return False
 
 
-        # Pretendo mais pra frente poder inserir, atualizar e deletar fornecedores, por isso fiz crud_fornecedores
\ No newline at end of file
+        # Pretendo mais pra frente poder inserir, atualizar e deletar fornecedores, por isso fiz crud_fornecedores
@@ -1,9 +1,19 @@
 # crud_produtos.py
-import pandas as pd
+import csv
+import time
+from pathlib import Path
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import joinedload
-from commons.db import get_session
+from commons.catalogo import ProdutoCatalogo, catalogo, codigos
+from commons.codigo_barras import PREFIXO_INTERNO, codigo_interno, normalizar_codigo
+from commons.busca import consulta_fts
+from commons.db import get_read_session, get_session, trava_carga
+from commons.fontes import assinatura_registrada, hash_arquivo, registrar_carga
 from commons.models import Produto
-from crud_fornecedores import carregar_fornecedores_iniciais
+
+FONTE_PRODUTOS = "produtos.csv"
+CSV_PRODUTOS = Path(__file__).parent / "dados" / "produtos.csv"
 
 # --- Serviços ---
 
@@ -11,61 +21,371 @@ def consultar_produtos():
     with get_session() as session:
         return session.query(Produto).options(joinedload(Produto.fornecedores)).order_by(Produto.id).all() 
 
-def pesquisar_produto(produto_id: int) -> Produto | None:
+def consultar_produtos_sem_estoque() -> list:
+    """Só os produtos zerados (id, nome, quantidade), filtrados no banco."""
+    with get_session() as session:
+        return (
+            session.query(Produto.id, Produto.nome, Produto.quantidade)
+            .filter(Produto.quantidade == 0)
+            .order_by(Produto.id)
+            .all()
+        )
+
+def _carregar_produto(produto_id: int) -> ProdutoCatalogo | None:
     with get_session() as session:
-        return session.query(Produto).filter(Produto.id == produto_id).first()
+        # numa unidade de trabalho o produto pode já estar no mapa de identidade
+        # com o estoque de antes da venda: o cache precisa do valor do banco
+        produto = session.get(Produto, produto_id, populate_existing=True)
+        return ProdutoCatalogo.de_produto(produto) if produto else None
+
+
+def pesquisar_produto(produto_id: int) -> ProdutoCatalogo | None:
+    """Busca o produto pelo catálogo em memória; só vai ao banco quando não está no cache."""
+    return catalogo.obter(produto_id, _carregar_produto)
+
+
+def buscar_produtos(texto: str, limite: int = 10, teto_relevancia: int = 1000) -> tuple[list, bool]:
+    """
+    Produtos cujo nome tem todas as palavras digitadas (pelo começo, sem
+    acento nem maiúscula), pela tabela FTS5 produtos_busca: o custo depende
+    de quantos nomes casam, não do tamanho do catálogo. Cada linha tem:
+    id, nome, preco, quantidade.
+    Os mais relevantes (bm25) vêm primeiro. Calcular a relevância custa por
+    nome que casa; com mais de `teto_relevancia` nomes ela é pulada, as
+    linhas vêm pela ordem do id e o bool retornado é True (vale pedir mais
+    palavras ao operador).
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return [], False
+    parametros = {"consulta": consulta, "limite": limite, "teto": teto_relevancia + 1}
+    with get_read_session() as session:
+        casados = session.execute(
+            text("SELECT count(*) FROM (SELECT 1 FROM produtos_busca WHERE produtos_busca MATCH :consulta LIMIT :teto)"),
+            parametros,
+        ).scalar()
+        muitos = casados > teto_relevancia
+        ordem = "produtos_busca.rowid" if muitos else "produtos_busca.rank"
+        linhas = session.execute(
+            text(
+                "SELECT p.id, p.nome, p.preco, p.quantidade FROM produtos_busca "
+                "JOIN produtos p ON p.id = produtos_busca.rowid "
+                f"WHERE produtos_busca MATCH :consulta ORDER BY {ordem} LIMIT :limite"
+            ),
+            parametros,
+        ).all()
+    return linhas, muitos
+
+
+def _id_pelo_codigo(codigo: str) -> int | None:
+    with get_session() as session:
+        return session.execute(select(Produto.id).where(Produto.codigo_barras == codigo)).scalar()
+
+
+def carregar_indice_codigos() -> int:
+    """Põe no índice em memória todos os códigos de barras do catálogo. Retorna quantos."""
+    with get_session() as session:
+        pares = session.execute(
+            select(Produto.codigo_barras, Produto.id).where(Produto.codigo_barras.is_not(None))
+        ).all()
+    codigos.carregar(pares)
+    return len(pares)
+
+
+def pesquisar_por_codigo(codigo: str) -> ProdutoCatalogo | None:
+    """Produto do código de barras lido: o id sai do índice em memória, o produto do catálogo."""
+    if not codigos.carregado:
+        carregar_indice_codigos()
+    produto_id = codigos.obter(codigo, _id_pelo_codigo)
+    return pesquisar_produto(produto_id) if produto_id else None
+
+
+def atribuir_codigos_internos(tamanho_lote: int = 5000) -> int:
+    """
+    Dá um EAN-13 da loja (prefixo 20 + id) a cada produto sem código de barras.
+    Como o id não muda nas reimportações (upsert pelo nome), o código também
+    não muda. Retorna quantos produtos receberam código.
+    """
+    with get_session() as session:
+        sem_codigo = session.execute(
+            select(Produto.id).where(Produto.codigo_barras.is_(None)).order_by(Produto.id)
+        ).scalars().all()
+        usados = set(session.execute(
+            # faixa em vez de LIKE '20%': o LIKE do SQLite não usa o índice
+            select(Produto.codigo_barras).where(Produto.codigo_barras >= PREFIXO_INTERNO,
+                                                Produto.codigo_barras < str(int(PREFIXO_INTERNO) + 1))
+        ).scalars())
+
+    parametros = [{"b_id": pid, "b_codigo": codigo_interno(pid)} for pid in sem_codigo]
+    parametros = [p for p in parametros if p["b_codigo"] not in usados]
+
+    atribuir = (
+        update(Produto)
+        .where(Produto.id == bindparam("b_id"), Produto.codigo_barras.is_(None))
+        .values(codigo_barras=bindparam("b_codigo"))
+    )
+    for inicio in range(0, len(parametros), tamanho_lote):
+        with trava_carga, get_session() as session:
+            try:
+                session.connection().execute(atribuir, parametros[inicio:inicio + tamanho_lote])
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+    codigos.limpar()
+    print(f"{len(parametros)} produto(s) receberam código de barras da loja"
+          + (f"; {len(sem_codigo) - len(parametros)} ficaram sem (código já usado)." if len(parametros) < len(sem_codigo) else "."))
+    return len(parametros)
 
 
 def atualizar_estoque(produto_id: int, diferenca_qtd: int) -> bool:
-    try:
-        with get_session() as session:
-            produto = session.query(Produto).filter(Produto.id == produto_id).first()
+    with get_session() as session:
+        try:
+            produto = session.query(Produto).filter(Produto.id == produto_id).populate_existing().first()
             if not produto:
                 return False
-            
+
             produto.quantidade += diferenca_qtd
-            
+
             if produto.quantidade < 0:
                 produto.quantidade = 0
-                
+
             session.commit()
-            session.refresh(produto)
+            catalogo.atualizar(ProdutoCatalogo.de_produto(produto))
             return True
-    except Exception as e:
-        session.rollback()
-        print(f"Erro ao atualizar estoque: {e}")
-        return False
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao atualizar estoque: {e}")
+            return False
 
 
-def importar_produtos_csv(caminho_csv: str = 'dados/produtos.csv'):
+def _ler_csv_em_lotes(caminho_csv: str | Path, tamanho_lote: int):
+    """
+    Lê o CSV em lotes de (nome, quantidade, preco, codigo_barras), sem carregar o
+    arquivo inteiro na memória. A coluna codigo_barras é opcional (vem vazia sem ela).
+    """
+    with open(caminho_csv, newline="", encoding="utf-8") as arquivo:
+        leitor = csv.reader(arquivo)
+        cabecalho = next(leitor, [])
+        colunas = [cabecalho.index(c) for c in ("nome", "quantidade", "preco")]
+        colunas.append(cabecalho.index("codigo_barras") if "codigo_barras" in cabecalho else None)
+        lote = []
+        for linha in leitor:
+            lote.append([linha[i] if i is not None and i < len(linha) else "" for i in colunas])
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
 
-    carregar_fornecedores_iniciais()
 
+def _normalizar_linha(nome: str, quantidade: str, preco: str, codigo_barras: str = "") -> dict | None:
     try:
-        df_produtos = pd.read_csv(caminho_csv)
-        
-        with get_session() as session:
-            # Limpa as tabelas Produto e a de associação
-            session.query(Produto).delete()
-            session.commit()
-            
-            # Insere os dados do DataFrame no banco de dados 
-            produtos_para_inserir = []
-            for index, row in df_produtos.iterrows():
-                produto = Produto(
-                    nome=row['nome'],
-                    quantidade=row['quantidade'],
-                    preco=row['preco']
-                )
-                
-                produtos_para_inserir.append(produto)
-            
-            session.add_all(produtos_para_inserir)
+        nome = nome.strip()
+        if not nome:
+            return None
+        return {"nome": nome, "quantidade": max(0, int(float(quantidade))), "preco": float(preco),
+                "codigo_barras": normalizar_codigo(codigo_barras)}
+    except ValueError:
+        return None
+
+
+def importar_produtos_csv(caminho_csv: str | Path = CSV_PRODUTOS, tamanho_lote: int = 5000,
+                          apenas_se_mudou: bool = False) -> dict | None:
+    """
+    Importa o catálogo por upsert, casando as linhas pelo nome do produto.
+    Não apaga nada: produtos existentes mantêm o id (e o histórico de vendas),
+    só são regravados os que mudaram preço, quantidade ou código de barras, e os
+    novos são inseridos. Linha sem código de barras não apaga o que o produto já
+    tem; código inválido ou de outro produto é descartado (a linha entra sem ele).
+    Com apenas_se_mudou, não relê o CSV se ele é o mesmo da última importação.
+    Retorna as contagens de inseridos/atualizados/inalterados/rejeitados/
+    codigos_descartados (None se não importou).
+    """
+    try:
+        assinatura = hash_arquivo(caminho_csv)
+    except FileNotFoundError:
+        print(f"Aviso: Arquivo {caminho_csv} não encontrado. Produtos não importados.")
+        return None
+
+    with get_session() as session:
+        if apenas_se_mudou and assinatura_registrada(session, FONTE_PRODUTOS) == assinatura:
+            print("Produtos já importados (produtos.csv sem mudança).")
+            return None
+
+    contagem = {"inseridos": 0, "atualizados": 0, "inalterados": 0, "rejeitados": 0, "codigos_descartados": 0}
+    codigos_mudaram = False
+
+    stmt = sqlite_insert(Produto)
+    upsert = stmt.on_conflict_do_update(
+        index_elements=[Produto.nome],
+        set_={"quantidade": stmt.excluded.quantidade, "preco": stmt.excluded.preco,
+              "codigo_barras": func.coalesce(stmt.excluded.codigo_barras, Produto.codigo_barras)},
+        where=(Produto.quantidade != stmt.excluded.quantidade) | (Produto.preco != stmt.excluded.preco)
+        | (stmt.excluded.codigo_barras.is_not(None) & stmt.excluded.codigo_barras.is_distinct_from(Produto.codigo_barras)),
+    )
+
+    with get_session() as session:
+        total = analisado = session.query(func.count(Produto.id)).scalar()
+
+    try:
+        for lote in _ler_csv_em_lotes(caminho_csv, tamanho_lote):
+            # última ocorrência do nome no lote vale
+            linhas = {}
+            for linha in lote:
+                normalizada = _normalizar_linha(*linha)
+                if normalizada is None:
+                    contagem["rejeitados"] += 1
+                    continue
+                if linha[3].strip() and normalizada["codigo_barras"] is None:
+                    contagem["codigos_descartados"] += 1
+                linhas[normalizada["nome"]] = normalizada
+
+            with trava_carga, get_session() as session:
+                try:
+                    existentes = {
+                        nome: (pid, qtd, preco, codigo)
+                        for pid, nome, qtd, preco, codigo in session.execute(
+                            select(Produto.id, Produto.nome, Produto.quantidade, Produto.preco, Produto.codigo_barras)
+                            .where(Produto.nome.in_(list(linhas)))
+                        )
+                    }
+
+                    # um código só pode ter um dono: o que já é de outro produto fica de fora
+                    no_lote = [linha["codigo_barras"] for linha in linhas.values() if linha["codigo_barras"]]
+                    donos = dict(session.execute(
+                        select(Produto.codigo_barras, Produto.nome).where(Produto.codigo_barras.in_(no_lote))
+                    ).all()) if no_lote else {}
+                    for nome, linha in linhas.items():
+                        codigo = linha["codigo_barras"]
+                        if codigo and donos.setdefault(codigo, nome) != nome:
+                            linha["codigo_barras"] = None
+                            contagem["codigos_descartados"] += 1
+
+                    alterar = []
+                    ids_alterados = []
+                    for nome, linha in linhas.items():
+                        atual = existentes.get(nome)
+                        codigo_novo = linha["codigo_barras"] not in (None, atual and atual[3])
+                        codigos_mudaram |= codigo_novo
+                        if atual is None:
+                            contagem["inseridos"] += 1
+                            alterar.append(linha)
+                        elif (atual[1], atual[2]) != (linha["quantidade"], linha["preco"]) or codigo_novo:
+                            contagem["atualizados"] += 1
+                            alterar.append(linha)
+                            ids_alterados.append(atual[0])
+                        else:
+                            contagem["inalterados"] += 1
+
+                    if alterar:
+                        session.connection().execute(upsert, alterar)
+
+                    # Com estatísticas de quando o catálogo era pequeno o planejador
+                    # troca a busca pelo índice do nome por varredura da tabela.
+                    # Refaz o ANALYZE cada vez que a tabela dobra de tamanho.
+                    total += len(alterar) - len(ids_alterados)
+                    if total >= 2 * max(analisado, tamanho_lote):
+                        session.execute(text("ANALYZE produtos"))
+                        analisado = total
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+
+            for pid in ids_alterados:
+                catalogo.invalidar(pid)
+
+        with trava_carga, get_session() as session:
+            registrar_carga(session, FONTE_PRODUTOS, assinatura)
             session.commit()
-            print(f"{len(df_produtos)} produtos importados com sucesso de {caminho_csv}.")
-            
+        if codigos_mudaram:
+            codigos.limpar()
+
+        print(
+            f"Produtos importados de {caminho_csv}: {contagem['inseridos']} novos, "
+            f"{contagem['atualizados']} atualizados, {contagem['inalterados']} sem mudança"
+            + (f", {contagem['rejeitados']} linhas inválidas" if contagem["rejeitados"] else "")
+            + (f", {contagem['codigos_descartados']} códigos de barras descartados" if contagem["codigos_descartados"] else "")
+            + "."
+        )
+        return contagem
+
     except FileNotFoundError:
         print(f"Aviso: Arquivo {caminho_csv} não encontrado. Produtos não importados.")
+        return None
     except Exception as e:
-        session.rollback()
         print(f"Erro ao importar produtos: {e}")
+        return None
+
+
+def aplicar_mudancas_catalogo(mudancas: list[dict], tamanho_lote: int = 100, pausa: float = 0.05) -> dict:
+    """
+    Aplica o que mudou no catálogo raspado com os caixas abertos, em transações
+    curtas de até `tamanho_lote` produtos, com uma `pausa` (s) entre elas para
+    a venda que estiver esperando o banco entrar: ela espera no máximo uma
+    transação dessas. Cada mudança é {'nome', 'preco', 'diferenca_qtd'} para
+    produto existente (preço substituído; a quantidade entra como diferença,
+    para não desfazer as vendas feitas desde a raspagem anterior) ou
+    {'nome', 'preco', 'quantidade'} para produto novo.
+    Retorna as contagens, o maior tempo (ms) segurando o banco numa transação
+    e o tempo total esperando o banco liberar.
+    """
+    contagem = {"atualizados": 0, "inseridos": 0, "ausentes": 0, "lotes": 0,
+                "maior_transacao_ms": 0.0, "espera_ms": 0.0}
+
+    atualizar = (
+        update(Produto)
+        .where(Produto.id == bindparam("b_id"))
+        .values(preco=bindparam("b_preco"), quantidade=func.max(0, Produto.quantidade + bindparam("b_diferenca")))
+    )
+    inserir = sqlite_insert(Produto).on_conflict_do_nothing(index_elements=[Produto.nome])
+
+    for inicio in range(0, len(mudancas), tamanho_lote):
+        if inicio:
+            time.sleep(pausa)
+        lote = mudancas[inicio:inicio + tamanho_lote]
+        novos = [{"nome": m["nome"], "quantidade": m["quantidade"], "preco": m["preco"]}
+                 for m in lote if "diferenca_qtd" not in m]
+        alterados = {m["nome"]: m for m in lote if "diferenca_qtd" in m}
+
+        # Os ids são lidos antes, fora da transação de escrita: ela só tem UPDATE/INSERT
+        ids = {}
+        if alterados:
+            with get_session() as session:
+                ids = dict(session.execute(
+                    select(Produto.nome, Produto.id).where(Produto.nome.in_(list(alterados)))
+                ).all())
+        contagem["ausentes"] += len(alterados) - len(ids)
+
+        parametros = [
+            {"b_id": ids[nome], "b_preco": m["preco"], "b_diferenca": m["diferenca_qtd"]}
+            for nome, m in alterados.items() if nome in ids
+        ]
+        with trava_carga, get_session() as session:
+            try:
+                # pega o lock de escrita logo no início: daqui até o commit é o tempo que
+                # uma venda pode ficar esperando por este lote
+                t0 = time.perf_counter()
+                conexao = session.connection()
+                conexao.exec_driver_sql("BEGIN IMMEDIATE")
+                t1 = time.perf_counter()
+                if parametros:
+                    conexao.execute(atualizar, parametros)
+                if novos:
+                    conexao.execute(inserir, novos)
+                session.commit()
+                duracao = (time.perf_counter() - t1) * 1000
+                contagem["espera_ms"] += (t1 - t0) * 1000
+            except Exception:
+                session.rollback()
+                raise
+
+        catalogo.invalidar_varios(ids.values())
+        contagem["atualizados"] += len(parametros)
+        contagem["inseridos"] += len(novos)
+        contagem["lotes"] += 1
+        contagem["maior_transacao_ms"] = max(contagem["maior_transacao_ms"], duracao)
+
+    return contagem
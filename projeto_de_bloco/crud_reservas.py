@@ -0,0 +1,134 @@
+# crud_reservas.py
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, Integer, String, delete, func, insert, literal, select, update
+
+from commons.db import get_session
+from commons.models import Produto, ReservaEstoque
+
+# Quanto tempo um carrinho parado segura o estoque
+TEMPO_RESERVA = timedelta(minutes=15)
+
+
+def reservado_ativo(id_produto, agora: datetime, exceto_carrinho: str | None = None):
+    """
+    Subconsulta com o total reservado (e ainda não expirado) de um produto.
+    Resolvida pelo índice (id_produto, expira_em, ...), sem varrer a tabela.
+    """
+    filtro = [ReservaEstoque.id_produto == id_produto, ReservaEstoque.expira_em > agora]
+    if exceto_carrinho is not None:
+        filtro.append(ReservaEstoque.id_carrinho != exceto_carrinho)
+
+    return (
+        select(func.coalesce(func.sum(ReservaEstoque.quantidade), 0))
+        .where(*filtro)
+        .scalar_subquery()
+    )
+
+
+def reservar_item(id_carrinho: str, id_produto: int, quantidade: int,
+                  tempo_reserva: timedelta = TEMPO_RESERVA) -> bool:
+    """
+    Segura `quantidade` unidades do produto para o carrinho.
+    A conferência do disponível e a gravação são um único INSERT ... SELECT,
+    então dois caixas não reservam o mesmo estoque. Também renova o prazo
+    das outras reservas do carrinho (o carrinho continua aberto).
+    """
+    agora = datetime.now()
+    expira_em = agora + tempo_reserva
+
+    with get_session() as session:
+        try:
+            origem = (
+                select(
+                    literal(id_carrinho, String),
+                    literal(id_produto, Integer),
+                    literal(quantidade, Integer),
+                    literal(expira_em, DateTime),
+                )
+                .select_from(Produto)
+                .where(
+                    Produto.id == id_produto,
+                    Produto.quantidade - reservado_ativo(id_produto, agora) >= quantidade,
+                )
+            )
+            resultado = session.execute(
+                insert(ReservaEstoque).from_select(
+                    ["id_carrinho", "id_produto", "quantidade", "expira_em"], origem
+                )
+            )
+            if resultado.rowcount != 1:
+                session.rollback()
+                return False
+
+            session.execute(
+                update(ReservaEstoque)
+                .where(ReservaEstoque.id_carrinho == id_carrinho)
+                .values(expira_em=expira_em)
+            )
+            session.commit()
+            return True
+
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao reservar estoque: {e}")
+            return False
+
+
+def disponivel_para_venda(id_produto: int) -> int:
+    """Estoque físico menos o que está reservado em carrinhos abertos."""
+    agora = datetime.now()
+    with get_session() as session:
+        valor = session.execute(
+            select(Produto.quantidade - reservado_ativo(id_produto, agora))
+            .where(Produto.id == id_produto)
+        ).scalar()
+    return max(0, valor or 0)
+
+
+def liberar_carrinho(id_carrinho: str) -> int:
+    """Devolve de uma vez todo o estoque segurado por um carrinho abandonado."""
+    with get_session() as session:
+        try:
+            resultado = session.execute(
+                delete(ReservaEstoque).where(ReservaEstoque.id_carrinho == id_carrinho)
+            )
+            session.commit()
+            return resultado.rowcount
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao liberar reservas do carrinho: {e}")
+            return 0
+
+
+def varrer_reservas_expiradas() -> int:
+    """Apaga num único DELETE todas as reservas vencidas (carrinhos que morreram com o processo)."""
+    with get_session() as session:
+        try:
+            resultado = session.execute(
+                delete(ReservaEstoque).where(ReservaEstoque.expira_em <= datetime.now())
+            )
+            session.commit()
+            return resultado.rowcount
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao varrer reservas expiradas: {e}")
+            return 0
+
+
+def iniciar_varredor(intervalo_segundos: float = 60.0) -> threading.Event:
+    """
+    Sobe uma thread daemon que varre as reservas vencidas a cada intervalo.
+    Retorna um Event: chamar .set() nele para o varredor.
+    """
+    parar = threading.Event()
+
+    def _loop():
+        while not parar.wait(intervalo_segundos):
+            varrer_reservas_expiradas()
+
+    threading.Thread(target=_loop, name="varredor-reservas", daemon=True).start()
+    return parar
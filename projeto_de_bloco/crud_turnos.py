@@ -0,0 +1,117 @@
+# crud_turnos.py
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from commons.db import get_session
+from commons.models import Cliente, FechamentoCaixa, Turno, TurnoCliente
+
+
+def abrir_turno(numero_caixa: int, operador: str) -> Turno | None:
+    """
+    Abre um turno para o caixa. Se o caixa ficou com um turno aberto
+    (processo caiu sem fechar), retoma esse turno em vez de abrir outro.
+    """
+    operador = (operador or "").strip() or f"Operador caixa {numero_caixa}"
+
+    with get_session() as session:
+        try:
+            turno = (
+                session.query(Turno)
+                .filter(Turno.numero_caixa == numero_caixa, Turno.fechado_em.is_(None))
+                .order_by(Turno.id.desc())
+                .first()
+            )
+            if turno:
+                print(f"Retomando turno {turno.id} do caixa {numero_caixa} (aberto em {turno.aberto_em.strftime('%d/%m/%Y %H:%M')}).")
+                return turno
+
+            turno = Turno(numero_caixa=numero_caixa, operador=operador, aberto_em=datetime.now())
+            session.add(turno)
+            session.commit()
+            print(f"Turno {turno.id} aberto no caixa {numero_caixa} por {turno.operador}.")
+            return turno
+
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao abrir turno: {e}")
+            return None
+
+
+def acumular_venda_no_turno(session: Session, id_turno: int, id_cliente: int, total_venda: float) -> None:
+    """
+    Soma a venda nos totais do turno e do cliente dentro do turno.
+    Roda dentro da transação da venda (sem commit), então os totais nunca
+    ficam diferentes das vendas gravadas.
+    """
+    session.execute(
+        update(Turno)
+        .where(Turno.id == id_turno)
+        .values(num_vendas=Turno.num_vendas + 1, total_vendas=Turno.total_vendas + total_venda)
+        .execution_options(synchronize_session=False)
+    )
+
+    stmt = sqlite_insert(TurnoCliente).values(
+        id_turno=id_turno, id_cliente=id_cliente, num_vendas=1, total=total_venda
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TurnoCliente.id_turno, TurnoCliente.id_cliente],
+            set_={
+                "num_vendas": TurnoCliente.num_vendas + 1,
+                "total": TurnoCliente.total + stmt.excluded.total,
+            },
+        )
+    )
+
+
+def fechar_turno(id_turno: int) -> FechamentoCaixa | None:
+    """
+    Fecha o turno e grava o resumo do fechamento.
+    Lê só os totais já acumulados por cliente do turno (não relê o histórico de vendas).
+    """
+    with get_session() as session:
+        try:
+            turno = session.get(Turno, id_turno)
+            if not turno:
+                print("Turno não encontrado.")
+                return None
+
+            existente = session.query(FechamentoCaixa).filter(FechamentoCaixa.id_turno == id_turno).first()
+            if existente:
+                return existente
+
+            rows = (
+                session.query(Cliente.nome, TurnoCliente.num_vendas, TurnoCliente.total)
+                .outerjoin(Cliente, Cliente.id == TurnoCliente.id_cliente)
+                .filter(TurnoCliente.id_turno == id_turno)
+                .order_by(TurnoCliente.total.desc())
+                .all()
+            )
+            resumo = [[nome or "Cliente Removido", nvendas, round(total, 2)] for nome, nvendas, total in rows]
+
+            turno.fechado_em = datetime.now()
+            fechamento = FechamentoCaixa(
+                id_turno=turno.id,
+                numero_caixa=turno.numero_caixa,
+                operador=turno.operador,
+                aberto_em=turno.aberto_em,
+                fechado_em=turno.fechado_em,
+                num_vendas=turno.num_vendas,
+                num_clientes=len(resumo),
+                total_vendas=turno.total_vendas,
+                resumo_clientes=json.dumps(resumo, ensure_ascii=False),
+            )
+            session.add(fechamento)
+            session.commit()
+            return fechamento
+
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao fechar turno: {e}")
+            return None
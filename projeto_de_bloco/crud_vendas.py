@@ -1,57 +1,190 @@
 # crud_vendas.py
-from commons.db import get_session
-from commons.models import Venda, ItemVenda, Cliente, Produto
+import random
+import time
+from commons.catalogo import catalogo
+from commons.db import get_read_session, get_session
+from commons.models import Venda, ItemVenda, Cliente, Produto, ReservaEstoque, ResumoProdutoDia, ResumoClienteDia
+from crud_reservas import reservado_ativo
+from crud_turnos import acumular_venda_no_turno
 from datetime import datetime
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 # Serviços da venda
 
-def registrar_venda(cliente: Cliente, itens_comprados: list[dict]) -> Venda | None:
+class EstoqueInsuficienteError(Exception):
+    """Levantada quando a baixa condicional de estoque não encontra saldo suficiente."""
+
+    def __init__(self, id_produto: int, quantidade: int):
+        super().__init__(f"Estoque insuficiente para o produto ID {id_produto} (pedido: {quantidade}).")
+        self.id_produto = id_produto
+        self.quantidade = quantidade
+
+
+def _acumular_resumos(session: Session, id_cliente: int, data_hora: datetime, itens_comprados: list[dict]) -> None:
+    """Soma a venda nos resumos diários de produto e de cliente (dentro da transação da venda)."""
+    dia = data_hora.date()
+
+    por_produto: dict[int, list] = {}
+    for item in itens_comprados:
+        qtd_receita = por_produto.setdefault(item['id_produto'], [0, 0.0])
+        qtd_receita[0] += item['quantidade']
+        qtd_receita[1] += item['quantidade'] * item['preco']
+
+    stmt = sqlite_insert(ResumoProdutoDia)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ResumoProdutoDia.id_produto, ResumoProdutoDia.dia],
+            set_={
+                "quantidade": ResumoProdutoDia.quantidade + stmt.excluded.quantidade,
+                "receita": ResumoProdutoDia.receita + stmt.excluded.receita,
+                "num_vendas": ResumoProdutoDia.num_vendas + 1,
+            },
+        ),
+        [
+            {"id_produto": pid, "dia": dia, "quantidade": qtd, "receita": receita, "num_vendas": 1}
+            for pid, (qtd, receita) in por_produto.items()
+        ],
+    )
+
+    stmt = sqlite_insert(ResumoClienteDia).values(
+        id_cliente=id_cliente,
+        dia=dia,
+        quantidade=sum(qtd for qtd, _ in por_produto.values()),
+        receita=sum(receita for _, receita in por_produto.values()),
+        num_vendas=1,
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ResumoClienteDia.id_cliente, ResumoClienteDia.dia],
+            set_={
+                "quantidade": ResumoClienteDia.quantidade + stmt.excluded.quantidade,
+                "receita": ResumoClienteDia.receita + stmt.excluded.receita,
+                "num_vendas": ResumoClienteDia.num_vendas + 1,
+            },
+        )
+    )
+
+
+def _gravar_venda(session: Session, id_cliente: int, itens_comprados: list[dict],
+                  id_carrinho: str | None = None, id_turno: int | None = None,
+                  chave: str | None = None, data_hora: datetime | None = None) -> Venda:
+    """
+    Grava a Venda, os ItensVenda e a baixa de estoque na sessão, sem dar commit.
+    A baixa usa UPDATE ... WHERE quantidade - reservado_por_outros >= n, então nunca
+    deixa o estoque negativo nem consome o que outro carrinho está segurando.
+    As reservas do próprio carrinho viram baixa e são apagadas na mesma transação,
+    e os resumos diários e os totais do turno (se houver) são somados também.
+    `chave`/`data_hora` vêm do diário de vendas (a data é a da nota, não a da gravação).
     """
-    Registra uma nova venda e seus itens no banco de dados.
+    agora = data_hora or datetime.now()
+    nova_venda = Venda(
+        id_cliente=id_cliente,
+        data_hora=agora,
+        id_turno=id_turno,
+        chave=chave
+    )
+    session.add(nova_venda)
+    session.flush() # Pega o id da venda antes do commit
+
+    for item in itens_comprados:
+        reservado_outros = reservado_ativo(item['id_produto'], agora, exceto_carrinho=id_carrinho)
+        resultado = session.execute(
+            update(Produto)
+            .where(Produto.id == item['id_produto'], Produto.quantidade - reservado_outros >= item['quantidade'])
+            .values(quantidade=Produto.quantidade - item['quantidade'])
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount != 1:
+            raise EstoqueInsuficienteError(item['id_produto'], item['quantidade'])
+
+        session.add(ItemVenda(
+            id_venda=nova_venda.id,
+            id_produto=item['id_produto'],
+            quantidade=item['quantidade'],
+            preco_unitario=item['preco']
+        ))
+
+    _acumular_resumos(session, id_cliente, agora, itens_comprados)
+
+    if id_carrinho is not None:
+        session.execute(delete(ReservaEstoque).where(ReservaEstoque.id_carrinho == id_carrinho))
+
+    if id_turno is not None:
+        total_venda = sum(item['quantidade'] * item['preco'] for item in itens_comprados)
+        acumular_venda_no_turno(session, id_turno, id_cliente, total_venda)
+
+    session.flush()
+    return nova_venda
+
+
+def _banco_ocupado(erro: OperationalError) -> bool:
+    msg = str(erro.orig).lower()
+    return "database is locked" in msg or "database is busy" in msg
+
+
+def efetivar_venda(id_cliente: int, itens_comprados: list[dict], id_carrinho: str | None = None,
+                   id_turno: int | None = None, tentativas: int = 5,
+                   chave: str | None = None, data_hora: datetime | None = None) -> Venda:
+    """
+    Grava a venda numa transação, tentando de novo (com backoff) quando outro caixa
+    está com o banco travado. Não imprime nada: levanta EstoqueInsuficienteError
+    ou o erro do banco para quem chamou decidir o que fazer.
+    """
+    for tentativa in range(1, tentativas + 1):
+        with get_session() as session:
+            try:
+                nova_venda = _gravar_venda(session, id_cliente, itens_comprados, id_carrinho, id_turno,
+                                           chave, data_hora)
+                session.commit()
+                break
+            except OperationalError as e:
+                session.rollback()
+                if not _banco_ocupado(e) or tentativa == tentativas:
+                    raise
+            except EstoqueInsuficienteError as e:
+                session.rollback()
+                catalogo.invalidar(e.id_produto)  # o estoque em cache estava defasado
+                raise
+            except Exception:
+                session.rollback()
+                raise
+        time.sleep(random.uniform(0, 0.01 * 2 ** tentativa))
+
+    for item in itens_comprados:
+        catalogo.ajustar_estoque(item['id_produto'], -item['quantidade'])
+    return nova_venda
+
+
+def registrar_venda(cliente: Cliente, itens_comprados: list[dict], id_carrinho: str | None = None,
+                    id_turno: int | None = None) -> Venda | None:
+    """
+    Registra uma nova venda, seus itens e a baixa de estoque numa única transação.
     itens_comprados é uma lista de dicionários com 'id_produto', 'quantidade', 'preco'.
+    Se vier id_carrinho, as reservas dele são convertidas em baixa; se vier
+    id_turno, a venda entra nos totais do turno do caixa.
+    Se algum produto não tiver estoque suficiente, nada é gravado.
     """
     if not itens_comprados:
         return None
 
     try:
-        with get_session() as session:
-            # Cria a Venda
-            nova_venda = Venda(
-                id_cliente=cliente.id,
-                data_hora=datetime.now()
-            )
-            session.add(nova_venda)
-            session.flush() # Pega o id da venda antes do commit
-
-            # Cria os ItensVenda (detalhes)
-            itens_venda_obj = []
-            for item in itens_comprados:
-                item_venda = ItemVenda(
-                    id_venda=nova_venda.id,
-                    id_produto=item['id_produto'],
-                    quantidade=item['quantidade'],
-                    preco_unitario=item['preco']
-                )
-                itens_venda_obj.append(item_venda)
-            
-            session.add_all(itens_venda_obj)
-            session.commit()
-            session.refresh(nova_venda)
-            return nova_venda
-            
+        return efetivar_venda(cliente.id, itens_comprados, id_carrinho, id_turno)
+
+    except EstoqueInsuficienteError as e:
+        print(f"Erro: {e}")
+        return None
     except IntegrityError as e:
-        session.rollback()
         print(f"Erro de integridade ao registrar venda: {e}")
         return None
     except Exception as e:
-        session.rollback()
         print(f"Erro ao registrar venda: {e}")
         return None
 
 def consultar_vendas() -> list[Venda]:
-    with get_session() as session:
+    with get_read_session() as session:
         return (
             session.query(Venda)
             .options(
@@ -60,4 +193,164 @@ def consultar_vendas() -> list[Venda]:
             )
             .order_by(Venda.data_hora.desc())
             .all()
-        )
\ No newline at end of file
+        )
+
+
+def consultar_resumo_vendas(id_cliente: int | None = None) -> list:
+    """
+    Lista as vendas já com o total calculado no banco (GROUP BY), sem carregar itens.
+    Cada linha tem: id, data_hora, id_cliente, cliente_nome, total.
+    """
+    total = func.coalesce(func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario), 0.0)
+    stmt = (
+        select(
+            Venda.id,
+            Venda.data_hora,
+            Venda.id_cliente,
+            Cliente.nome.label("cliente_nome"),
+            total.label("total"),
+        )
+        .outerjoin(Cliente, Cliente.id == Venda.id_cliente)
+        .outerjoin(ItemVenda, ItemVenda.id_venda == Venda.id)
+        .group_by(Venda.id, Venda.data_hora, Venda.id_cliente, Cliente.nome)
+        .order_by(Venda.data_hora.desc())
+    )
+    if id_cliente is not None:
+        stmt = stmt.where(Venda.id_cliente == id_cliente)
+
+    with get_read_session() as session:
+        return session.execute(stmt).all()
+
+
+def consultar_pagina_vendas(tamanho: int = 20, apos: tuple | None = None, antes: tuple | None = None,
+                            id_cliente: int | None = None, data_inicio: datetime | None = None,
+                            data_fim: datetime | None = None) -> list:
+    """
+    Uma página de vendas (mais recentes primeiro) com paginação por chave (data_hora, id).
+    `apos` = (data_hora, id) da última linha da página atual -> próxima página.
+    `antes` = (data_hora, id) da primeira linha da página atual -> página anterior.
+    Custo proporcional ao tamanho da página, não ao total de vendas (usa o índice
+    em (data_hora, id)). Cada linha tem: id, data_hora, id_cliente, cliente_nome, total.
+    """
+    chave = tuple_(Venda.data_hora, Venda.id)
+
+    pagina = select(Venda.id, Venda.data_hora, Venda.id_cliente)
+    if id_cliente is not None:
+        pagina = pagina.where(Venda.id_cliente == id_cliente)
+    if data_inicio is not None:
+        pagina = pagina.where(Venda.data_hora >= data_inicio)
+    if data_fim is not None:
+        pagina = pagina.where(Venda.data_hora < data_fim)
+
+    if antes is not None:
+        # volta uma página: pega as `tamanho` vendas logo depois da primeira linha, em ordem crescente
+        pagina = pagina.where(chave > tuple_(*antes)).order_by(Venda.data_hora.asc(), Venda.id.asc())
+    else:
+        if apos is not None:
+            pagina = pagina.where(chave < tuple_(*apos))
+        pagina = pagina.order_by(Venda.data_hora.desc(), Venda.id.desc())
+    pagina = pagina.limit(tamanho).subquery()
+
+    total = func.coalesce(func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario), 0.0)
+    stmt = (
+        select(
+            pagina.c.id,
+            pagina.c.data_hora,
+            pagina.c.id_cliente,
+            Cliente.nome.label("cliente_nome"),
+            total.label("total"),
+        )
+        .outerjoin(Cliente, Cliente.id == pagina.c.id_cliente)
+        .outerjoin(ItemVenda, ItemVenda.id_venda == pagina.c.id)
+        .group_by(pagina.c.id, pagina.c.data_hora, pagina.c.id_cliente, Cliente.nome)
+        .order_by(pagina.c.data_hora.desc(), pagina.c.id.desc())
+    )
+
+    with get_read_session() as session:
+        return session.execute(stmt).all()
+
+
+def buscar_venda(id_venda: int, id_cliente: int | None = None) -> Venda | None:
+    """Carrega uma venda com cliente, itens e produtos (para detalhe / nota fiscal)."""
+    with get_read_session() as session:
+        venda = session.get(
+            Venda,
+            id_venda,
+            options=[
+                joinedload(Venda.cliente),
+                selectinload(Venda.itens).joinedload(ItemVenda.produto),
+            ],
+        )
+        if venda is None or (id_cliente is not None and venda.id_cliente != id_cliente):
+            return None
+        return venda
+
+
+def reconstruir_resumos(apenas_se_vazio: bool = False) -> bool:
+    """
+    Refaz os resumos diários de produto e cliente a partir do histórico completo
+    (dois INSERT ... SELECT ... GROUP BY, numa transação).
+    Com apenas_se_vazio=True só roda quando há vendas mas os resumos estão vazios
+    (banco antigo, de antes dos resumos existirem).
+    """
+    with get_session() as session:
+        try:
+            if apenas_se_vazio:
+                tem_resumo = session.query(ResumoClienteDia.id_cliente).first() is not None
+                tem_venda = session.query(Venda.id).first() is not None
+                if tem_resumo or not tem_venda:
+                    return False
+
+            session.execute(delete(ResumoProdutoDia))
+            session.execute(delete(ResumoClienteDia))
+
+            dia = func.date(Venda.data_hora)
+            session.execute(
+                insert(ResumoProdutoDia).from_select(
+                    ["id_produto", "dia", "quantidade", "receita", "num_vendas"],
+                    select(
+                        ItemVenda.id_produto,
+                        dia,
+                        func.sum(ItemVenda.quantidade),
+                        func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario),
+                        func.count(func.distinct(Venda.id)),
+                    )
+                    .join(Venda, Venda.id == ItemVenda.id_venda)
+                    .group_by(ItemVenda.id_produto, dia),
+                )
+            )
+
+            por_venda = (
+                select(
+                    Venda.id_cliente.label("id_cliente"),
+                    dia.label("dia"),
+                    func.sum(ItemVenda.quantidade).label("quantidade"),
+                    func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario).label("receita"),
+                )
+                .join(ItemVenda, ItemVenda.id_venda == Venda.id)
+                .group_by(Venda.id)
+                .subquery()
+            )
+            session.execute(
+                insert(ResumoClienteDia).from_select(
+                    ["id_cliente", "dia", "quantidade", "receita", "num_vendas"],
+                    select(
+                        por_venda.c.id_cliente,
+                        por_venda.c.dia,
+                        func.sum(por_venda.c.quantidade),
+                        func.sum(por_venda.c.receita),
+                        func.count(),
+                    )
+                    .where(por_venda.c.id_cliente.is_not(None))
+                    .group_by(por_venda.c.id_cliente, por_venda.c.dia),
+                )
+            )
+
+            session.commit()
+            print("Resumos de vendas reconstruídos a partir do histórico.")
+            return True
+
+        except Exception as e:
+            session.rollback()
+            print(f"Erro ao reconstruir resumos de vendas: {e}")
+            return False
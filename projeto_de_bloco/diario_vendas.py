@@ -0,0 +1,356 @@
+# diario_vendas.py
+"""
+Diário das vendas da fila (python main.py --fila-vendas): um arquivo só de
+acréscimos, por caixa, em dados/diario/caixa-N/.
+
+Com a fila ligada, a venda é escrita no diário (e o fsync confirmado) antes
+de entrar na fila e da nota ser impressa; o banco vem depois, pela thread
+da fila. Se o processo cair com vendas na fila, o boot seguinte relê o
+diário (reaplicar_diario) e grava as que não chegaram ao banco. A chave da
+venda (Venda.chave, o id do carrinho) torna a releitura idempotente: o que
+já está no banco não é gravado de novo. As reservas e liberações do
+carrinho também vão para o diário, e os carrinhos que ficaram abertos na
+queda têm as reservas devolvidas no boot, em vez de segurarem o estoque
+até expirar.
+
+Formato: segmentos 00000001.diario, 00000002.diario... (um novo a cada
+TAMANHO_SEGMENTO bytes). Cada registro é [tamanho u32][crc32 u32][tipo u8 +
+campos em struct]. Um registro cortado ao meio ou com o CRC errado (queda
+no meio da escrita) encerra a leitura daquele segmento. O fsync é em
+grupo: vários caixas/threads esperando juntos pagam um fsync só. Só a
+venda espera o fsync; os outros registros vão juntos no próximo.
+
+Teste (custo no caixa e recuperação depois de uma queda):
+python -m medicoes.diario_queda --vendas 500
+"""
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+PASTA_DIARIOS = Path(__file__).parent / "dados" / "diario"
+TAMANHO_SEGMENTO = 4 << 20
+MARCA_SEGMENTO = b"DIARIO1\n"
+
+# tipos de registro
+RESERVA, LIBERACAO, VENDA, GRAVADA, RECUSADA = 1, 2, 3, 4, 5
+
+_CABECALHO = struct.Struct("<II")        # tamanho do corpo, crc32 do corpo
+_TIPO = struct.Struct("<B")
+_RESERVA = struct.Struct("<II")          # id_produto, quantidade
+_VENDA = struct.Struct("<IIdH")          # id_cliente, id_turno (0 = sem turno), data_hora, num. de itens
+_ITEM = struct.Struct("<IId")            # id_produto, quantidade, preço
+_ID_VENDA = struct.Struct("<I")
+
+
+def pasta_do_caixa(numero_caixa: int) -> Path:
+    return PASTA_DIARIOS / f"caixa-{numero_caixa}"
+
+
+def _texto(valor: str) -> bytes:
+    dados = valor.encode("utf-8")
+    return bytes([len(dados)]) + dados
+
+
+def _ler_texto(corpo: bytes, pos: int) -> tuple[str, int]:
+    tamanho = corpo[pos]
+    return corpo[pos + 1:pos + 1 + tamanho].decode("utf-8"), pos + 1 + tamanho
+
+
+def _registro(tipo: int, campos: bytes) -> bytes:
+    corpo = _TIPO.pack(tipo) + campos
+    return _CABECALHO.pack(len(corpo), zlib.crc32(corpo)) + corpo
+
+
+@dataclass
+class VendaDoDiario:
+    chave: str
+    id_carrinho: str | None
+    id_cliente: int
+    id_turno: int | None
+    data_hora: datetime
+    itens: list[dict]
+
+
+def _decodificar(corpo: bytes) -> tuple:
+    """corpo de um registro → (tipo, campos...)."""
+    tipo = corpo[0]
+    if tipo in (RESERVA, LIBERACAO, RECUSADA, GRAVADA):
+        texto, pos = _ler_texto(corpo, 1)
+        if tipo == RESERVA:
+            return (tipo, texto, *_RESERVA.unpack_from(corpo, pos))
+        if tipo == GRAVADA:
+            return (tipo, texto, *_ID_VENDA.unpack_from(corpo, pos))
+        return tipo, texto
+    if tipo == VENDA:
+        chave, pos = _ler_texto(corpo, 1)
+        id_carrinho, pos = _ler_texto(corpo, pos)
+        id_cliente, id_turno, instante, num_itens = _VENDA.unpack_from(corpo, pos)
+        pos += _VENDA.size
+        itens = []
+        for _ in range(num_itens):
+            id_produto, quantidade, preco = _ITEM.unpack_from(corpo, pos)
+            pos += _ITEM.size
+            itens.append({"id_produto": id_produto, "quantidade": quantidade, "preco": preco})
+        return tipo, VendaDoDiario(chave, id_carrinho or None, id_cliente, id_turno or None,
+                                   datetime.fromtimestamp(instante), itens)
+    raise ValueError(f"tipo de registro desconhecido: {tipo}")
+
+
+def _segmentos(pasta: Path) -> list[Path]:
+    return sorted(pasta.glob("*.diario"))
+
+
+def ler_segmento(caminho: Path) -> tuple[list[tuple], bool]:
+    """Registros de um segmento, na ordem. O bool diz se o fim estava cortado/corrompido."""
+    dados = caminho.read_bytes()
+    if not dados.startswith(MARCA_SEGMENTO):
+        return [], bool(dados)
+    registros = []
+    pos = len(MARCA_SEGMENTO)
+    while pos < len(dados):
+        if pos + _CABECALHO.size > len(dados):
+            return registros, True
+        tamanho, crc = _CABECALHO.unpack_from(dados, pos)
+        corpo = dados[pos + _CABECALHO.size:pos + _CABECALHO.size + tamanho]
+        if len(corpo) != tamanho or zlib.crc32(corpo) != crc:
+            return registros, True
+        registros.append(_decodificar(corpo))
+        pos += _CABECALHO.size + tamanho
+    return registros, False
+
+
+class Diario:
+    """Escrita do diário de um caixa. Seguro para várias threads."""
+
+    def __init__(self, pasta: str | Path, tamanho_segmento: int = TAMANHO_SEGMENTO):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.tamanho_segmento = tamanho_segmento
+        self.fsyncs = 0
+        self._cond = threading.Condition()
+        self._escritos = 0          # registros escritos no arquivo (no cache do SO)
+        self._sincronizados = 0     # registros que já passaram por um fsync
+        self._sincronizando = False
+        # venda ainda não resolvida (nem gravada nem recusada) → segmento onde está
+        self._pendentes: dict[str, int] = {}
+        existentes = _segmentos(self.pasta)
+        self._numero = int(existentes[-1].stem) if existentes else 0
+        self._fd = None
+        self._abrir_segmento()
+        # os segmentos de antes são do reaplicar_diario do boot: se alguma venda
+        # deles não foi gravada, eles ficam para o próximo boot
+        self._primeiro = self._numero
+
+    # --- registros --------------------------------------------------------
+
+    def anotar_reserva(self, id_carrinho: str, id_produto: int, quantidade: int) -> None:
+        self._anexar(_registro(RESERVA, _texto(id_carrinho) + _RESERVA.pack(id_produto, quantidade)))
+
+    def anotar_liberacao(self, id_carrinho: str) -> None:
+        self._anexar(_registro(LIBERACAO, _texto(id_carrinho)))
+
+    def anotar_venda(self, chave: str, id_cliente: int, itens: list[dict], id_carrinho: str | None,
+                     id_turno: int | None, data_hora: datetime) -> None:
+        """Escreve a venda e só volta depois do fsync (a venda sobrevive a uma queda)."""
+        campos = [_texto(chave), _texto(id_carrinho or ""),
+                  _VENDA.pack(id_cliente, id_turno or 0, data_hora.timestamp(), len(itens))]
+        campos += [_ITEM.pack(item['id_produto'], item['quantidade'], item['preco']) for item in itens]
+        seq = self._anexar(_registro(VENDA, b"".join(campos)), chave)
+        self._sincronizar_ate(seq)
+
+    def anotar_gravadas(self, gravadas: list[tuple[str, int]]) -> None:
+        """Vendas que chegaram ao banco: (chave, id da venda)."""
+        if gravadas:
+            self._anexar(b"".join(_registro(GRAVADA, _texto(chave) + _ID_VENDA.pack(id_venda))
+                                  for chave, id_venda in gravadas),
+                         resolvidas=[chave for chave, _ in gravadas])
+
+    def anotar_recusada(self, chave: str) -> None:
+        self._anexar(_registro(RECUSADA, _texto(chave)), resolvidas=[chave])
+
+    def fechar(self) -> None:
+        """fsync do que falta; sem venda pendente, os segmentos antigos deste diário são apagados."""
+        with self._cond:
+            while self._sincronizando:
+                self._cond.wait()
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._apagar_resolvidos()
+
+    # --- arquivo ----------------------------------------------------------
+
+    def _abrir_segmento(self) -> None:
+        self._numero += 1
+        caminho = self.pasta / f"{self._numero:08d}.diario"
+        self._fd = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self._fd, MARCA_SEGMENTO)
+        self._tamanho = len(MARCA_SEGMENTO)
+        # o arquivo novo só existe depois do fsync da pasta
+        fd_pasta = os.open(self.pasta, os.O_RDONLY)
+        try:
+            os.fsync(fd_pasta)
+        finally:
+            os.close(fd_pasta)
+
+    def _anexar(self, dados: bytes, chave_venda: str | None = None, resolvidas: list[str] = ()) -> int:
+        with self._cond:
+            if self._tamanho + len(dados) > self.tamanho_segmento and self._tamanho > len(MARCA_SEGMENTO):
+                self._trocar_segmento()
+            os.write(self._fd, dados)
+            self._tamanho += len(dados)
+            self._escritos += 1
+            if chave_venda is not None:
+                self._pendentes[chave_venda] = self._numero
+            for chave in resolvidas:
+                self._pendentes.pop(chave, None)
+            return self._escritos
+
+    def _trocar_segmento(self) -> None:
+        # chamado com a trava: espera o fsync em andamento, que usa o fd atual
+        while self._sincronizando:
+            self._cond.wait()
+        os.fsync(self._fd)
+        self.fsyncs += 1
+        os.close(self._fd)
+        self._sincronizados = self._escritos
+        self._abrir_segmento()
+        self._apagar_resolvidos()
+
+    def _apagar_resolvidos(self) -> None:
+        # segmentos antes do primeiro que ainda tem venda pendente não servem mais
+        # (reservas de carrinhos abertos neles só expiram, como sem o diário)
+        limite = min(self._pendentes.values(), default=self._numero + (self._fd is None))
+        for caminho in _segmentos(self.pasta):
+            if self._primeiro <= int(caminho.stem) < limite:
+                caminho.unlink()
+
+    def _sincronizar_ate(self, seq: int) -> None:
+        """fsync em grupo: quem chega durante um fsync espera e vai no próximo, junto com os outros."""
+        with self._cond:
+            while self._sincronizados < seq:
+                if self._sincronizando:
+                    self._cond.wait()
+                    continue
+                self._sincronizando = True
+                alvo, fd = self._escritos, self._fd
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._cond.acquire()
+                    self._sincronizando = False
+                    self._cond.notify_all()
+                self.fsyncs += 1
+                self._sincronizados = max(self._sincronizados, alvo)
+
+
+_diario: Diario | None = None
+
+
+def abrir_diario(numero_caixa: int) -> Diario:
+    """Começa um segmento novo no diário do caixa (depois do reaplicar_diario do boot)."""
+    global _diario
+    if _diario is None:
+        _diario = Diario(pasta_do_caixa(numero_caixa))
+    return _diario
+
+
+def diario_ativo() -> Diario | None:
+    return _diario
+
+
+def fechar_diario() -> None:
+    global _diario
+    if _diario is not None:
+        _diario.fechar()
+        _diario = None
+
+
+def anotar_reserva(id_carrinho: str, id_produto: int, quantidade: int) -> None:
+    if _diario is not None:
+        _diario.anotar_reserva(id_carrinho, id_produto, quantidade)
+
+
+def anotar_liberacao(id_carrinho: str) -> None:
+    if _diario is not None:
+        _diario.anotar_liberacao(id_carrinho)
+
+
+# ---------------------------------------------------------------------------
+# Boot: vendas do diário que não chegaram ao banco
+
+def reaplicar_diario(pasta: str | Path) -> dict | None:
+    """
+    Relê os segmentos do caixa e grava no banco as vendas sem registro de
+    gravada/recusada cuja chave ainda não está em `vendas`; devolve as
+    reservas dos carrinhos que ficaram abertos. Sem erro, os segmentos lidos
+    são apagados. Retorna as contagens (None se não havia diário).
+    """
+    from sqlalchemy import select
+    from commons.db import get_session
+    from commons.models import Venda
+    from crud_reservas import liberar_carrinho
+    from crud_vendas import EstoqueInsuficienteError, efetivar_venda
+
+    pasta = Path(pasta)
+    segmentos = _segmentos(pasta) if pasta.is_dir() else []
+    if not segmentos:
+        return None
+
+    contagem = {"registros": 0, "cortados": 0, "reaplicadas": 0, "ja_no_banco": 0,
+                "recusadas": 0, "carrinhos_liberados": 0}
+    vendas: dict[str, VendaDoDiario] = {}
+    carrinhos_abertos: set[str] = set()
+    for segmento in segmentos:
+        registros, cortado = ler_segmento(segmento)
+        contagem["registros"] += len(registros)
+        contagem["cortados"] += cortado
+        for tipo, *campos in registros:
+            if tipo == RESERVA:
+                carrinhos_abertos.add(campos[0])
+            elif tipo == LIBERACAO:
+                carrinhos_abertos.discard(campos[0])
+            elif tipo == VENDA:
+                vendas[campos[0].chave] = campos[0]
+                carrinhos_abertos.discard(campos[0].id_carrinho)
+            else:
+                vendas.pop(campos[0], None)
+
+    erros = 0
+    if vendas:
+        with get_session() as session:
+            no_banco = set(session.execute(select(Venda.chave).where(Venda.chave.in_(vendas))).scalars())
+        contagem["ja_no_banco"] = len(no_banco)
+        for chave, venda in vendas.items():
+            if chave in no_banco:
+                continue
+            try:
+                efetivar_venda(venda.id_cliente, venda.itens, venda.id_carrinho, venda.id_turno,
+                               chave=chave, data_hora=venda.data_hora)
+                contagem["reaplicadas"] += 1
+            except EstoqueInsuficienteError as e:
+                print(f"ATENÇÃO: venda do diário de {venda.data_hora:%d/%m/%Y %H:%M} não foi gravada: {e}")
+                contagem["recusadas"] += 1
+            except Exception as e:
+                print(f"Erro ao reaplicar venda do diário: {e}")
+                erros += 1
+
+    for id_carrinho in carrinhos_abertos:
+        contagem["carrinhos_liberados"] += liberar_carrinho(id_carrinho) > 0
+
+    if erros:
+        print(f"{erros} venda(s) do diário ficaram para o próximo boot.")
+    else:
+        for segmento in segmentos:
+            segmento.unlink()
+    if any(contagem[k] for k in ("reaplicadas", "recusadas", "cortados", "carrinhos_liberados")):
+        print(f"Diário de vendas: {contagem['reaplicadas']} venda(s) recuperada(s), "
+              f"{contagem['recusadas']} recusada(s), {contagem['carrinhos_liberados']} carrinho(s) liberado(s).")
+    return contagem
@@ -0,0 +1,433 @@
+# extracao_cards.py
+"""
+Extração dos cards de produto das páginas raspadas.
+
+Três backends, escolhidos por fonte (campo `extrator` da FonteProdutos):
+
+- "lxml":       parse incremental com lxml (se estiver instalado);
+- "htmlparser": parse incremental com o html.parser da biblioteca padrão;
+- "bs4":        árvore inteira no BeautifulSoup (o jeito antigo; aceita
+                qualquer seletor CSS).
+
+Os dois incrementais recebem a página em pedaços e entregam cada card assim
+que ele fecha, sem montar a árvore do documento. Eles entendem seletores
+simples (tag, .classe, #id, [atributo], [atributo=valor], combinados por
+espaço ou ">"). Com "auto" (padrão) usa lxml, senão htmlparser, e cai para
+bs4 quando algum seletor da fonte não é desse tipo.
+
+Card sem nome, preço ou quantidade, ou com número que não dá para ler, é
+descartado e contado por motivo em `Extracao.rejeitados`.
+
+Teste de tempo e memória de cada backend:
+python -m medicoes.extratores_cards --cards 100000
+"""
+from __future__ import annotations
+
+import codecs
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING, Iterable, Iterator
+from urllib.parse import urljoin
+
+if TYPE_CHECKING:
+    from motor_scraping import FonteProdutos
+
+TAMANHO_PEDACO = 64 * 1024
+BACKENDS = ("auto", "lxml", "htmlparser", "bs4")
+
+# Elementos sem tag de fechamento
+_VAZIOS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+@dataclass(slots=True)
+class Extracao:
+    produtos: list[dict] = field(default_factory=list)
+    proxima_url: str | None = None
+    rejeitados: Counter = field(default_factory=Counter)
+
+
+def _numero(texto: str) -> float:
+    limpo = texto.replace('R$', '').replace('\xa0', '').replace(',', '.').strip()
+    return float(re.search(r'[\d\.]+', limpo).group())
+
+
+def _montar_produto(nome, preco_attr, preco_texto, qtd_attr, qtd_texto, rejeitados: Counter) -> dict | None:
+    """Produto do card, ou None (com o motivo contado em `rejeitados`)."""
+    if nome is None:
+        motivo = "sem nome"
+    elif preco_texto is None:
+        motivo = "sem preço"
+    elif qtd_texto is None:
+        motivo = "sem quantidade"
+    elif not nome:
+        motivo = "nome vazio"
+    else:
+        try:
+            preco = _numero(preco_attr or preco_texto)
+        except (AttributeError, ValueError):
+            motivo = "preço inválido"
+        else:
+            try:
+                quantidade = int(qtd_attr or _numero(qtd_texto))
+            except (AttributeError, ValueError):
+                motivo = "quantidade inválida"
+            else:
+                return {'nome': nome, 'quantidade': quantidade, 'preco': preco}
+    rejeitados[motivo] += 1
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Seletores simples
+
+@dataclass(frozen=True, slots=True)
+class _Composto:
+    tag: str | None
+    id: str | None
+    classes: frozenset
+    atributos: tuple          # ((nome, valor ou None), ...)
+
+    def casa(self, tag: str, attrs) -> bool:
+        if self.tag and self.tag != tag:
+            return False
+        if self.id and attrs.get("id") != self.id:
+            return False
+        if self.classes and not self.classes.issubset((attrs.get("class") or "").split()):
+            return False
+        for nome, valor in self.atributos:
+            atual = attrs.get(nome)
+            if atual is None or (valor is not None and atual != valor):
+                return False
+        return True
+
+
+_TOKEN = re.compile(r"""
+    \s*(?P<filho>>)\s* | (?P<espaco>\s+)
+  | (?P<tag>[a-zA-Z][\w-]*|\*)
+  | \.(?P<classe>[\w-]+)
+  | \#(?P<id>[\w-]+)
+  | \[\s*(?P<attr>[\w-]+)\s*(?:=\s*(?:"(?P<v1>[^"]*)"|'(?P<v2>[^']*)'|(?P<v3>[\w-]+))\s*)?\]
+""", re.X)
+
+
+def _compilar_seletor(seletor: str | None) -> list[tuple[str, _Composto]] | None:
+    """[(combinador, composto), ...] do seletor, ou None se ele não for do tipo simples."""
+    if not seletor or not seletor.strip():
+        return None
+    passos = []
+    combinador = " "
+    tag, id_, classes, atributos = None, None, set(), []
+    vazio = True
+    pos, texto = 0, seletor.strip()
+    while pos < len(texto):
+        m = _TOKEN.match(texto, pos)
+        if not m:
+            return None
+        pos = m.end()
+        if m.group("filho") or m.group("espaco"):
+            if vazio:
+                return None
+            passos.append((combinador, _Composto(tag, id_, frozenset(classes), tuple(atributos))))
+            combinador = ">" if m.group("filho") else " "
+            tag, id_, classes, atributos = None, None, set(), []
+            vazio = True
+            continue
+        if m.group("tag"):
+            if not vazio:
+                return None
+            tag = None if m.group("tag") == "*" else m.group("tag").lower()
+        elif m.group("classe"):
+            classes.add(m.group("classe"))
+        elif m.group("id"):
+            id_ = m.group("id")
+        else:
+            valor = next((v for v in (m.group("v1"), m.group("v2"), m.group("v3")) if v is not None), None)
+            atributos.append((m.group("attr").lower(), valor))
+        vazio = False
+    if vazio:
+        return None
+    passos.append((combinador, _Composto(tag, id_, frozenset(classes), tuple(atributos))))
+    return passos
+
+
+def _casa_cadeia(passos: list[tuple[str, _Composto]], cadeia: list[tuple[str, object]]) -> bool:
+    """O último elemento de `cadeia` (raiz → elemento, pares (tag, atributos)) casa com o seletor?"""
+
+    def casa(i_passo: int, i_no: int) -> bool:
+        if not passos[i_passo][1].casa(*cadeia[i_no]):
+            return False
+        if i_passo == 0:
+            return True
+        if passos[i_passo][0] == ">":
+            return i_no > 0 and casa(i_passo - 1, i_no - 1)
+        return any(casa(i_passo - 1, j) for j in range(i_no - 1, -1, -1))
+
+    return casa(len(passos) - 1, len(cadeia) - 1)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+
+class _ParserIncremental(HTMLParser):
+    """Máquina de estados sobre o html.parser: pilha de elementos abertos, card atual e campos dele."""
+
+    def __init__(self, extrator: ExtratorCards, url: str, extracao: Extracao):
+        super().__init__(convert_charrefs=True)
+        self.ex = extrator
+        self.url = url
+        self.extracao = extracao
+        self.prontos: list[dict] = []
+        self.pilha: list[tuple[str, dict]] = []
+        self.nivel_card: int | None = None
+        # campo → [nível na pilha (None depois de fechado), atributo, partes do texto]; ausente = não achado
+        self.campos: dict[str, list] = {}
+        self.texto: list[str] = []
+
+    def _descarregar_texto(self) -> None:
+        if not self.texto:
+            return
+        pedaco = "".join(self.texto).strip()
+        self.texto.clear()
+        if pedaco:
+            for estado in self.campos.values():
+                if estado[0] is not None:
+                    estado[2].append(pedaco)
+
+    def _abrir(self, tag: str, attrs: dict) -> None:
+        cadeia = self.pilha
+        if self.nivel_card is None:
+            card = self.ex.card
+            if card[-1][1].casa(tag, attrs) and _casa_cadeia(card, cadeia):
+                self.nivel_card = len(cadeia) - 1
+                self.campos = {}
+        else:
+            for campo, passos, atributo in self.ex.campos:
+                if campo not in self.campos and passos[-1][1].casa(tag, attrs) and _casa_cadeia(passos, cadeia):
+                    self.campos[campo] = [len(cadeia) - 1, attrs.get(atributo) if atributo else None, []]
+        proxima = self.ex.proxima
+        if (proxima and self.extracao.proxima_url is None and attrs.get("href")
+                and proxima[-1][1].casa(tag, attrs) and _casa_cadeia(proxima, cadeia)):
+            self.extracao.proxima_url = urljoin(self.url, attrs["href"])
+
+    def _fechar(self, nivel: int) -> None:
+        for estado in self.campos.values():
+            if estado[0] == nivel:
+                estado[0] = None
+        if nivel == self.nivel_card:
+            self.nivel_card = None
+            nome, preco, qtd = (self.campos.get(c) for c in ("nome", "preco", "qtd"))
+            produto = _montar_produto(
+                "".join(nome[2]) if nome else None,
+                preco[1] if preco else None, "".join(preco[2]) if preco else None,
+                qtd[1] if qtd else None, "".join(qtd[2]) if qtd else None,
+                self.extracao.rejeitados,
+            )
+            if produto:
+                self.prontos.append(produto)
+
+    def handle_starttag(self, tag, attrs):
+        self._descarregar_texto()
+        self.pilha.append((tag, dict(attrs)))
+        self._abrir(tag, self.pilha[-1][1])
+        if tag in _VAZIOS:
+            self._fechar(len(self.pilha) - 1)
+            self.pilha.pop()
+
+    def handle_startendtag(self, tag, attrs):
+        self._descarregar_texto()
+        self.pilha.append((tag, dict(attrs)))
+        self._abrir(tag, self.pilha[-1][1])
+        self._fechar(len(self.pilha) - 1)
+        self.pilha.pop()
+
+    def handle_endtag(self, tag):
+        self._descarregar_texto()
+        # fecha até o elemento correspondente (tags sem fechamento no meio fecham junto)
+        for nivel in range(len(self.pilha) - 1, -1, -1):
+            if self.pilha[nivel][0] == tag:
+                for aberto in range(len(self.pilha) - 1, nivel - 1, -1):
+                    self._fechar(aberto)
+                del self.pilha[nivel:]
+                return
+
+    def handle_data(self, data):
+        if self.campos:
+            self.texto.append(data)
+
+    def terminar(self) -> None:
+        self.close()
+        self._descarregar_texto()
+        for aberto in range(len(self.pilha) - 1, -1, -1):
+            self._fechar(aberto)
+        self.pilha.clear()
+
+
+def _cadeia_lxml(elemento, ate=None) -> list[tuple[str, object]]:
+    cadeia = []
+    while elemento is not None and elemento is not ate:
+        cadeia.append((elemento.tag, elemento.attrib))
+        elemento = elemento.getparent()
+    cadeia.reverse()
+    return cadeia
+
+
+class ExtratorCards:
+    """Seletores de uma fonte já compilados e o backend escolhido para ela."""
+
+    def __init__(self, fonte: FonteProdutos, backend: str = "auto"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Extrator desconhecido: {backend!r} (use um de {', '.join(BACKENDS)})")
+        self.fonte = fonte
+        self.card = _compilar_seletor(fonte.seletor_card)
+        self.campos = [
+            ("nome", _compilar_seletor(fonte.seletor_nome), None),
+            ("preco", _compilar_seletor(fonte.seletor_preco), "data-preco"),
+            ("qtd", _compilar_seletor(fonte.seletor_qtd), "data-qtd"),
+        ]
+        self.proxima = _compilar_seletor(fonte.seletor_proxima) if fonte.seletor_proxima else None
+        simples = (self.card is not None and all(p for _, p, _ in self.campos)
+                   and (self.proxima is not None or not fonte.seletor_proxima))
+
+        if backend == "auto":
+            backend = "bs4"
+            if simples:
+                try:
+                    import lxml.etree  # noqa: F401
+                    backend = "lxml"
+                except ImportError:
+                    backend = "htmlparser"
+        elif backend != "bs4" and not simples:
+            raise ValueError(f"A fonte {fonte.nome!r} usa seletores que o extrator {backend!r} não entende.")
+        self.backend = backend
+
+    def iterar(self, partes: Iterable[bytes], url: str = "", extracao: Extracao | None = None) -> Iterator[dict]:
+        """
+        Produtos à medida que os cards fecham. O link da próxima página e os
+        descartes por motivo ficam em `extracao`.
+        """
+        extracao = extracao if extracao is not None else Extracao()
+        if self.backend == "lxml":
+            yield from self._iterar_lxml(partes, url, extracao)
+        elif self.backend == "htmlparser":
+            yield from self._iterar_htmlparser(partes, url, extracao)
+        else:
+            yield from self._iterar_bs4(b"".join(partes), url, extracao)
+
+    def extrair(self, conteudo: bytes, url: str = "") -> Extracao:
+        extracao = Extracao()
+        pedacos = (conteudo[i:i + TAMANHO_PEDACO] for i in range(0, len(conteudo), TAMANHO_PEDACO))
+        extracao.produtos.extend(self.iterar(pedacos, url, extracao))
+        return extracao
+
+    def _iterar_htmlparser(self, partes, url, extracao):
+        decodificador = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parser = _ParserIncremental(self, url, extracao)
+        for parte in partes:
+            parser.feed(decodificador.decode(parte))
+            yield from parser.prontos
+            parser.prontos.clear()
+        parser.feed(decodificador.decode(b"", final=True))
+        parser.terminar()
+        yield from parser.prontos
+
+    def _iterar_lxml(self, partes, url, extracao):
+        from lxml import etree
+
+        parser = etree.HTMLPullParser(events=("end",), encoding="utf-8")
+        card, proxima = self.card, self.proxima
+
+        def processar():
+            for _evento, elemento in parser.read_events():
+                tag = elemento.tag
+                if not isinstance(tag, str):
+                    continue   # comentário
+                if (proxima and extracao.proxima_url is None and elemento.get("href")
+                        and proxima[-1][1].casa(tag, elemento.attrib)
+                        and _casa_cadeia(proxima, _cadeia_lxml(elemento))):
+                    extracao.proxima_url = urljoin(url, elemento.get("href"))
+                if not (card[-1][1].casa(tag, elemento.attrib) and _casa_cadeia(card, _cadeia_lxml(elemento))):
+                    continue
+
+                produto = self._produto_lxml(elemento, extracao.rejeitados)
+                if produto:
+                    yield produto
+                # card pronto: solta ele e o que já passou antes dele (em cada nível acima),
+                # para a árvore não crescer com a página
+                elemento.clear(keep_tail=False)
+                no = elemento
+                while no.getparent() is not None:
+                    while no.getprevious() is not None:
+                        del no.getparent()[0]
+                    no = no.getparent()
+
+        for parte in partes:
+            parser.feed(parte)
+            yield from processar()
+        parser.close()
+        yield from processar()
+
+    def _produto_lxml(self, card, rejeitados: Counter) -> dict | None:
+        cadeia_card = _cadeia_lxml(card)
+        achados = {}
+        for elemento in card.iterdescendants():
+            tag = elemento.tag
+            if not isinstance(tag, str):
+                continue
+            for campo, passos, _atributo in self.campos:
+                if (campo not in achados and passos[-1][1].casa(tag, elemento.attrib)
+                        and _casa_cadeia(passos, cadeia_card + _cadeia_lxml(elemento, ate=card))):
+                    achados[campo] = elemento
+            if len(achados) == len(self.campos):
+                break
+
+        def texto(campo):
+            elemento = achados.get(campo)
+            if elemento is None:
+                return None
+            return "".join(s.strip() for s in elemento.itertext())
+
+        preco, qtd = achados.get("preco"), achados.get("qtd")
+        return _montar_produto(
+            texto("nome"),
+            preco.get("data-preco") if preco is not None else None, texto("preco"),
+            qtd.get("data-qtd") if qtd is not None else None, texto("qtd"),
+            rejeitados,
+        )
+
+    def _iterar_bs4(self, conteudo, url, extracao):
+        from bs4 import BeautifulSoup
+
+        fonte = self.fonte
+        soup = BeautifulSoup(conteudo, 'html.parser')
+        for card in soup.select(fonte.seletor_card):
+            nome_tag = card.select_one(fonte.seletor_nome)
+            preco_tag = card.select_one(fonte.seletor_preco)
+            qtd_tag = card.select_one(fonte.seletor_qtd)
+            produto = _montar_produto(
+                nome_tag.get_text(strip=True) if nome_tag else None,
+                preco_tag.get('data-preco') if preco_tag else None,
+                preco_tag.get_text(strip=True) if preco_tag else None,
+                qtd_tag.get('data-qtd') if qtd_tag else None,
+                qtd_tag.get_text(strip=True) if qtd_tag else None,
+                extracao.rejeitados,
+            )
+            if produto:
+                yield produto
+
+        if fonte.seletor_proxima:
+            link = soup.select_one(fonte.seletor_proxima)
+            if link and link.get("href"):
+                extracao.proxima_url = urljoin(url, link["href"])
+
+
+@lru_cache(maxsize=None)
+def extrator_da_fonte(fonte: FonteProdutos) -> ExtratorCards:
+    return ExtratorCards(fonte, fonte.extrator)
+
+
+def extrair_cards(conteudo: bytes, fonte: FonteProdutos, url: str = "") -> Extracao:
+    """Produtos (nome, quantidade, preco) dos cards da página, link da próxima e descartes por motivo."""
+    return extrator_da_fonte(fonte).extrair(conteudo, url)
@@ -0,0 +1,239 @@
+# fila_vendas.py
+"""
+Gravação das vendas por trás (write-behind), opcional (python main.py --fila-vendas).
+
+O caixa entrega o carrinho fechado para uma fila e já imprime a nota com um
+número provisório; uma única thread grava as vendas da fila em lotes, todas
+numa transação (um commit/fsync por lote em vez de um por venda). Cada venda
+do lote fica num SAVEPOINT: se uma for recusada, só ela sai do lote.
+O estoque dos itens já está reservado para o carrinho (crud_reservas), então
+a venda não fica sem estoque entre a nota e a gravação. Com um diário
+(diario_vendas.Diario), a venda é escrita nele antes de entrar na fila: se
+o processo cair com vendas esperando, o boot seguinte as grava. Sem diário,
+um lote que o banco ocupado não deixou gravar volta na frente do lote
+seguinte (até `regravacoes` vezes), em vez de ser descartado.
+
+Com a fila cheia (disco mais lento que os caixas por muito tempo) quem envia
+espera uma vaga: a fila não cresce sem limite.
+
+Teste (vendas/s gravando direto e pela fila):
+python -m medicoes.vendas_pela_fila --vendas 1000 --ritmo 50
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from diario_vendas import fechar_diario
+
+
+class FilaCheiaError(Exception):
+    """A fila não abriu vaga dentro do tempo pedido."""
+
+
+@dataclass
+class VendaNaFila:
+    numero_provisorio: str
+    id_cliente: int
+    itens: list[dict]
+    id_carrinho: str | None = None
+    id_turno: int | None = None
+    chave: str = field(default_factory=lambda: uuid.uuid4().hex)
+    data_hora: datetime = field(default_factory=datetime.now)
+    # id definitivo da venda, ou a exceção se ela foi recusada
+    resultado: Future = field(default_factory=Future)
+    regravacoes: int = 0
+
+    @property
+    def total(self) -> float:
+        return sum(item['quantidade'] * item['preco'] for item in self.itens)
+
+
+class FilaVendas:
+    """Fila limitada de vendas + a thread que grava em lotes."""
+
+    def __init__(self, capacidade: int = 500, tamanho_lote: int = 64, prefixo: str = "", tentativas: int = 5,
+                 diario=None, regravacoes: int = 3):
+        self.tamanho_lote = tamanho_lote
+        self.diario = diario
+        self.prefixo = prefixo
+        self.tentativas = tentativas
+        self.regravacoes = regravacoes
+        self.gravadas = 0
+        self.recusadas = 0
+        self.lotes = 0
+        self.maior_lote = 0
+        self._fila: queue.Queue[VendaNaFila | None] = queue.Queue(maxsize=capacidade)
+        # sem diário: vendas de um lote que falhou, esperando o próximo (só a thread da fila mexe)
+        self._adiadas: list[VendaNaFila] = []
+        self._numeros = itertools.count(1)
+        self._thread = threading.Thread(target=self._escritor, name="fila-vendas", daemon=True)
+        self._thread.start()
+
+    def enviar(self, id_cliente: int, itens: list[dict], id_carrinho: str | None = None,
+               id_turno: int | None = None, timeout: float | None = None) -> VendaNaFila:
+        """
+        Põe a venda na fila e volta na hora (espera só se a fila estiver cheia).
+        Com diário, volta depois de a venda estar nele (fsync).
+        """
+        venda = VendaNaFila(f"{self.prefixo}{next(self._numeros)}", id_cliente, list(itens), id_carrinho, id_turno)
+        if id_carrinho is not None:
+            venda.chave = id_carrinho
+        if self.diario is not None:
+            self.diario.anotar_venda(venda.chave, id_cliente, venda.itens, id_carrinho, id_turno, venda.data_hora)
+        try:
+            self._fila.put(venda, timeout=timeout)
+        except queue.Full:
+            if self.diario is not None:
+                self.diario.anotar_recusada(venda.chave)
+            raise FilaCheiaError(f"Fila de vendas cheia ({self._fila.maxsize} vendas esperando gravação).")
+        return venda
+
+    def pendentes(self) -> int:
+        return self._fila.qsize() + len(self._adiadas)
+
+    def parar(self) -> None:
+        """Grava o que ainda está na fila e encerra a thread."""
+        self._fila.put(None)
+        self._thread.join()
+
+    def _escritor(self) -> None:
+        parar = False
+        while True:
+            # as adiadas vão na frente; o que chegou enquanto o lote anterior
+            # gravava vai junto (group commit)
+            lote, self._adiadas = self._adiadas, []
+            while not parar and len(lote) < self.tamanho_lote:
+                try:
+                    proxima = self._fila.get_nowait() if lote else self._fila.get()
+                except queue.Empty:
+                    break
+                if proxima is None:
+                    parar = True
+                    break
+                lote.append(proxima)
+            if lote:
+                self._gravar_lote(lote)
+            if parar and not self._adiadas:
+                return
+
+    def _gravar_lote(self, lote: list[VendaNaFila]) -> None:
+        # imports aqui dentro: os testes de medicoes/ trocam o banco antes de abrir o engine
+        from sqlalchemy.exc import OperationalError
+        from commons.catalogo import catalogo
+        from commons.db import get_session
+        from crud_vendas import EstoqueInsuficienteError, _banco_ocupado, _gravar_venda
+
+        for tentativa in range(1, self.tentativas + 1):
+            gravadas, recusadas = [], []
+            with get_session() as session:
+                try:
+                    session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                    for venda in lote:
+                        ponto = session.begin_nested()
+                        try:
+                            nova = _gravar_venda(session, venda.id_cliente, venda.itens, venda.id_carrinho,
+                                                 venda.id_turno, venda.chave, venda.data_hora)
+                            ponto.commit()
+                            gravadas.append((venda, nova.id))
+                        except EstoqueInsuficienteError as e:
+                            ponto.rollback()
+                            recusadas.append((venda, e))
+                    session.commit()
+                    break
+                except OperationalError as e:
+                    session.rollback()
+                    if not _banco_ocupado(e) or tentativa == self.tentativas:
+                        self._recusar_lote(lote, e)
+                        return
+                except Exception as e:
+                    session.rollback()
+                    self._recusar_lote(lote, e)
+                    return
+            time.sleep(random.uniform(0, 0.01 * 2 ** tentativa))
+
+        self.lotes += 1
+        self.maior_lote = max(self.maior_lote, len(lote))
+        if self.diario is not None:
+            self.diario.anotar_gravadas([(venda.chave, id_venda) for venda, id_venda in gravadas])
+        for venda, id_venda in gravadas:
+            for item in venda.itens:
+                catalogo.ajustar_estoque(item['id_produto'], -item['quantidade'])
+            self.gravadas += 1
+            venda.resultado.set_result(id_venda)
+        for venda, erro in recusadas:
+            catalogo.invalidar(erro.id_produto)
+            self._recusar(venda, erro)
+
+    def _recusar_lote(self, lote: list[VendaNaFila], erro: Exception) -> None:
+        for venda in lote:
+            self._recusar(venda, erro, definitiva=False)
+
+    def _recusar(self, venda: VendaNaFila, erro: Exception, definitiva: bool = True) -> None:
+        if not definitiva and self.diario is None and venda.regravacoes < self.regravacoes:
+            # erro do banco e sem diário: a fila é o único lugar da venda, tenta no próximo lote
+            venda.regravacoes += 1
+            self._adiadas.append(venda)
+            return
+        self.recusadas += 1
+        if self.diario is not None:
+            if not definitiva:
+                # erro do banco: a venda continua pendente no diário e o próximo boot grava
+                print(f"\nATENÇÃO: venda provisória {venda.numero_provisorio} ficou no diário "
+                      f"para o próximo boot: {erro}")
+                venda.resultado.set_exception(erro)
+                return
+            self.diario.anotar_recusada(venda.chave)
+        # o operador já entregou a nota: avisa na tela (as reservas do carrinho expiram sozinhas)
+        print(f"\nATENÇÃO: venda provisória {venda.numero_provisorio} não foi gravada: {erro}")
+        venda.resultado.set_exception(erro)
+
+
+_fila: FilaVendas | None = None
+
+
+def iniciar_fila_vendas(**opcoes) -> FilaVendas:
+    """Liga o modo write-behind neste processo (o caixa passa a usar registrar_venda_na_fila)."""
+    global _fila
+    if _fila is None:
+        _fila = FilaVendas(**opcoes)
+        # saída sem fechar o caixa (Ctrl+C, erro): grava o que ficou na fila antes de terminar
+        atexit.register(parar_fila_vendas)
+    return _fila
+
+
+def fila_ativa() -> FilaVendas | None:
+    return _fila
+
+
+def parar_fila_vendas() -> None:
+    """Grava o que falta e desliga a fila (antes de fechar o caixa). O diário do caixa é fechado junto."""
+    global _fila
+    if _fila is not None:
+        _fila.parar()
+        _fila = None
+    fechar_diario()
+
+
+def registrar_venda_na_fila(cliente, itens_comprados: list[dict], id_carrinho: str | None = None,
+                            id_turno: int | None = None, espera_max: float = 30.0) -> VendaNaFila | None:
+    """
+    Como crud_vendas.registrar_venda, mas só põe a venda na fila: volta com o
+    número provisório (o id definitivo chega em .resultado). Se a fila não
+    abrir vaga em `espera_max` segundos, nada é registrado.
+    """
+    if not itens_comprados or _fila is None:
+        return None
+    try:
+        return _fila.enviar(cliente.id, itens_comprados, id_carrinho, id_turno, timeout=espera_max)
+    except FilaCheiaError as e:
+        print(f"Erro: {e}")
+        return None
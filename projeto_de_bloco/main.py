@@ -1,45 +1,97 @@
 # main.py
-from commons.db import init_db
+import time
+_INICIO = time.perf_counter()
+
+import argparse
+from commons.db import init_db, unidade_de_trabalho
 from crud_clientes import (
     carregar_clientes_iniciais, buscar_cliente, cadastrar_cliente
 )
 from vendas import atender_cliente, listar_as_vendas
-from crud_fornecedores import carregar_fornecedores_iniciais
+from crud_fornecedores import carregar_fornecedores_iniciais, preparar_planilha_fornecedores
 from relatorios import fechar_caixa
+from crud_turnos import abrir_turno
+from crud_vendas import reconstruir_resumos
 from sig.sig_menu import menu_sig
-from web_scraping import realizar_web_scraping, salvar_produtos_csv
-from crud_produtos import importar_produtos_csv
+from web_scraping import atualizar_catalogo_web
+from crud_produtos import atribuir_codigos_internos, carregar_indice_codigos, importar_produtos_csv
+from crud_reservas import iniciar_varredor, varrer_reservas_expiradas
+from atualizador_catalogo import iniciar_atualizador
+from fila_vendas import iniciar_fila_vendas, parar_fila_vendas
+from diario_vendas import abrir_diario, pasta_do_caixa, reaplicar_diario
+from commons.inicio import Etapa, RelatorioInicio, executar_etapas
 from commons.utils import entrar_inteiro
 
+_FIM_IMPORTS = time.perf_counter()
+
 
-def inicializar_sistema():
+def inicializar_sistema(numero_caixa: int = 1, forcar_carga: bool = False, mostrar_relatorio: bool = False,
+                        atualizar_catalogo_min: float = 30, fila_vendas: bool = False):
     print("---- Iniciando Sistema ----\n")
-    
-    init_db()
-    carregar_clientes_iniciais()
-    carregar_fornecedores_iniciais()
-
-    df_produtos = realizar_web_scraping()
-    if df_produtos is not None:
-        salvar_produtos_csv(df_produtos)
-        importar_produtos_csv()
+    relatorio = RelatorioInicio(_INICIO, _FIM_IMPORTS)
+
+    relatorio.medir("banco de dados", init_db)
+
+    # Vendas da fila que o processo anterior deste caixa não chegou a gravar
+    relatorio.medir("diário de vendas", lambda: reaplicar_diario(pasta_do_caixa(numero_caixa)) is not None)
+
+    # Banco de antes dos resumos diários: gera a partir do histórico
+    relatorio.medir("resumos de vendas", reconstruir_resumos, apenas_se_vazio=True)
+
+    # Reservas de carrinhos que morreram com o processo anterior
+    relatorio.medir("reservas vencidas", varrer_reservas_expiradas)
+    iniciar_varredor()
+
+    # Só o caixa 1 recarrega os dados iniciais; os outros caixas abrem
+    # direto sobre o mesmo banco.
+    if numero_caixa > 1:
+        print(f"Caixa {numero_caixa}: usando o banco já carregado pelo caixa 1.")
     else:
-        print("\nAviso: Não foi possível realizar o web scraping.")
-    
-    principal()
+        # Cada etapa confere o manifesto (cargas_fonte) e pula se a entrada não mudou.
+        # Sem dependência entre si, raspagem, clientes e leitura da planilha rodam juntas.
+        executar_etapas([
+            Etapa("clientes.json", lambda: carregar_clientes_iniciais(forcar=forcar_carga)),
+            Etapa("web scraping", lambda: atualizar_catalogo_web(forcar=forcar_carga)),
+            Etapa("leitura fornecedores.xlsx", preparar_planilha_fornecedores),
+            Etapa("produtos.csv", lambda: importar_produtos_csv(apenas_se_mudou=not forcar_carga) is not None,
+                  depende_de=("web scraping",)),
+            # as associações casam pelo nome do produto no catálogo
+            Etapa("fornecedores.xlsx", lambda: carregar_fornecedores_iniciais(forcar=forcar_carga),
+                  depende_de=("produtos.csv", "leitura fornecedores.xlsx")),
+        ], relatorio)
 
+        # Preços e estoque do site durante o dia, sem reiniciar o caixa
+        if atualizar_catalogo_min > 0:
+            iniciar_atualizador(atualizar_catalogo_min * 60)
 
+    # Leitura do código de barras no caixa sem ir ao banco
+    relatorio.medir("índice de códigos de barras", carregar_indice_codigos)
 
+    # Vendas gravadas em lotes por uma thread; o caixa só espera o diário
+    if fila_vendas:
+        iniciar_fila_vendas(prefixo=f"{numero_caixa}-", diario=abrir_diario(numero_caixa))
 
-def principal():
+    if mostrar_relatorio:
+        relatorio.imprimir()
 
-    vendas_realizadas = []
+    principal(numero_caixa)
+
+
+
+
+def principal(numero_caixa: int = 1):
+
+    operador = input(f"Operador do caixa {numero_caixa}: ").strip()
+    turno = abrir_turno(numero_caixa, operador)
+    if not turno:
+        print("Não foi possível abrir o turno do caixa.")
+        return
 
     while True:
 
-        print("""
+        print(f"""
     ==== Bem-Vindos ao Supermercado ====\n
-    ====================================
+    ============= Caixa {numero_caixa:>2} =============
     """)
         print("\n1 - Caixa - Atendimento ao Cliente")
         print("2 - Acessar SIG (Sistema de Informações Gerenciais)")
@@ -51,32 +103,34 @@ def principal():
             print("\n--- Atendimento ao Cliente ---")
             id_cliente = entrar_inteiro("Digite o ID do Cliente (ou 0 para novo cadastro): ", min_val=0)
 
-            cliente = None
-            if id_cliente > 0:
-                cliente = buscar_cliente(id_cliente)
-                if not cliente:
-                    print("Cliente não encontrado. Realizando novo cadastro.")
-                    id_cliente = 0
+            # o atendimento inteiro (cliente, produtos, reservas, venda) numa sessão só
+            with unidade_de_trabalho():
+                cliente = None
+                if id_cliente > 0:
+                    cliente = buscar_cliente(id_cliente)
+                    if not cliente:
+                        print("Cliente não encontrado. Realizando novo cadastro.")
+                        id_cliente = 0
 
-            if id_cliente == 0:
-                nome_cliente = input("Digite o nome do novo cliente: ")
-                cliente = cadastrar_cliente(nome_cliente)
-                if not cliente:
-                    print("Falha ao cadastrar cliente. Retornando ao menu principal.")
-                    continue
+                if id_cliente == 0:
+                    nome_cliente = input("Digite o nome do novo cliente: ")
+                    cliente = cadastrar_cliente(nome_cliente)
+                    if not cliente:
+                        print("Falha ao cadastrar cliente. Retornando ao menu principal.")
+                        continue
 
-            venda_registrada = atender_cliente(cliente)
-            if venda_registrada:
-                vendas_realizadas.append(venda_registrada)
+                atender_cliente(cliente, turno.id)
 
         elif opcao == "2":
             menu_sig()
 
         elif opcao == "3":
-            listar_as_vendas()
+            with unidade_de_trabalho():
+                listar_as_vendas()
 
         elif opcao == "4":
-            fechar_caixa(vendas_realizadas)
+            parar_fila_vendas()  # o fechamento precisa de todas as vendas gravadas
+            fechar_caixa(turno.id)
             print("\nCaixa encerrado. Até logo!\n")
             break
 
@@ -85,4 +139,30 @@ def principal():
 
 
 if __name__ == "__main__":
-    inicializar_sistema()
+    parser = argparse.ArgumentParser(description="Sistema de caixa do supermercado.")
+    parser.add_argument("--caixa", type=int, default=1,
+                        help="número deste caixa (vários caixas podem rodar ao mesmo tempo no mesmo banco)")
+    parser.add_argument("--reconstruir-resumos", action="store_true",
+                        help="refaz os resumos diários de vendas a partir do histórico e sai")
+    parser.add_argument("--forcar-carga", action="store_true",
+                        help="raspa o site e recarrega clientes/produtos/fornecedores mesmo sem mudança")
+    parser.add_argument("--relatorio-inicio", action="store_true",
+                        help="mostra o tempo dos imports e de cada etapa do boot")
+    parser.add_argument("--atualizar-catalogo", type=float, default=30, metavar="MIN",
+                        help="intervalo em minutos da atualização de preços/estoque em segundo plano "
+                             "(só no caixa 1; 0 desliga)")
+    parser.add_argument("--atribuir-codigos", action="store_true",
+                        help="dá um código de barras da loja (EAN-13, prefixo 20) aos produtos sem código e sai")
+    parser.add_argument("--fila-vendas", action="store_true",
+                        help="grava as vendas em lotes por trás (a nota sai com número provisório)")
+    args = parser.parse_args()
+
+    if args.reconstruir_resumos:
+        init_db()
+        reconstruir_resumos()
+    elif args.atribuir_codigos:
+        init_db()
+        atribuir_codigos_internos()
+    else:
+        inicializar_sistema(args.caixa, args.forcar_carga, args.relatorio_inicio, args.atualizar_catalogo,
+                            args.fila_vendas)
@@ -0,0 +1,98 @@
+# busca_nome.py
+"""
+Tempo da busca de produtos pelo nome (commons.busca): pelo FTS5 e por
+LIKE '%palavra%' (varredura da tabela), num catálogo grande gerado num
+banco temporário:
+
+    python -m medicoes.busca_nome --produtos 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from commons.busca import _PALAVRA
+from commons.medicao import banco_temporario
+
+_MARCAS = ["Nestlé", "Itambé", "Piracanjuba", "Sadia", "Perdigão", "Qualy", "Camil", "Tio João", "Pilão",
+           "Melitta", "Bauducco", "Garoto", "Lacta", "Ypê", "Omo", "Veja", "Dove", "Colgate", "Seara", "Aurora"]
+_PRODUTOS = ["Leite em Pó", "Leite Condensado", "Café Torrado", "Açúcar Refinado", "Arroz Branco", "Feijão Preto",
+             "Chocolate Amargo", "Biscoito Maizena", "Pão de Forma", "Manteiga", "Requeijão Cremoso",
+             "Sabão em Pó", "Detergente Líquido", "Creme Dental", "Salsicha", "Presunto Fatiado", "Macarrão Espaguete",
+             "Óleo de Soja", "Farinha de Trigo", "Iogurte Natural"]
+_VARIANTES = ["Integral", "Desnatado", "Tradicional", "Zero Açúcar", "Orgânico", "Light", "Extra Forte", "Limão",
+              "Morango", "Baunilha", "Coco", "Original"]
+_TAMANHOS = ["200g", "380g", "400g", "500g", "1kg", "2kg", "5kg", "1L", "500ml", "90g"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo da busca de produtos: FTS5 x LIKE.")
+    parser.add_argument("--produtos", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    with banco_temporario("busca_", arquivo="busca.db"):
+        _medir(args)
+
+
+def _medir(args) -> None:
+    from sqlalchemy import and_, func, select
+    from tabulate import tabulate
+    from commons.db import get_read_session, get_session, init_db
+    from commons.models import Produto
+    from crud_produtos import buscar_produtos
+
+    init_db()
+    rng = random.Random(4)
+    t0 = time.perf_counter()
+    with get_session() as session:
+        lote = []
+        for i in range(1, args.produtos + 1):
+            nome = (f"{rng.choice(_PRODUTOS)} {rng.choice(_MARCAS)} {rng.choice(_VARIANTES)} "
+                    f"{rng.choice(_TAMANHOS)} #{i}")
+            lote.append({"nome": nome, "quantidade": 10, "preco": 1.0 + i % 50})
+            if len(lote) == 50_000:
+                session.connection().execute(Produto.__table__.insert(), lote)
+                lote = []
+        if lote:
+            session.connection().execute(Produto.__table__.insert(), lote)
+        session.commit()
+    print(f"{args.produtos} produtos inseridos (índice de busca mantido pelos triggers) "
+          f"em {time.perf_counter() - t0:.1f} s.")
+
+    def por_like(texto: str) -> list:
+        filtros = [Produto.nome.like(f"%{palavra}%") for palavra in _PALAVRA.findall(texto)]
+        with get_read_session() as session:
+            return session.execute(select(Produto.id, Produto.nome).where(and_(*filtros))
+                                   .order_by(Produto.id).limit(10)).all()
+
+    def contar_like(texto: str) -> int:
+        filtros = [Produto.nome.like(f"%{palavra}%") for palavra in _PALAVRA.findall(texto)]
+        with get_read_session() as session:
+            return session.execute(select(func.count()).where(and_(*filtros))).scalar()
+
+    def medir(funcao, texto: str) -> tuple[float, list]:
+        melhor, resultado = float("inf"), []
+        for _ in range(args.repeticoes):
+            t = time.perf_counter()
+            resultado = funcao(texto)
+            melhor = min(melhor, (time.perf_counter() - t) * 1000)
+        return melhor, resultado
+
+    tabela = []
+    for texto in ["leite po", "cafe pila", "choc amarg", "Pão de Forma Bauducco", "açucar zero",
+                  "sabão omo 1kg", "leite ninho integral 380g", "iogurte morango dove"]:
+        ms_fts, (achados, muitos) = medir(buscar_produtos, texto)
+        ms_like, _ = medir(por_like, texto)
+        tabela.append([texto, f"{ms_fts:.2f}", "não (muitos)" if muitos else "sim",
+                       achados[0].nome if achados else "-", f"{ms_like:.1f}", contar_like(texto)])
+
+    print(tabulate(tabela, headers=["Busca", "FTS5 (ms)", "Por relevância", "1º resultado", "LIKE (ms)",
+                                    "Achados pelo LIKE"],
+                   tablefmt="fancy_grid"))
+    print("O LIKE não acha quem difere só no acento (\"po\" x \"Pó\") nem ordena por relevância.")
+
+
+if __name__ == "__main__":
+    main()
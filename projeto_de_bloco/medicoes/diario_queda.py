@@ -0,0 +1,139 @@
+# diario_queda.py
+"""
+Quanto o diário de vendas (diario_vendas) custa no caixa e se uma queda com
+vendas na fila é recuperada no boot seguinte, num banco temporário no
+mesmo disco do banco de verdade:
+
+    python -m medicoes.diario_queda --vendas 500
+
+A queda é um processo filho (este mesmo arquivo com --simular-queda) que
+passa vendas pela fila com outro caixa segurando o lock de escrita e morre
+com os._exit, sem esperar a gravação.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from commons.medicao import banco_temporario
+from diario_vendas import LIBERACAO, Diario, _registro, _segmentos, _texto, reaplicar_diario
+from fila_vendas import FilaVendas
+from medicoes.vendas_pela_fila import passar_vendas
+
+PASTA_PROJETO = Path(__file__).resolve().parent.parent
+
+
+def _simular_queda(pasta_diario: str, num_vendas: int, num_produtos: int) -> None:
+    """Processo filho: passa vendas pela fila com diário e morre sem esperar a gravação."""
+    import sqlite3
+    from commons.db import engine, init_db
+    from crud_reservas import reservar_item
+
+    init_db()
+    diario = Diario(pasta_diario, tamanho_segmento=16 << 10)   # segmentos pequenos: testa a troca
+    fila = FilaVendas(diario=diario)
+    # um carrinho aberto na hora da queda
+    for pid in (1, 2):
+        reservar_item("carrinho-aberto", pid, 5)
+        diario.anotar_reserva("carrinho-aberto", pid, 5)
+    # outro caixa segurando o lock de escrita: as vendas ficam esperando na fila
+    outro_caixa = sqlite3.connect(engine.url.database)
+    outro_caixa.execute("BEGIN IMMEDIATE")
+    rng = random.Random(2)
+    for n in range(num_vendas):
+        itens = [{"id_produto": pid, "quantidade": 1 + n % 3, "preco": 2.0}
+                 for pid in rng.sample(range(1, num_produtos + 1), 3)]
+        fila.enviar(1, itens, id_carrinho=f"carrinho-{n}")
+    print(f"{fila.gravadas} de {num_vendas} vendas no banco na hora da queda.", flush=True)
+    os._exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo do diário de vendas no caixa e releitura depois de uma queda.")
+    parser.add_argument("--vendas", type=int, default=500)
+    parser.add_argument("--ritmo", type=float, default=50, help="vendas/s que o caixa tenta passar")
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--pasta", default=str(PASTA_PROJETO / "dados"),
+                        help="onde criar o banco de teste (padrão: mesmo disco do banco de verdade)")
+    parser.add_argument("--simular-queda", metavar="PASTA_DIARIO", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.simular_queda:
+        # filho: o banco temporário (MERCADO_DB_URL) veio do processo pai
+        _simular_queda(args.simular_queda, args.vendas, args.produtos)
+        return
+
+    with banco_temporario("diario_", args.pasta, "diario.db") as pasta:
+        _medir(args, pasta)
+
+
+def _medir(args, pasta: str) -> None:
+    from sqlalchemy import func, select
+    from tabulate import tabulate
+    from commons.db import engine, get_session, init_db
+    from commons.models import Cliente, ItemVenda, Produto, ReservaEstoque, Venda
+
+    estoque_inicial = 10**6
+    init_db()
+    with get_session() as session:
+        session.add(Cliente(nome="Cliente teste"))
+        session.connection().execute(Produto.__table__.insert(), [
+            {"nome": f"Produto {i}", "quantidade": estoque_inicial, "preco": 2.0} for i in range(args.produtos)
+        ])
+        session.commit()
+
+    # 1) quanto o diário segura o caixa
+    tabela = []
+    for rotulo, com_diario, ritmo in [("fila", False, args.ritmo), ("fila + diário", True, args.ritmo),
+                                      ("fila + diário, sem pausa", True, None)]:
+        diario = Diario(os.path.join(pasta, f"medida-{len(tabela)}")) if com_diario else None
+        fila = FilaVendas(diario=diario)
+        r = passar_vendas(lambda itens: fila.enviar(1, itens), args.vendas, args.produtos, ritmo)
+        fila.parar()
+        tamanho = sum(s.stat().st_size for s in _segmentos(diario.pasta)) if diario else 0
+        if diario:
+            diario.fechar()
+        tabela.append([rotulo, f"{ritmo:.0f}" if ritmo else "-", f"{r['vendas_por_segundo']:.0f}",
+                       f"{r['p50']:.2f}", f"{r['p99']:.2f}", f"{r['maximo']:.1f}",
+                       diario.fsyncs if diario else "-", f"{tamanho / args.vendas:.0f}" if diario else "-"])
+    print(tabulate(tabela, headers=["Gravação", "Ritmo pedido", "Vendas/s no caixa", "Caixa parado p50 (ms)",
+                                    "p99 (ms)", "máx (ms)", "fsyncs", "Bytes/venda"],
+                   tablefmt="fancy_grid"))
+
+    # 2) queda com vendas na fila: o boot seguinte grava o que faltou
+    with get_session() as session:
+        antes = session.execute(select(func.count(Venda.id))).scalar()
+    pasta_diario = os.path.join(pasta, "caixa-queda")
+    engine.dispose()
+    subprocess.run([sys.executable, "-m", "medicoes.diario_queda", "--simular-queda", pasta_diario,
+                    "--vendas", str(args.vendas), "--produtos", str(args.produtos)],
+                   cwd=PASTA_PROJETO, check=False)
+    # escrita cortada no meio de um registro
+    with open(_segmentos(Path(pasta_diario))[-1], "ab") as ultimo:
+        ultimo.write(_registro(LIBERACAO, _texto("carrinho-aberto"))[:5])
+    copia = os.path.join(pasta, "copia-diario")
+    shutil.copytree(pasta_diario, copia)
+
+    contagem = reaplicar_diario(pasta_diario)
+    repeticao = reaplicar_diario(copia)
+    print(f"Boot depois da queda: {contagem}")
+    print(f"Mesmo diário lido de novo: {repeticao}")
+
+    with get_session() as session:
+        vendas = session.execute(select(func.count(Venda.id))).scalar() - antes
+        vendido = session.execute(select(func.sum(ItemVenda.quantidade))).scalar()
+        estoque = session.execute(select(func.sum(Produto.quantidade))).scalar()
+        reservas = session.execute(select(func.count(ReservaEstoque.id))).scalar()
+    estoque_bate = estoque_inicial * args.produtos - estoque == vendido
+    print(f"Vendas da queda no banco: {vendas} (esperado {args.vendas}); estoque bate com os itens vendidos: "
+          f"{'sim' if estoque_bate else 'NÃO'}; reservas que sobraram: {reservas}; "
+          f"segmentos que sobraram: {len(_segmentos(Path(pasta_diario)))}.")
+
+
+if __name__ == "__main__":
+    main()
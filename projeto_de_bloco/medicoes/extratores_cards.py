@@ -0,0 +1,144 @@
+# extratores_cards.py
+"""
+Tempo e memória de cada backend da extração de cards (extracao_cards) numa
+página sintética, com alguns cards defeituosos de propósito. Cada backend
+roda num processo separado (este mesmo arquivo com --medir):
+
+    python -m medicoes.extratores_cards --cards 100000
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from extracao_cards import BACKENDS, TAMANHO_PEDACO, ExtratorCards, Extracao
+from motor_scraping import FonteProdutos
+
+PASTA_PROJETO = Path(__file__).resolve().parent.parent
+
+
+def _pagina_sintetica(cards: int) -> bytes:
+    """Página no formato do site, com alguns cards defeituosos de propósito."""
+    partes = ['<html><head><meta charset="utf-8"><title>Produtos</title></head><body>'
+              '<nav><a class="proxima" href="?p=2">Próxima</a></nav><div id="produtos-lista">']
+    for i in range(cards):
+        nome = f'<h5 class="card-title">Produto {i} &amp; Cia</h5>'
+        preco = f'<p class="card-price" data-preco="{i % 100}.99">R$ {i % 100},99</p>'
+        qtd = f'<p data-qtd="{i % 50}"><span>Estoque:</span> {i % 50}</p>'
+        if i % 1000 == 1:
+            preco = ''
+        elif i % 1000 == 2:
+            qtd = '<p data-qtd="">sem estoque</p>'
+        elif i % 1000 == 3:
+            nome = '<h5 class="card-title">  </h5>'
+        partes.append(f'<div class="col"><div class="product-card">'
+                      f'<img src="/img/{i}.png" alt="">{nome}{preco}{qtd}</div></div>\n')
+    partes.append('</div></body></html>')
+    return "".join(partes).encode("utf-8")
+
+
+def _pico_rss_kb() -> int:
+    """Pico de memória residente do processo. No Linux lê o VmHWM, que (ao contrário
+    do ru_maxrss) não herda o pico do processo pai que gerou a página."""
+    try:
+        with open("/proc/self/status") as status:
+            for linha in status:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _medir(caminho: str, backend: str) -> None:
+    """
+    Roda num processo próprio (o pico de memória do processo só cresce): mede o tempo
+    e quanto o pico de memória passou do interpretador já carregado (a página
+    lida conta para todos), imprime JSON. O RSS conta também o que o lxml
+    aloca em C, que o tracemalloc não veria.
+    """
+    fonte = FonteProdutos("sintetica", "http://localhost/", seletor_proxima="nav a.proxima", extrator=backend)
+    extrator = ExtratorCards(fonte, backend)
+    if extrator.backend == "lxml":
+        import lxml.etree  # noqa: F401
+    elif extrator.backend == "bs4":
+        import bs4  # noqa: F401
+
+    rss_antes = _pico_rss_kb()
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+    t0 = time.perf_counter()
+    extracao = Extracao()
+    pedacos = (conteudo[i:i + TAMANHO_PEDACO] for i in range(0, len(conteudo), TAMANHO_PEDACO))
+    assinatura = hashlib.sha1()
+    produtos = 0
+    for produto in extrator.iterar(pedacos, "http://localhost/", extracao):
+        produtos += 1
+        assinatura.update(repr(sorted(produto.items())).encode())
+    segundos = time.perf_counter() - t0
+    rss_depois = _pico_rss_kb()
+
+    print(json.dumps({
+        "backend": extrator.backend, "produtos": produtos, "segundos": segundos,
+        "memoria_mb": (rss_depois - rss_antes) / 1024,
+        "rejeitados": dict(extracao.rejeitados), "proxima": extracao.proxima_url,
+        "assinatura": assinatura.hexdigest(),
+    }))
+
+
+def main():
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser(description="Tempo e memória da extração de cards numa página sintética.")
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--backends", nargs="+", default=["bs4", "htmlparser", "lxml"],
+                        choices=[b for b in BACKENDS if b != "auto"])
+    parser.add_argument("--medir", nargs=2, metavar=("ARQUIVO", "BACKEND"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _medir(*args.medir)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="extracao_") as pasta:
+        caminho = os.path.join(pasta, "pagina.html")
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(_pagina_sintetica(args.cards))
+        print(f"Página sintética: {args.cards} cards, {os.path.getsize(caminho) / 2**20:.1f} MB")
+
+        resultados = []
+        for backend in args.backends:
+            saida = subprocess.run([sys.executable, "-m", "medicoes.extratores_cards", "--medir", caminho, backend],
+                                   capture_output=True, text=True, cwd=PASTA_PROJETO)
+            if saida.returncode:
+                print(f"{backend}: falhou\n{saida.stderr.strip().splitlines()[-1]}")
+                continue
+            resultados.append(json.loads(saida.stdout))
+
+    if not resultados:
+        raise SystemExit(1)
+    base = resultados[0]
+    tabela = [[r["backend"], r["produtos"], f"{r['segundos']:.2f}", f"{base['segundos'] / r['segundos']:.1f}x",
+               f"{r['memoria_mb']:.1f}",
+               ", ".join(f"{m}: {n}" for m, n in sorted(r["rejeitados"].items()))]
+              for r in resultados]
+    print(tabulate(tabela, headers=["Extrator", "Produtos", "Tempo (s)", "Ganho", "Pico de memória (MB)",
+                                    "Rejeitados"], tablefmt="fancy_grid"))
+
+    iguais = all(r["assinatura"] == base["assinatura"] and r["rejeitados"] == base["rejeitados"]
+                 and r["proxima"] == base["proxima"] for r in resultados)
+    print("Mesmos produtos, descartes e próxima página em todos os extratores." if iguais
+          else "ATENÇÃO: os extratores divergiram.")
+    raise SystemExit(0 if iguais else 1)
+
+
+if __name__ == "__main__":
+    main()
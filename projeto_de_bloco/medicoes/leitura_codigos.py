@@ -0,0 +1,87 @@
+# leitura_codigos.py
+"""
+Tempo de resolver um código de barras lido no caixa (commons.codigo_barras):
+pelo índice em memória (commons.catalogo) e por SELECT no índice único, num
+banco temporário com códigos internos atribuídos:
+
+    python -m medicoes.leitura_codigos --produtos 50000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from commons.codigo_barras import codigo_interno
+from commons.medicao import banco_temporario, resumo_tempos
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de resolver um código de barras lido no caixa.")
+    parser.add_argument("--produtos", type=int, default=50_000)
+    parser.add_argument("--leituras", type=int, default=20_000)
+    parser.add_argument("--giro", type=int, default=2_000, help="produtos diferentes passados no caixa")
+    args = parser.parse_args()
+
+    with banco_temporario("codigos_", arquivo="codigos.db"):
+        _medir(args)
+
+
+def _medir(args) -> None:
+    from sqlalchemy import select
+    from tabulate import tabulate
+    from commons.catalogo import catalogo, codigos
+    from commons.db import get_session, init_db
+    from commons.models import Produto
+    from crud_produtos import atribuir_codigos_internos, carregar_indice_codigos, pesquisar_por_codigo
+
+    init_db()
+    with get_session() as session:
+        session.connection().execute(Produto.__table__.insert(), [
+            {"nome": f"Produto {i}", "quantidade": 100, "preco": 1.0 + i % 50} for i in range(args.produtos)
+        ])
+        session.commit()
+
+    t0 = time.perf_counter()
+    atribuidos = atribuir_codigos_internos()
+    tempo_atribuicao = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    carregar_indice_codigos()
+    tempo_carga = time.perf_counter() - t0
+
+    rng = random.Random(3)
+    giro = rng.sample(range(1, args.produtos + 1), min(args.giro, args.produtos))
+    lidos = [codigo_interno(rng.choice(giro)) for _ in range(args.leituras)]
+
+    def medir(resolver, id_de=lambda produto: produto.id) -> list[float]:
+        tempos = []
+        for codigo in lidos:
+            t = time.perf_counter()
+            produto = resolver(codigo)
+            tempos.append((time.perf_counter() - t) * 1e6)
+            assert produto is not None and codigo_interno(id_de(produto)) == codigo
+        return tempos
+
+    with get_session() as session:
+        por_select = medir(lambda codigo: session.execute(
+            select(Produto.id, Produto.nome, Produto.preco, Produto.quantidade)
+            .where(Produto.codigo_barras == codigo)).first())
+    so_indice = medir(lambda codigo: codigos.obter(codigo, lambda _: None), id_de=lambda produto_id: produto_id)
+    catalogo.limpar()
+    for codigo in lidos:   # o dia já começou: os produtos do giro estão no catálogo
+        pesquisar_por_codigo(codigo)
+    por_indice = medir(pesquisar_por_codigo)
+
+    def linha(rotulo, tempos):
+        r = resumo_tempos(tempos)
+        return [rotulo, f"{r['p50']:.1f}", f"{r['p99']:.1f}", f"{sum(tempos) / len(tempos):.1f}"]
+
+    print(f"{atribuidos} códigos atribuídos em {tempo_atribuicao:.2f} s; "
+          f"índice com {codigos.estatisticas()['codigos']} códigos carregado em {tempo_carga * 1000:.0f} ms.")
+    print(tabulate([linha("SELECT no índice único", por_select), linha("índice em memória (só o id)", so_indice),
+                    linha("índice em memória + catálogo", por_indice)],
+                   headers=["Leitura", "p50 (µs)", "p99 (µs)", "média (µs)"], tablefmt="fancy_grid"))
+    print(f"Catálogo em memória: {catalogo.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# multicaixa.py
+"""
+Modo multi-caixa: vários caixas (threads ou processos) vendendo ao mesmo
+tempo contra o mesmo banco SQLite.
+
+A segurança vem de três coisas que já estão no crud_vendas / commons.db:
+  - WAL, pra leitura não bloquear quem grava;
+  - baixa condicional (UPDATE ... WHERE quantidade >= n), então dois caixas
+    nunca vendem o mesmo estoque;
+  - retentativa com backoff quando o banco está ocupado.
+
+O teste de estresse cria um banco temporário, solta N caixas disputando
+pouco estoque e confere que nada foi vendido a mais, medindo vendas/segundo
+para cada quantidade de caixas.
+
+    python -m medicoes.multicaixa --caixas 1 2 4 8 --vendas 200 --modo processos
+
+Com --relatorios N o teste é outro: um caixa vende enquanto N relatórios
+pesados (ranking de clientes direto dos itens de venda) rodam sem parar,
+primeiro pelo engine principal e depois pelo engine de leitura
+(commons.db.get_read_session), e é medido o tempo de cada venda:
+
+    python -m medicoes.multicaixa --relatorios 4 --vendas 500 --modo processos
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from commons.medicao import banco_temporario, resumo_tempos
+
+
+def caixa_automatico(numero_caixa: int, id_cliente: int, ids_produtos: list[int],
+                     num_vendas: int, semente: int | None = None) -> dict:
+    """Um caixa que passa `num_vendas` cestas aleatórias. Retorna as contagens do caixa."""
+    # imports aqui dentro: cada processo abre o banco de MERCADO_DB_URL
+    from crud_produtos import pesquisar_produto
+    from crud_vendas import EstoqueInsuficienteError, efetivar_venda
+
+    rng = random.Random(semente)
+    vendidas = recusadas = 0
+
+    for _ in range(num_vendas):
+        itens = []
+        for pid in rng.sample(ids_produtos, k=min(len(ids_produtos), rng.randint(1, 3))):
+            produto = pesquisar_produto(pid)
+            itens.append({'id_produto': pid, 'quantidade': rng.randint(1, 3), 'preco': produto.preco})
+        try:
+            efetivar_venda(id_cliente, itens)
+            vendidas += 1
+        except EstoqueInsuficienteError:
+            recusadas += 1
+
+    return {"caixa": numero_caixa, "vendidas": vendidas, "recusadas": recusadas}
+
+
+def _preparar_banco(num_produtos: int, estoque_inicial: int) -> tuple[int, list[int]]:
+    from commons.db import Base, engine, get_session, init_db
+    from commons.models import Cliente, Produto
+
+    Base.metadata.drop_all(bind=engine)
+    # a busca (FTS5) e os triggers dela vêm das migrações: o banco volta à versão 0
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS produtos_busca")
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+    init_db()
+    with get_session() as session:
+        cliente = Cliente(nome="Cliente Estresse")
+        produtos = [
+            Produto(nome=f"Produto {i}", quantidade=estoque_inicial, preco=1.0 + i)
+            for i in range(1, num_produtos + 1)
+        ]
+        session.add(cliente)
+        session.add_all(produtos)
+        session.commit()
+        return cliente.id, [p.id for p in produtos]
+
+
+def _conferir_estoque(estoque_inicial: int) -> list[tuple]:
+    """Retorna os produtos cujo estoque não fecha com o que foi vendido (deveria ser vazio)."""
+    from sqlalchemy import func
+    from commons.db import get_session
+    from commons.models import ItemVenda, Produto
+
+    with get_session() as session:
+        vendido = func.coalesce(func.sum(ItemVenda.quantidade), 0)
+        rows = (
+            session.query(Produto.id, Produto.quantidade, vendido)
+            .outerjoin(ItemVenda, ItemVenda.id_produto == Produto.id)
+            .group_by(Produto.id, Produto.quantidade)
+            .all()
+        )
+    return [
+        (pid, qtd, int(total))
+        for pid, qtd, total in rows
+        if qtd < 0 or qtd + int(total) != estoque_inicial
+    ]
+
+
+def teste_estresse(num_caixas: int, vendas_por_caixa: int, num_produtos: int = 10,
+                   estoque_inicial: int = 100, modo: str = "threads") -> dict:
+    """
+    Solta `num_caixas` caixas ao mesmo tempo e confere se houve venda acima do estoque.
+    O estoque é menor que a procura de propósito, pra forçar disputa pelos últimos itens.
+    """
+    id_cliente, ids_produtos = _preparar_banco(num_produtos, estoque_inicial)
+
+    if modo == "processos":
+        # spawn: cada caixa abre as próprias conexões em vez de herdar as do processo pai
+        executor = ProcessPoolExecutor(max_workers=num_caixas, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=num_caixas)
+
+    inicio = time.perf_counter()
+    with executor:
+        futuros = [
+            executor.submit(caixa_automatico, n, id_cliente, ids_produtos, vendas_por_caixa, n)
+            for n in range(1, num_caixas + 1)
+        ]
+        resultados = [f.result() for f in futuros]
+    duracao = time.perf_counter() - inicio
+
+    vendidas = sum(r["vendidas"] for r in resultados)
+    return {
+        "caixas": num_caixas,
+        "vendidas": vendidas,
+        "recusadas": sum(r["recusadas"] for r in resultados),
+        "segundos": duracao,
+        "vendas_por_segundo": vendidas / duracao if duracao else 0.0,
+        "divergencias": _conferir_estoque(estoque_inicial),
+    }
+
+
+def relatorio_pesado(parar, prontos, no_principal: bool = False) -> int:
+    """
+    Refaz em loop o ranking de clientes por total gasto direto dos itens de
+    venda (sem os resumos diários). Retorna quantas vezes rodou.
+    """
+    from sqlalchemy import desc, func, select
+    from commons.db import get_read_session, get_session
+    from commons.models import ItemVenda, Venda
+
+    total = func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario)
+    ranking = (
+        select(Venda.id_cliente, total.label("total"))
+        .join(ItemVenda, ItemVenda.id_venda == Venda.id)
+        .group_by(Venda.id_cliente)
+        .order_by(desc("total"))
+        .limit(10)
+    )
+    abrir_sessao = get_session if no_principal else get_read_session
+
+    feitos = 0
+    while not parar.is_set():
+        with abrir_sessao() as session:
+            session.execute(ranking).all()
+        feitos += 1
+        if feitos == 1:
+            prontos.put(True)
+    return feitos
+
+
+def _preparar_historico(num_clientes: int, num_itens: int, ids_produtos: list[int]) -> None:
+    """Vendas antigas (3 itens cada) para os relatórios terem o que varrer."""
+    from datetime import datetime, timedelta
+    from commons.db import engine
+    from commons.models import Cliente, ItemVenda, Venda
+
+    inicio = datetime.now() - timedelta(days=365)
+    num_vendas = max(1, num_itens // 3)
+    with engine.begin() as conn:
+        conn.execute(Cliente.__table__.insert(), [{"nome": f"Cliente histórico {i}"} for i in range(num_clientes)])
+        primeiro_cliente = conn.exec_driver_sql("SELECT min(id) FROM clientes WHERE nome LIKE 'Cliente hist%'").scalar()
+        conn.execute(Venda.__table__.insert(), [
+            {"id_cliente": primeiro_cliente + i % num_clientes, "data_hora": inicio + timedelta(minutes=i)}
+            for i in range(num_vendas)
+        ])
+        primeira_venda = conn.exec_driver_sql("SELECT min(id) FROM vendas").scalar()
+        conn.execute(ItemVenda.__table__.insert(), [
+            {"id_venda": primeira_venda + i // 3, "id_produto": ids_produtos[i % len(ids_produtos)],
+             "quantidade": 1 + i % 3, "preco_unitario": 1.0 + i % 50}
+            for i in range(num_vendas * 3)
+        ])
+
+
+def teste_relatorios(num_relatorios: int, num_vendas: int, id_cliente: int, ids_produtos: list[int],
+                     modo: str = "threads", no_principal: bool = False) -> dict:
+    """
+    Um caixa passa `num_vendas` vendas enquanto `num_relatorios` relatórios pesados
+    rodam ao mesmo tempo (0 = caixa sozinho). Retorna os tempos das vendas.
+    """
+    import queue
+    import threading
+    from crud_produtos import pesquisar_produto
+    from crud_vendas import efetivar_venda
+
+    if modo == "processos":
+        contexto = multiprocessing.get_context("spawn")
+        gerente = contexto.Manager()
+        parar, prontos = gerente.Event(), gerente.Queue()
+        executor = ProcessPoolExecutor(max_workers=max(1, num_relatorios), mp_context=contexto)
+    else:
+        gerente = None
+        parar, prontos = threading.Event(), queue.Queue()
+        executor = ThreadPoolExecutor(max_workers=max(1, num_relatorios))
+
+    rng = random.Random(1)
+    tempos = []
+    with executor:
+        futuros = [executor.submit(relatorio_pesado, parar, prontos, no_principal) for _ in range(num_relatorios)]
+        for _ in futuros:
+            prontos.get()   # só começa a medir com todos os relatórios já rodando
+
+        for _ in range(num_vendas):
+            pid = rng.choice(ids_produtos)
+            produto = pesquisar_produto(pid)
+            t0 = time.perf_counter()
+            efetivar_venda(id_cliente, [{'id_produto': pid, 'quantidade': 1, 'preco': produto.preco}])
+            tempos.append((time.perf_counter() - t0) * 1000)
+
+        parar.set()
+        relatorios_feitos = sum(f.result() for f in futuros)
+    if gerente is not None:
+        gerente.shutdown()
+
+    return {"relatorios_feitos": relatorios_feitos, **resumo_tempos(tempos)}
+
+
+def main_relatorios(args) -> None:
+    from tabulate import tabulate
+    from commons.db import DATABASE_URL_LEITURA, NOME_PERFIL_LEITURA
+
+    id_cliente, ids_produtos = _preparar_banco(args.produtos, 10**9)
+    _preparar_historico(1000, args.historico, ids_produtos)
+    print(f"Histórico: {args.historico} itens de venda. Engine de leitura: "
+          f"{DATABASE_URL_LEITURA or 'o principal'} (perfil {NOME_PERFIL_LEITURA}).")
+
+    tabela = []
+    for rotulo, relatorios, no_principal in [
+        ("caixa sozinho", 0, False),
+        ("engine principal", args.relatorios, True),
+        ("engine de leitura", args.relatorios, False),
+    ]:
+        r = teste_relatorios(relatorios, args.vendas, id_cliente, ids_produtos, args.modo, no_principal)
+        tabela.append([rotulo, relatorios, r["relatorios_feitos"], args.vendas,
+                       f"{r['p50']:.1f}", f"{r['p99']:.1f}", f"{r['maximo']:.1f}"])
+
+    print(tabulate(
+        tabela,
+        headers=["Relatórios pelo", "Relatórios simultâneos", "Relatórios feitos", "Vendas",
+                 "Venda p50 (ms)", "Venda p99 (ms)", "Venda máx (ms)"],
+        tablefmt="fancy_grid"
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de estresse do modo multi-caixa.")
+    parser.add_argument("--caixas", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--vendas", type=int, default=200, help="vendas tentadas por caixa")
+    parser.add_argument("--produtos", type=int, default=10)
+    parser.add_argument("--estoque", type=int, default=None,
+                        help="estoque inicial por produto (padrão: metade da procura esperada)")
+    parser.add_argument("--modo", choices=["threads", "processos"], default="threads")
+    parser.add_argument("--relatorios", type=int, default=0,
+                        help="em vez do estresse: tempo das vendas com N relatórios pesados rodando junto")
+    parser.add_argument("--historico", type=int, default=300_000, help="itens de venda antigos (com --relatorios)")
+    args = parser.parse_args()
+
+    with banco_temporario("multicaixa_", arquivo="estresse.db"):
+        if args.relatorios:
+            main_relatorios(args)
+        else:
+            main_estresse(args)
+
+
+def main_estresse(args) -> None:
+    from tabulate import tabulate
+
+    tabela = []
+    falhou = False
+    for n in args.caixas:
+        # cada cesta pede em média 2 produtos x 2 unidades
+        estoque = args.estoque or max(1, (n * args.vendas * 4) // (2 * args.produtos))
+        r = teste_estresse(n, args.vendas, args.produtos, estoque, args.modo)
+        falhou = falhou or bool(r["divergencias"])
+        tabela.append([
+            r["caixas"], r["vendidas"], r["recusadas"], f"{r['segundos']:.2f}",
+            f"{r['vendas_por_segundo']:.0f}", "OK" if not r["divergencias"] else f"{len(r['divergencias'])} produtos",
+        ])
+
+    print(tabulate(
+        tabela,
+        headers=["Caixas", "Vendidas", "Recusadas", "Tempo (s)", "Vendas/s", "Venda acima do estoque"],
+        tablefmt="fancy_grid"
+    ))
+    raise SystemExit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
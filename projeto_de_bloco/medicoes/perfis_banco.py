@@ -0,0 +1,109 @@
+# perfis_banco.py
+"""
+Commits/s e tempo de relatório de cada perfil de armazenamento (PRAGMAs de
+commons/db.py), em bancos temporários criados ao lado do banco de verdade
+(mesmo disco, mesmo custo de fsync):
+
+    python -m medicoes.perfis_banco --vendas 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+from tabulate import tabulate
+
+from commons import models
+from commons.db import CAMINHO_BANCO, PERFIS, PerfilArmazenamento, criar_engine
+
+
+def _medir_perfil(url: str, perfil: PerfilArmazenamento, vendas: int, itens_historico: int) -> dict:
+    teste = criar_engine(url, perfil)
+    models.Base.metadata.create_all(bind=teste)
+    with teste.begin() as conn:
+        conn.execute(insert(models.Cliente), [{"nome": "Cliente teste"}])
+        conn.execute(insert(models.Produto), [
+            {"nome": f"Produto {i}", "quantidade": 10**9, "preco": 1.0 + i % 50} for i in range(1, 501)
+        ])
+
+    # Commit puro: uma linha por transação, direto no driver (mostra o custo do fsync)
+    bruta = teste.raw_connection()
+    try:
+        cursor = bruta.cursor()
+        cursor.execute("CREATE TABLE _commits (x INTEGER)")
+        bruta.commit()
+        t0 = time.perf_counter()
+        for i in range(vendas * 5):
+            cursor.execute("INSERT INTO _commits VALUES (?)", (i,))
+            bruta.commit()
+        commits = vendas * 5 / (time.perf_counter() - t0)
+    finally:
+        bruta.close()
+
+    # Uma venda = uma transação (venda, 3 itens, 3 baixas de estoque), como no caixa
+    t0 = time.perf_counter()
+    with teste.connect() as conn:
+        for _ in range(vendas):
+            with conn.begin():
+                id_venda = conn.execute(
+                    insert(models.Venda).values(id_cliente=1, data_hora=datetime.now()).returning(models.Venda.id)
+                ).scalar()
+                for id_produto in random.sample(range(1, 501), 3):
+                    conn.execute(insert(models.ItemVenda).values(
+                        id_venda=id_venda, id_produto=id_produto, quantidade=1, preco_unitario=2.0))
+                    conn.execute(update(models.Produto).where(models.Produto.id == id_produto)
+                                 .values(quantidade=models.Produto.quantidade - 1))
+    vendas_por_segundo = vendas / (time.perf_counter() - t0)
+
+    # Relatório: agrega um histórico grande de itens (leitura inteira + agrupamento temporário)
+    with teste.begin() as conn:
+        conn.execute(insert(models.ItemVenda), [
+            {"id_venda": 1 + i % vendas, "id_produto": 1 + i % 500, "quantidade": 1 + i % 3, "preco_unitario": 2.0}
+            for i in range(itens_historico)
+        ])
+    consulta = (
+        select(models.ItemVenda.id_venda, func.sum(models.ItemVenda.quantidade * models.ItemVenda.preco_unitario))
+        .group_by(models.ItemVenda.id_venda)
+        .order_by(func.sum(models.ItemVenda.quantidade * models.ItemVenda.preco_unitario).desc())
+    )
+    teste.dispose()
+    tempos = []
+    with teste.connect() as conn:
+        for _ in range(4):
+            t0 = time.perf_counter()
+            conn.execute(consulta).all()
+            tempos.append((time.perf_counter() - t0) * 1000)
+    teste.dispose()
+    return {"commits": commits, "vendas": vendas_por_segundo, "relatorio_primeiro_ms": tempos[0], "relatorio_ms": min(tempos[1:])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commits/s e tempo de relatório de cada perfil de armazenamento.")
+    parser.add_argument("--perfis", nargs="+", default=list(PERFIS), choices=list(PERFIS))
+    parser.add_argument("--vendas", type=int, default=2000, help="vendas (transações) por perfil")
+    parser.add_argument("--historico", type=int, default=300_000, help="itens de venda para o relatório")
+    parser.add_argument("--pasta", default=str(CAMINHO_BANCO.parent),
+                        help="onde criar os bancos de teste (padrão: mesmo disco do banco de verdade)")
+    args = parser.parse_args()
+
+    tabela = []
+    with tempfile.TemporaryDirectory(prefix="perfis_", dir=args.pasta) as pasta:
+        for nome in args.perfis:
+            perfil = PERFIS[nome]
+            resultado = _medir_perfil(f"sqlite:///{os.path.join(pasta, nome + '.db')}", perfil,
+                                      args.vendas, args.historico)
+            tabela.append([nome, perfil.synchronous, perfil.cache_size, perfil.mmap_size // 2**20, perfil.temp_store,
+                           f"{resultado['commits']:.0f}", f"{resultado['vendas']:.0f}",
+                           f"{resultado['relatorio_primeiro_ms']:.0f}",
+                           f"{resultado['relatorio_ms']:.0f}"])
+
+    print(tabulate(tabela, headers=["Perfil", "synchronous", "cache_size", "mmap (MB)", "temp_store",
+                                    "Commits/s", "Vendas/s", "Relatório 1ª (ms)", "Relatório (ms)"],
+                   tablefmt="fancy_grid"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# requisicao_condicional.py
+"""
+Requisição condicional do cache HTTP (commons.cache_http) contra um
+http.server local: a primeira busca baixa (200), a segunda volta 304 com o
+corpo guardado e, com a página alterada, baixa de novo:
+
+    python -m medicoes.requisicao_condicional
+"""
+from __future__ import annotations
+
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from commons.cache_http import CacheHttp
+
+
+def main() -> None:
+    """Sobe um http.server numa pasta temporária e confere 200 → 304 → 200 (página alterada)."""
+    class _Silencioso(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    with tempfile.TemporaryDirectory(prefix="cache_http_") as pasta:
+        pagina = Path(pasta) / "produtos.html"
+        pagina.write_text("<html>" + "<p>produto</p>" * 50_000 + "</html>", encoding="utf-8")
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Silencioso, directory=pasta))
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/produtos.html"
+
+        cache = CacheHttp(Path(pasta) / "cache")
+        try:
+            primeira = cache.buscar(url)
+            segunda = cache.buscar(url)
+            assert not primeira.inalterada and segunda.inalterada, "esperava 200 e depois 304"
+            assert segunda.conteudo == primeira.conteudo
+
+            # Last-Modified tem resolução de segundos: garante data nova
+            pagina.write_text("<html><p>outro</p></html>", encoding="utf-8")
+            os.utime(pagina, (time.time() + 5, time.time() + 5))
+            terceira = cache.buscar(url)
+            assert not terceira.inalterada and b"outro" in terceira.conteudo, "esperava página nova"
+        finally:
+            servidor.shutdown()
+
+        print(f"OK: 200 ({primeira.bytes_baixados} bytes), 304 ({segunda.bytes_baixados} bytes), "
+              f"200 após mudança ({terceira.bytes_baixados} bytes).")
+        print(cache.resumo())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# vazao_scraping.py
+"""
+Vazão do motor de raspagem (motor_scraping) em páginas/s contra um servidor
+local com vários "sites" paginados, para cada número de threads:
+
+    python -m medicoes.vazao_scraping --paginas 40 --threads 1 4 8 --latencia 0.05
+
+Uma resposta a cada --falha-a-cada é 503, para exercitar a retentativa.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import tempfile
+import threading
+import time
+
+from commons.cache_http import CacheHttp
+from motor_scraping import FonteProdutos, MotorScraping
+
+
+def _servidor_fixture(sites: int, paginas: int, produtos_por_pagina: int, latencia: float, falha_a_cada: int):
+    """
+    Servidor local com `sites` catálogos paginados (/site{s}/pagina{n}.html).
+    Cada resposta demora `latencia` segundos; uma a cada `falha_a_cada`
+    requisições responde 503 (para exercitar a retentativa).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    contador = {"n": 0}
+    trava = threading.Lock()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latencia)
+            with trava:
+                contador["n"] += 1
+                falhar = falha_a_cada and contador["n"] % falha_a_cada == 0
+            m = re.match(r"^/site(\d+)/pagina(\d+)\.html$", self.path)
+            if falhar:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if not m or not (1 <= int(m.group(1)) <= sites and 1 <= int(m.group(2)) <= paginas):
+                self.send_response(404)
+                self.end_headers()
+                return
+            s, n = int(m.group(1)), int(m.group(2))
+            cards = "".join(
+                f'<div class="product-card"><h5 class="card-title">Site {s} Produto {(n - 1) * produtos_por_pagina + i}</h5>'
+                f'<p class="card-price" data-preco="{i + 0.99}">R$ {i},99</p><p data-qtd="{i % 7}">Estoque</p></div>'
+                for i in range(produtos_por_pagina)
+            )
+            corpo = f'<html><body><div id="produtos-lista">{cards}</div></body></html>'.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser(description="Teste de vazão do motor de raspagem contra servidor local.")
+    parser.add_argument("--sites", type=int, default=3)
+    parser.add_argument("--paginas", type=int, default=40, help="páginas por site")
+    parser.add_argument("--produtos", type=int, default=24, help="produtos por página")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por resposta do servidor")
+    parser.add_argument("--limite-host", type=float, default=100.0, help="requisições/s por host")
+    parser.add_argument("--falha-a-cada", type=int, default=25, help="uma resposta 503 a cada N (0 desliga)")
+    args = parser.parse_args()
+
+    servidor = _servidor_fixture(args.sites, args.paginas, args.produtos, args.latencia, args.falha_a_cada)
+    porta = servidor.server_address[1]
+    # 127.0.0.1 e localhost contam como hosts diferentes para o limitador
+    hosts = ["127.0.0.1", "localhost"]
+    fontes = [
+        FonteProdutos(f"site{s}", f"http://{hosts[s % 2]}:{porta}/site{s}/pagina{{pagina}}.html",
+                      max_paginas=args.paginas + 5)
+        for s in range(1, args.sites + 1)
+    ]
+    esperado = args.sites * args.paginas * args.produtos
+
+    tabela = []
+    primeira_ordem = None
+    falhou = False
+    try:
+        for n in args.threads:
+            with tempfile.TemporaryDirectory(prefix="motor_scraping_") as pasta:
+                motor = MotorScraping(fontes, threads=n, req_por_segundo_por_host=args.limite_host,
+                                      backoff=0.05, cache=CacheHttp(pasta))
+                nomes = [produto["nome"] for produto in motor.produtos()]
+            total = len(nomes)
+            # a ordem não pode depender de qual thread terminou antes (o hash do CSV muda)
+            primeira_ordem = primeira_ordem or nomes
+            mesma_ordem = nomes == primeira_ordem
+            falhou = falhou or total != esperado or not mesma_ordem
+            tabela.append([n, motor.paginas, total, motor.falhas, f"{motor.segundos:.2f}",
+                           f"{motor.paginas / motor.segundos:.1f}", "OK" if total == esperado else f"esperado {esperado}",
+                           "sim" if mesma_ordem else "NÃO"])
+    finally:
+        servidor.shutdown()
+
+    print(tabulate(tabela, headers=["Threads", "Páginas", "Produtos", "Falhas", "Tempo (s)", "Páginas/s", "Catálogo",
+                                    "Mesma ordem"],
+                   tablefmt="fancy_grid"))
+    raise SystemExit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# vendas_com_atualizador.py
+"""
+Tempo das vendas com o catálogo sendo atualizado (atualizador_catalogo): um
+caixa registra vendas sem parar enquanto uma mudança grande de catálogo é
+aplicada, com lotes curtos e com uma transação única, num banco temporário:
+
+    python -m medicoes.vendas_com_atualizador --produtos 20000 --mudancas 10000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+
+from atualizador_catalogo import calcular_mudancas
+from commons.medicao import banco_temporario, resumo_tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo das vendas enquanto o catálogo é atualizado.")
+    parser.add_argument("--produtos", type=int, default=20_000)
+    parser.add_argument("--mudancas", type=int, default=10_000, help="produtos alterados na rodada")
+    parser.add_argument("--lote", type=int, default=100, help="produtos por transação do atualizador")
+    args = parser.parse_args()
+
+    with banco_temporario("atualizador_", arquivo="atualizador.db"):
+        _medir(args)
+
+
+def _medir(args) -> None:
+    from sqlalchemy import select
+    from tabulate import tabulate
+    from commons.catalogo import catalogo
+    from commons.db import get_session, init_db
+    from commons.models import Cliente, Produto
+    from crud_produtos import aplicar_mudancas_catalogo, pesquisar_produto
+    from crud_vendas import efetivar_venda
+
+    init_db()
+    with get_session() as session:
+        session.add(Cliente(nome="Cliente teste"))
+        session.connection().execute(Produto.__table__.insert(), [
+            {"nome": f"Produto {i}", "quantidade": 1_000_000, "preco": 10.0} for i in range(args.produtos)
+        ])
+        session.commit()
+    anterior = {f"Produto {i}": (1_000_000, 10.0) for i in range(args.produtos)}
+
+    def rodada(tamanho_lote: int | None, preco: float) -> list:
+        """Vendas em sequência num caixa; só contam as que rodaram enquanto o catálogo era gravado."""
+        novo = dict(anterior)
+        for i in random.sample(range(args.produtos), args.mudancas):
+            novo[f"Produto {i}"] = (1_000_000 + 5, preco)
+        mudancas = calcular_mudancas(anterior, novo)
+        anterior.update(novo)
+
+        tempos, gravando, fim = [], threading.Event(), threading.Event()
+
+        def caixa():
+            while not fim.is_set():
+                produto = pesquisar_produto(random.randrange(1, args.produtos + 1))
+                t0 = time.perf_counter()
+                efetivar_venda(1, [{"id_produto": produto.id, "quantidade": 1, "preco": produto.preco}])
+                if gravando.is_set():
+                    tempos.append((time.perf_counter() - t0) * 1000)
+
+        thread = threading.Thread(target=caixa)
+        thread.start()
+        time.sleep(0.2)
+        gravando.set()
+        if tamanho_lote is None:
+            time.sleep(1.0)   # referência: caixa sozinho
+            contagem = {"atualizados": 0, "lotes": 0, "maior_transacao_ms": 0.0}
+        else:
+            contagem = aplicar_mudancas_catalogo(mudancas, tamanho_lote)
+        gravando.clear()
+        fim.set()
+        thread.join()
+        r = resumo_tempos(tempos)
+        return ["sem atualização" if tamanho_lote is None else tamanho_lote, contagem["atualizados"],
+                contagem["lotes"], f"{contagem['maior_transacao_ms']:.1f}", len(tempos),
+                f"{r['p50']:.1f}", f"{r['p99']:.1f}", f"{r['maximo']:.1f}"]
+
+    tabela = [rodada(None, 10.0), rodada(args.lote, 11.0), rodada(args.mudancas, 12.0)]
+    print(tabulate(tabela, headers=["Lote", "Alterados", "Transações", "Maior transação (ms)",
+                                    "Vendas", "Venda p50 (ms)", "Venda p99 (ms)", "Venda máx (ms)"],
+                   tablefmt="fancy_grid"))
+
+    with get_session() as session:
+        precos = session.execute(select(Produto.preco).distinct()).scalars().all()
+    print(f"Preços no banco depois das rodadas: {sorted(precos)}; catálogo em memória: {catalogo.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
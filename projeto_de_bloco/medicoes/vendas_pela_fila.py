@@ -0,0 +1,99 @@
+# vendas_pela_fila.py
+"""
+Quanto a gravação segura o caixa: vendas/s gravando direto (crud_vendas) e
+pela fila de gravação por trás (fila_vendas.FilaVendas), num banco
+temporário no mesmo disco do banco de verdade:
+
+    python -m medicoes.vendas_pela_fila --vendas 1000 --ritmo 50
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from commons.medicao import banco_temporario, resumo_tempos
+from fila_vendas import FilaVendas
+
+PASTA_DADOS = Path(__file__).resolve().parent.parent / "dados"
+
+
+def passar_vendas(registrar, num_vendas: int, num_produtos: int, ritmo: float | None) -> dict:
+    """Um caixa passando vendas a `ritmo` vendas/s (None = sem pausa); mede quanto cada uma segurou o caixa."""
+    rng = random.Random(1)
+    tempos = []
+    inicio = proxima = time.perf_counter()
+    for _ in range(num_vendas):
+        if ritmo:
+            proxima += 1 / ritmo
+            time.sleep(max(0.0, proxima - time.perf_counter()))
+        itens = [{"id_produto": pid, "quantidade": 1, "preco": 2.0}
+                 for pid in rng.sample(range(1, num_produtos + 1), 3)]
+        t0 = time.perf_counter()
+        registrar(itens)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return {"vendas_por_segundo": num_vendas / (time.perf_counter() - inicio), **resumo_tempos(tempos)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quanto a gravação segura o caixa: direta x fila (write-behind).")
+    parser.add_argument("--vendas", type=int, default=1000)
+    parser.add_argument("--ritmo", type=float, default=50, help="vendas/s que o caixa tenta passar")
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--capacidade", type=int, default=500, help="vendas que cabem na fila")
+    parser.add_argument("--lote", type=int, default=64, help="máximo de vendas por commit")
+    parser.add_argument("--pasta", default=str(PASTA_DADOS),
+                        help="onde criar o banco de teste (padrão: mesmo disco do banco de verdade)")
+    args = parser.parse_args()
+
+    with banco_temporario("fila_vendas_", args.pasta, "fila.db"):
+        _comparar(args)
+
+
+def _comparar(args) -> None:
+    from sqlalchemy import func, select
+    from tabulate import tabulate
+    from commons.db import NOME_PERFIL, get_session, init_db
+    from commons.models import Cliente, Produto, Venda
+    from crud_vendas import efetivar_venda
+
+    init_db()
+    with get_session() as session:
+        session.add(Cliente(nome="Cliente teste"))
+        session.connection().execute(Produto.__table__.insert(), [
+            {"nome": f"Produto {i}", "quantidade": 10**9, "preco": 1.0 + i % 50} for i in range(args.produtos)
+        ])
+        session.commit()
+
+    tabela = []
+    total = 0
+    for rotulo, fila, ritmo in [
+        ("direto", None, args.ritmo),
+        ("fila", FilaVendas(args.capacidade, args.lote), args.ritmo),
+        ("fila, sem pausa", FilaVendas(args.capacidade, args.lote), None),
+    ]:
+        enviadas = []
+        if fila is None:
+            r = passar_vendas(lambda itens: efetivar_venda(1, itens), args.vendas, args.produtos, ritmo)
+        else:
+            r = passar_vendas(lambda itens: enviadas.append(fila.enviar(1, itens)), args.vendas, args.produtos, ritmo)
+            fila.parar()
+            assert all(venda.resultado.result() for venda in enviadas)
+        total += args.vendas
+        tabela.append([rotulo, f"{ritmo:.0f}" if ritmo else "-", f"{r['vendas_por_segundo']:.0f}",
+                       f"{r['p50']:.2f}", f"{r['p99']:.2f}", f"{r['maximo']:.1f}",
+                       fila.lotes if fila else args.vendas, fila.maior_lote if fila else 1])
+
+    print(f"Perfil de armazenamento: {NOME_PERFIL}; fila com {args.capacidade} vagas, lotes de até {args.lote}.")
+    print(tabulate(tabela, headers=["Gravação", "Ritmo pedido", "Vendas/s no caixa", "Caixa parado p50 (ms)",
+                                    "p99 (ms)", "máx (ms)", "Commits", "Maior lote"],
+                   tablefmt="fancy_grid"))
+
+    with get_session() as session:
+        no_banco = session.execute(select(func.count(Venda.id))).scalar()
+    print(f"Vendas no banco: {no_banco} (esperado {total}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# motor_scraping.py
+"""
+Motor de raspagem para vários sites/páginas de produtos ao mesmo tempo.
+
+Cada fonte é uma FonteProdutos: URL (com {pagina} se for paginada por
+número), seletores CSS do card e dos campos, e a regra de paginação
+(número até a primeira página vazia/404 ou `max_paginas`, ou seguir o link
+de `seletor_proxima`). As páginas são baixadas num pool de threads, pelo
+cache HTTP condicional (commons/cache_http.py), com limite de requisições
+por host e retentativa com backoff. Os produtos saem num único fluxo
+(gerador) à medida que as páginas chegam, sem repetir nome.
+
+Teste de vazão (páginas/s) contra um servidor local:
+python -m medicoes.vazao_scraping --paginas 40 --threads 1 4 8 --latencia 0.05
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterator
+from urllib.parse import urlsplit
+
+from commons.cache_http import CacheHttp
+from extracao_cards import extrair_cards
+
+# Erros do servidor que valem nova tentativa
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+@dataclass(frozen=True)
+class FonteProdutos:
+    nome: str
+    url: str                                  # "https://site/produtos?p={pagina}" se for paginada
+    seletor_card: str = "#produtos-lista .product-card"
+    seletor_nome: str = "h5.card-title"
+    seletor_preco: str = "p.card-price"       # usa data-preco se houver, senão o texto
+    seletor_qtd: str = "p[data-qtd]"          # usa data-qtd se houver, senão o texto
+    primeira_pagina: int = 1
+    max_paginas: int = 1
+    seletor_proxima: str | None = None        # link "próxima página" (para sites sem {pagina})
+    extrator: str = "auto"                    # "lxml", "htmlparser" ou "bs4" (ver extracao_cards.py)
+
+    @property
+    def paginada_por_numero(self) -> bool:
+        return "{pagina}" in self.url
+
+    def url_da_pagina(self, numero: int) -> str:
+        return self.url.format(pagina=numero) if self.paginada_por_numero else self.url
+
+
+@dataclass(slots=True)
+class PaginaRaspada:
+    produtos: list[dict]
+    proxima_url: str | None
+    inalterada: bool
+    rejeitados: Counter
+
+
+class LimitadorPorHost:
+    """Espaça as requisições a um mesmo host em pelo menos 1/req_por_segundo segundos."""
+
+    def __init__(self, req_por_segundo: float):
+        self.intervalo = 1.0 / req_por_segundo if req_por_segundo > 0 else 0.0
+        self._proxima: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def aguardar(self, host: str) -> None:
+        with self._lock:
+            agora = time.monotonic()
+            horario = max(agora, self._proxima.get(host, 0.0))
+            self._proxima[host] = horario + self.intervalo
+        if horario > agora:
+            time.sleep(horario - agora)
+
+
+class MotorScraping:
+    def __init__(self, fontes: list[FonteProdutos], threads: int = 8, req_por_segundo_por_host: float = 10.0,
+                 tentativas: int = 4, backoff: float = 0.2, timeout: float = 10, forcar: bool = False,
+                 cache: CacheHttp | None = None, avisar: Callable[[str], object] = print):
+        self.fontes = fontes
+        self.threads = threads
+        self.limitador = LimitadorPorHost(req_por_segundo_por_host)
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.timeout = timeout
+        self.forcar = forcar
+        self.cache = cache or CacheHttp()
+        self.avisar = avisar
+
+        self.paginas = 0
+        self.paginas_inalteradas = 0
+        self.falhas = 0
+        self.produtos_unicos = 0
+        self.repetidos = 0
+        self.rejeitados: Counter = Counter()    # cards descartados, por motivo
+        self.segundos = 0.0
+
+    @property
+    def todas_inalteradas(self) -> bool:
+        """Todas as páginas vieram 304 (nada mudou desde a última raspagem)."""
+        return self.paginas > 0 and self.paginas == self.paginas_inalteradas and not self.falhas
+
+    def _buscar(self, url: str):
+        import requests
+
+        for tentativa in range(1, self.tentativas + 1):
+            self.limitador.aguardar(urlsplit(url).netloc)
+            try:
+                return self.cache.buscar(url, timeout=self.timeout, forcar=self.forcar)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status == 404:
+                    return None   # fim da paginação
+                if status not in STATUS_RETENTAVEIS or tentativa == self.tentativas:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                if tentativa == self.tentativas:
+                    raise
+            # backoff exponencial com jitter, pra fontes com problema não receberem rajadas
+            time.sleep(self.backoff * (2 ** (tentativa - 1)) * (0.5 + random.random()))
+
+    def _baixar_pagina(self, fonte: FonteProdutos, url: str) -> PaginaRaspada | None:
+        resposta = self._buscar(url)
+        if resposta is None:
+            return None
+        extracao = extrair_cards(resposta.conteudo, fonte, url)
+        return PaginaRaspada(extracao.produtos, extracao.proxima_url, resposta.inalterada, extracao.rejeitados)
+
+    def produtos(self) -> Iterator[dict]:
+        """
+        Fluxo único de produtos de todas as fontes, sempre na mesma ordem (fonte
+        a fonte, página a página, como em self.fontes): a página que chega antes
+        da hora espera as anteriores. Assim a mesma raspagem gera o mesmo CSV
+        (e o mesmo hash no manifesto do boot). Nome repetido (em outra página ou
+        outra fonte) fica com a primeira ocorrência nessa ordem.
+        """
+        inicio = time.perf_counter()
+        vistos: set[str] = set()
+        # por fonte: próxima página a pedir e limite (primeira página vazia/404)
+        proxima_pagina: dict[str, int] = {}
+        limite: dict[str, int] = {}
+        visitadas: set[str] = set()
+        # por fonte: páginas já baixadas esperando a vez (None = falhou/404) e a próxima a entregar
+        chegadas: dict[str, dict[int, PaginaRaspada | None]] = {fonte.nome: {} for fonte in self.fontes}
+        a_entregar = {fonte.nome: fonte.primeira_pagina for fonte in self.fontes}
+        fonte_atual = 0
+
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="scraper") as pool:
+            rodando = {}
+
+            def enviar(fonte: FonteProdutos, numero: int, url: str) -> None:
+                visitadas.add(url)
+                rodando[pool.submit(self._baixar_pagina, fonte, url)] = (fonte, numero, url)
+
+            def enviar_numeradas(fonte: FonteProdutos) -> None:
+                # janela: no máximo `threads` páginas da fonte em voo, sem passar do limite
+                em_voo = sum(1 for f, _, _ in rodando.values() if f is fonte)
+                while em_voo < self.threads and proxima_pagina[fonte.nome] < limite[fonte.nome]:
+                    numero = proxima_pagina[fonte.nome]
+                    proxima_pagina[fonte.nome] += 1
+                    enviar(fonte, numero, fonte.url_da_pagina(numero))
+                    em_voo += 1
+
+            for fonte in self.fontes:
+                proxima_pagina[fonte.nome] = fonte.primeira_pagina
+                limite[fonte.nome] = fonte.primeira_pagina + fonte.max_paginas
+                if fonte.paginada_por_numero:
+                    enviar_numeradas(fonte)
+                else:
+                    enviar(fonte, fonte.primeira_pagina, fonte.url)
+
+            while rodando:
+                prontas, _ = wait(rodando, return_when=FIRST_COMPLETED)
+                for futuro in prontas:
+                    fonte, numero, url = rodando.pop(futuro)
+                    try:
+                        pagina = futuro.result()
+                    except Exception as e:
+                        self.falhas += 1
+                        self.avisar(f"Erro ao raspar {url}: {e}")
+                        pagina = None
+                    else:
+                        if pagina is not None:
+                            self.paginas += 1
+                            self.paginas_inalteradas += pagina.inalterada
+                            self.rejeitados.update(pagina.rejeitados)
+
+                    if fonte.paginada_por_numero:
+                        if pagina is not None and not pagina.produtos and numero < limite[fonte.nome]:
+                            limite[fonte.nome] = numero   # página vazia: acabou o catálogo da fonte
+                        elif pagina is None and futuro.exception() is None:
+                            limite[fonte.nome] = min(limite[fonte.nome], numero)   # 404
+                        enviar_numeradas(fonte)
+                    elif (pagina and pagina.proxima_url and pagina.proxima_url not in visitadas
+                          and numero + 1 < limite[fonte.nome]):
+                        enviar(fonte, numero + 1, pagina.proxima_url)
+
+                    chegadas[fonte.nome][numero] = pagina
+
+                # entrega as páginas que já têm todas as anteriores
+                while fonte_atual < len(self.fontes):
+                    fonte = self.fontes[fonte_atual]
+                    numero = a_entregar[fonte.nome]
+                    if numero >= limite[fonte.nome]:
+                        fonte_atual += 1   # páginas depois do fim (pedidas na mesma janela) não contam
+                        continue
+                    if numero not in chegadas[fonte.nome]:
+                        if any(f is fonte for f, _, _ in rodando.values()):
+                            break          # ainda vem
+                        fonte_atual += 1   # a fonte acabou (sem próxima página)
+                        continue
+                    pagina = chegadas[fonte.nome].pop(numero)
+                    a_entregar[fonte.nome] += 1
+                    for produto in pagina.produtos if pagina else ():
+                        if produto['nome'] in vistos:
+                            self.repetidos += 1
+                            continue
+                        vistos.add(produto['nome'])
+                        self.produtos_unicos += 1
+                        yield produto
+
+        self.segundos = time.perf_counter() - inicio
+
+    def resumo(self) -> str:
+        vazao = self.paginas / self.segundos if self.segundos else 0.0
+        rejeitados = ""
+        if self.rejeitados:
+            motivos = ", ".join(f"{motivo}: {n}" for motivo, n in self.rejeitados.most_common())
+            rejeitados = f", {sum(self.rejeitados.values())} cards rejeitados ({motivos})"
+        return (
+            f"{self.paginas} páginas de {len(self.fontes)} fonte(s) em {self.segundos:.2f}s "
+            f"({vazao:.1f} páginas/s), {self.paginas_inalteradas} sem mudança, {self.falhas} com falha; "
+            f"{self.produtos_unicos} produtos ({self.repetidos} repetidos descartados{rejeitados}). "
+            f"{self.cache.resumo()}"
+        )
@@ -1,11 +1,13 @@
 # relatorios.py
+import json
 from tabulate import tabulate
-from crud_produtos import consultar_produtos
-from crud_vendas import consultar_vendas
+from crud_produtos import consultar_produtos_sem_estoque
+from crud_turnos import fechar_turno
 from commons.utils import obter_data
 
 
-def fechar_caixa(vendas_realizadas):
+def fechar_caixa(id_turno):
+    """Fecha o turno do caixa e exibe o resumo gravado (totais acumulados durante o turno)."""
     
     # Exibe o relatório do caixa
     print("\n===========================")
@@ -13,44 +15,35 @@ def fechar_caixa(vendas_realizadas):
     print("===========================\n")
     print(f"Data: {obter_data()}\n")
 
-    vendas = consultar_vendas()
-    
-    if not vendas:
-        print("Nenhuma venda registrada no banco de dados.")
+    fechamento = fechar_turno(id_turno)
+    if not fechamento:
+        print("Não foi possível fechar o turno.")
         print("="*60)
         return
 
-    # Agrupar vendas por cliente
-    vendas_por_cliente = {}
-    total_vendas = 0.0
-    
-    for venda in vendas:
-        nome_cliente = venda.cliente.nome if venda.cliente else "Cliente Removido"
-        total_venda = sum(item.quantidade * item.preco_unitario for item in venda.itens)
-        total_vendas += total_venda
-        
-        if nome_cliente not in vendas_por_cliente:
-            vendas_por_cliente[nome_cliente] = 0.0
-        
-        vendas_por_cliente[nome_cliente] += total_venda
-
-    # Montar tabela
-    tabela_clientes = [
-        [nome, f"R$ {total:.2f}"]
-        for nome, total in vendas_por_cliente.items()
-    ]
-
-    print(tabulate(tabela_clientes, headers=["Cliente", "Total Gasto"], tablefmt="fancy_grid"))
-    print(f"\nTotal de vendas do caixa: R$ {total_vendas:.2f}\n")
+    print(f"Caixa: {fechamento.numero_caixa} — Operador: {fechamento.operador}")
+    print(f"Turno: {fechamento.aberto_em.strftime('%d/%m/%Y %H:%M')} até {fechamento.fechado_em.strftime('%d/%m/%Y %H:%M')}\n")
+
+    if not fechamento.num_vendas:
+        print("Nenhuma venda registrada neste turno.")
+    else:
+        # Montar tabela
+        tabela_clientes = [
+            [nome, nvendas, f"R$ {total:.2f}"]
+            for nome, nvendas, total in json.loads(fechamento.resumo_clientes)
+        ]
+
+        print(tabulate(tabela_clientes, headers=["Cliente", "Compras", "Total Gasto"], tablefmt="fancy_grid"))
+        print(f"\nVendas no turno: {fechamento.num_vendas}")
+        print(f"Total de vendas do caixa: R$ {fechamento.total_vendas:.2f}\n")
 
     # Produtos sem estoque
-    produtos = consultar_produtos()
-    sem_estoque = [p for p in produtos if p.quantidade == 0]
+    sem_estoque = consultar_produtos_sem_estoque()
 
     print("--- Produtos Sem Estoque ---")
 
     if sem_estoque:
-        tabela_sem_estoque = [[p.id, p.nome, p.quantidade] for p in sem_estoque]
+        tabela_sem_estoque = [[pid, nome, qtd] for pid, nome, qtd in sem_estoque]
         print(tabulate(tabela_sem_estoque, headers=["ID", "Nome", "Qtd"], tablefmt="fancy_grid"))
     else:
         print(tabulate([["Nenhum produto esgotado"]], tablefmt="fancy_grid"))
@@ -1,12 +1,12 @@
 # sig/clientes_menu.py
 from sqlalchemy import func, desc
-from sqlalchemy.orm import joinedload
 from tabulate import tabulate
 
-from commons.db import get_session
-from commons.models import Cliente, Venda, ItemVenda
+from commons.db import get_read_session, get_session, unidade_de_trabalho
+from commons.models import Cliente, Venda, ResumoClienteDia
 from commons.utils import entrar_inteiro
 
+from crud_vendas import buscar_venda, consultar_resumo_vendas
 from crud_clientes import (
     cadastrar_cliente,
     consultar_clientes,
@@ -55,15 +55,17 @@ def _nota_fiscal(venda: Venda):
 
 # ---------- Relatórios do enunciado ----------
 
+@unidade_de_trabalho()
 def listar_clientes_com_compras():
-    with get_session() as session:
+    with get_read_session() as session:
+        # lê do resumo diário por cliente (não reagrega todas as vendas)
         rows = (
             session.query(
                 Cliente.id,
                 Cliente.nome,
-                func.count(Venda.id).label("num_compras")
+                func.sum(ResumoClienteDia.num_vendas).label("num_compras")
             )
-            .join(Venda, Venda.id_cliente == Cliente.id)
+            .join(ResumoClienteDia, ResumoClienteDia.id_cliente == Cliente.id)
             .group_by(Cliente.id, Cliente.nome)
             .order_by(Cliente.id)
             .all()
@@ -88,64 +90,54 @@ def listar_clientes_com_compras():
     ))
 
 
+@unidade_de_trabalho()
 def clientes_com_compras_consultar_cliente():
 
     listar_clientes_com_compras()
 
     id_cliente = entrar_inteiro("ID do cliente: ", min_val=1)
 
-    with get_session() as session:
+    with get_read_session() as session:
         cliente = session.get(Cliente, id_cliente)
         if not cliente:
             print("Cliente não encontrado.")
             return
 
-        vendas = (
-            session.query(Venda)
-            .options(
-                joinedload(Venda.cliente),
-                joinedload(Venda.itens).joinedload(ItemVenda.produto),
-            )
-            .filter(Venda.id_cliente == id_cliente)
-            .order_by(Venda.data_hora.desc())
-            .all()
-        )
+    vendas = consultar_resumo_vendas(id_cliente)
 
-        if not vendas:
-            print(f"O cliente {cliente.nome} não possui compras registradas.")
-            return
+    if not vendas:
+        print(f"O cliente {cliente.nome} não possui compras registradas.")
+        return
 
-        print(f"\nCompras de {cliente.nome} (mais recentes primeiro):")
-        tabela = []
-        for v in vendas:
-            total_v = sum(float(it.quantidade) * float(it.preco_unitario) for it in v.itens)
-            tabela.append([
-                v.id,
-                v.data_hora.strftime('%d/%m/%Y %H:%M'),
-                f"R$ {total_v:.2f}"
-            ])
-
-        print(tabulate(
-            tabela,
-            headers=["ID da Venda", "Data/Hora", "Total"],
-            tablefmt="fancy_grid",
-            colalign=("center", "center", "right")
-        ))
-
-        id_venda = entrar_inteiro("\nDigite o ID da venda para ver a nota fiscal (0 pra voltar): ", min_val=0)
-        if id_venda == 0:
-            return
+    print(f"\nCompras de {cliente.nome} (mais recentes primeiro):")
+    tabela = [
+        [v.id, v.data_hora.strftime('%d/%m/%Y %H:%M'), f"R$ {v.total:.2f}"]
+        for v in vendas
+    ]
 
-        venda = next((x for x in vendas if x.id == id_venda), None)
-        if not venda:
-            print("Venda não encontrada para este cliente.")
-            return
+    print(tabulate(
+        tabela,
+        headers=["ID da Venda", "Data/Hora", "Total"],
+        tablefmt="fancy_grid",
+        colalign=("center", "center", "right")
+    ))
 
-        _nota_fiscal(venda)
+    id_venda = entrar_inteiro("\nDigite o ID da venda para ver a nota fiscal (0 pra voltar): ", min_val=0)
+    if id_venda == 0:
+        return
 
+    # só a venda escolhida é carregada com itens e produtos
+    venda = buscar_venda(id_venda, id_cliente)
+    if not venda:
+        print("Venda não encontrada para este cliente.")
+        return
 
+    _nota_fiscal(venda)
+
+
+@unidade_de_trabalho()
 def clientes_sem_compras():
-    with get_session() as session:
+    with get_read_session() as session:
         rows = (
             session.query(Cliente)
             .outerjoin(Venda, Venda.id_cliente == Cliente.id)
@@ -169,15 +161,16 @@ def clientes_sem_compras():
     ))
 
 
+@unidade_de_trabalho()
 def top_clientes_por_numero_compras(top_n: int = 5):
-    with get_session() as session:
+    with get_read_session() as session:
         rows = (
             session.query(
                 Cliente.id,
                 Cliente.nome,
-                func.count(func.distinct(Venda.id)).label("num_compras"),
+                func.sum(ResumoClienteDia.num_vendas).label("num_compras"),
             )
-            .join(Venda, Venda.id_cliente == Cliente.id)
+            .join(ResumoClienteDia, ResumoClienteDia.id_cliente == Cliente.id)
             .group_by(Cliente.id, Cliente.nome)
             .order_by(desc("num_compras"))
             .limit(top_n)
@@ -199,9 +192,10 @@ def top_clientes_por_numero_compras(top_n: int = 5):
     ))
 
 
+@unidade_de_trabalho()
 def top_clientes_por_total_gasto(top_n: int = 5):
-    with get_session() as session:
-        total_expr = func.sum(ItemVenda.quantidade * ItemVenda.preco_unitario)
+    with get_read_session() as session:
+        total_expr = func.sum(ResumoClienteDia.receita)
 
         rows = (
             session.query(
@@ -209,8 +203,7 @@ def top_clientes_por_total_gasto(top_n: int = 5):
                 Cliente.nome,
                 func.coalesce(total_expr, 0).label("total_gasto"),
             )
-            .join(Venda, Venda.id_cliente == Cliente.id)
-            .join(ItemVenda, ItemVenda.id_venda == Venda.id)
+            .join(ResumoClienteDia, ResumoClienteDia.id_cliente == Cliente.id)
             .group_by(Cliente.id, Cliente.nome)
             .order_by(desc("total_gasto"))
             .limit(top_n)
@@ -237,6 +230,7 @@ def top_clientes_por_total_gasto(top_n: int = 5):
 
 # ---------- Crud ----------
 
+@unidade_de_trabalho()
 def crud_listar_clientes():
     clientes = consultar_clientes()
     if not clientes:
@@ -253,6 +247,7 @@ def crud_listar_clientes():
     ))
 
 
+@unidade_de_trabalho()
 def crud_cadastrar_cliente():
     nome = input("Nome do cliente (ENTER para gerar automático): ").strip()
     cliente = cadastrar_cliente(nome)
@@ -260,6 +255,7 @@ def crud_cadastrar_cliente():
         print("Falha ao cadastrar cliente.")
 
 
+@unidade_de_trabalho()
 def crud_atualizar_cliente():
     cid = entrar_inteiro("\nID do cliente: ", min_val=1)
     novo_nome = input("\nNovo nome: ").strip()
@@ -267,6 +263,7 @@ def crud_atualizar_cliente():
     print("\nCliente atualizado." if ok else "\nNão foi possível atualizar (ID inválido ou nome duplicado).")
 
 
+@unidade_de_trabalho()
 def crud_excluir_cliente():
     cid = entrar_inteiro("ID do cliente: ", min_val=1)
 
@@ -1,9 +1,12 @@
 # sig/produtos_menu.py
 from sqlalchemy import func, asc, desc
 from tabulate import tabulate
-from commons.db import get_session
+from commons.catalogo import catalogo, codigos
+from commons.codigo_barras import normalizar_codigo
+from commons.db import get_read_session, get_session, unidade_de_trabalho
 from commons.models import Produto, Fornecedor, ProdutoFornecedor
 from commons.utils import entrar_inteiro, entrar_float
+from crud_produtos import buscar_produtos
 
 
 def _listar_fornecedores(session):
@@ -41,6 +44,22 @@ def _selecionar_ids_fornecedores(session) -> list[int]:
     return sorted(set(ids_ok))
 
 
+def _ler_codigo_barras(session, mensagem: str, pid: int | None = None) -> str | None | bool:
+    """Código EAN-13 digitado; None se ENTER; False se inválido ou já de outro produto."""
+    texto = input(mensagem).strip()
+    if not texto:
+        return None
+    codigo = normalizar_codigo(texto)
+    if codigo is None:
+        print("Código de barras inválido (EAN-13 com dígito verificador).")
+        return False
+    dono = session.query(Produto.id).filter(Produto.codigo_barras == codigo).scalar()
+    if dono is not None and dono != pid:
+        print(f"Código de barras já usado pelo produto ID {dono}.")
+        return False
+    return codigo
+
+
 def _mapa_fornecedores_por_produto(session) -> dict[int, list[str]]:
     forn_por_id = {f.id_fornecedor: f.nome for f in session.query(Fornecedor).all()}
     assoc = session.query(ProdutoFornecedor).all()
@@ -54,15 +73,24 @@ def _mapa_fornecedores_por_produto(session) -> dict[int, list[str]]:
     return m
 
 
+@unidade_de_trabalho()
 def cadastrar_produto():
     nome = input("Nome do produto: ").strip()
     qtd = entrar_inteiro("Quantidade: ", min_val=0)
     preco = entrar_float("Preço: ", min_val=0.0)
 
     with get_session() as session:
+        if session.query(Produto.id).filter(Produto.nome == nome).first():
+            print("Já existe um produto com esse nome.")
+            return
+
+        codigo = _ler_codigo_barras(session, "Código de barras (ENTER = sem código): ")
+        if codigo is False:
+            return
+
         ids_forn = _selecionar_ids_fornecedores(session)
 
-        produto = Produto(nome=nome, quantidade=qtd, preco=preco)
+        produto = Produto(nome=nome, quantidade=qtd, preco=preco, codigo_barras=codigo)
         session.add(produto)
         session.flush()  # pega produto.id
 
@@ -71,11 +99,14 @@ def cadastrar_produto():
             session.add(ProdutoFornecedor(id_produto=produto.id, id_fornecedor=fid))
 
         session.commit()
+        if codigo:
+            codigos.definir(codigo, produto.id)
         print(f"\nProduto cadastrado com ID {produto.id}.")
 
 
+@unidade_de_trabalho()
 def listar_produtos():
-    with get_session() as session:
+    with get_read_session() as session:
         produtos = session.query(Produto).order_by(Produto.id).all()
         if not produtos:
             print("Nenhum produto cadastrado.")
@@ -89,6 +120,7 @@ def listar_produtos():
             tabela.append([
                 p.id,
                 p.nome,
+                p.codigo_barras or "",
                 p.quantidade,
                 f"R$ {p.preco:.2f}",
                 fornecedores
@@ -98,12 +130,33 @@ def listar_produtos():
     print(
         tabulate(
             tabela,
-            headers=["ID", "Nome", "Qtd", "Preço", "Fornecedor(es)"],
+            headers=["ID", "Nome", "Código de barras", "Qtd", "Preço", "Fornecedor(es)"],
             tablefmt="fancy_grid"
         )
     )
 
 
+@unidade_de_trabalho()
+def buscar_produto_por_nome():
+    texto = input("Nome (ou parte das palavras) do produto: ").strip()
+    resultados, muitos = buscar_produtos(texto, limite=20)
+    if not resultados:
+        print("Nenhum produto encontrado.")
+        return
+
+    print(f"\n--- Produtos encontrados para '{texto}' ---")
+    print(
+        tabulate(
+            [[p.id, p.nome, p.quantidade, f"R$ {p.preco:.2f}"] for p in resultados],
+            headers=["ID", "Nome", "Qtd", "Preço"],
+            tablefmt="fancy_grid"
+        )
+    )
+    if muitos:
+        print("Muitos produtos com essas palavras (mostrando os primeiros): digite mais palavras para refinar.")
+
+
+@unidade_de_trabalho()
 def atualizar_produto():
     pid = entrar_inteiro("ID do produto: ", min_val=1)
     with get_session() as session:
@@ -115,6 +168,9 @@ def atualizar_produto():
         print(f"Atual: nome={produto.nome}, qtd={produto.quantidade}, preco={produto.preco:.2f}")
         novo_nome = input("Novo nome (ENTER mantém): ").strip()
         if novo_nome:
+            if session.query(Produto.id).filter(Produto.nome == novo_nome, Produto.id != pid).first():
+                print("Já existe um produto com esse nome.")
+                return
             produto.nome = novo_nome
 
         qtd = input("Nova quantidade (ENTER mantém): ").strip()
@@ -132,6 +188,13 @@ def atualizar_produto():
                 print("Preço inválido.")
                 return
 
+        codigo_antigo = produto.codigo_barras
+        codigo = _ler_codigo_barras(session, f"Novo código de barras (atual: {codigo_antigo or 'nenhum'}; ENTER mantém): ", pid)
+        if codigo is False:
+            return
+        if codigo:
+            produto.codigo_barras = codigo
+
         print("\nAtualizar fornecedores do produto?")
         print("1 - Manter como está")
         print("2 - Substituir lista de fornecedores")
@@ -146,9 +209,14 @@ def atualizar_produto():
                 session.add(ProdutoFornecedor(id_produto=pid, id_fornecedor=fid))
 
         session.commit()
+        catalogo.invalidar(pid)
+        if codigo and codigo != codigo_antigo:
+            codigos.remover(codigo_antigo)
+            codigos.definir(codigo, pid)
         print("Produto atualizado.")
 
 
+@unidade_de_trabalho()
 def excluir_produto():
     pid = entrar_inteiro("\nID do produto: ", min_val=1)
 
@@ -168,24 +236,29 @@ def excluir_produto():
 
         # Se não tem venda eu posso excluir
         session.query(ProdutoFornecedor).filter(ProdutoFornecedor.id_produto == pid).delete()
+        codigo = produto.codigo_barras
         session.delete(produto)
         session.commit()
+        catalogo.invalidar(pid)
+        codigos.remover(codigo)
 
         print("\nProduto removido com sucesso.")
 
 
 
+@unidade_de_trabalho()
 def consultar_mais_menos_vendidos():
     n = entrar_inteiro("Top N: ", min_val=1)
-    with get_session() as session:
-        # soma de quantidades vendidas por produto (inclui produtos 0 vendas)
-        from commons.models import ItemVenda  # evita import circular
+    with get_read_session() as session:
+        # soma de quantidades vendidas por produto (inclui produtos 0 vendas),
+        # lida do resumo diário em vez de reagregar todos os itens de venda
+        from commons.models import ResumoProdutoDia  # evita import circular
 
-        qtd_expr = func.coalesce(func.sum(ItemVenda.quantidade), 0)
+        qtd_expr = func.coalesce(func.sum(ResumoProdutoDia.quantidade), 0)
 
         base = (
             session.query(Produto.id, Produto.nome, qtd_expr.label("qtd_vendida"))
-            .outerjoin(ItemVenda, ItemVenda.id_produto == Produto.id)
+            .outerjoin(ResumoProdutoDia, ResumoProdutoDia.id_produto == Produto.id)
             .group_by(Produto.id, Produto.nome)
         )
 
@@ -218,9 +291,10 @@ def consultar_mais_menos_vendidos():
         ))
 
 
+@unidade_de_trabalho()
 def consultar_pouco_estoque():
     limite = entrar_inteiro("Considerar 'pouco estoque' abaixo de: ", min_val=0)
-    with get_session() as session:
+    with get_read_session() as session:
         produtos = (
             session.query(Produto)
             .filter(Produto.quantidade <= limite)
@@ -245,9 +319,10 @@ def consultar_pouco_estoque():
     ))
 
 
+@unidade_de_trabalho()
 def fornecedores_de_um_produto():
     pid = entrar_inteiro("ID do produto: ", min_val=1)
-    with get_session() as session:
+    with get_read_session() as session:
         produto = session.get(Produto, pid)
         if not produto:
             print("Produto não encontrado.")
@@ -284,7 +359,8 @@ def menu_produtos():
         print("3 - Atualizar produto")
         print("4 - Excluir produto")
         print("5 - Consultas")
-        print("6 - Voltar")
+        print("6 - Buscar produto por nome")
+        print("7 - Voltar")
 
         opcao = input("Escolha uma opção: ").strip()
 
@@ -316,6 +392,8 @@ def menu_produtos():
                 else:
                     print("Opção inválida.")
         elif opcao == "6":
+            buscar_produto_por_nome()
+        elif opcao == "7":
             break
         else:
             print("Opção inválida.")
@@ -1,162 +1,259 @@
-import pandas as pd
-from crud_vendas import consultar_vendas, registrar_venda
-from crud_produtos import atualizar_estoque
+from datetime import timedelta
+from crud_vendas import buscar_venda, consultar_pagina_vendas, registrar_venda
+from crud_reservas import liberar_carrinho, reservar_item
 from tabulate import tabulate
-from crud_produtos import pesquisar_produto
-from commons.utils import entrar_inteiro, obter_data
-
-def gerar_nota_fiscal(cliente, itens_comprados):
+from crud_produtos import buscar_produtos, pesquisar_por_codigo, pesquisar_produto
+from fila_vendas import fila_ativa, registrar_venda_na_fila
+from diario_vendas import anotar_liberacao, anotar_reserva
+from commons.carrinho import Carrinho
+from commons.codigo_barras import ean13_valido
+from commons.utils import entrar_data, entrar_inteiro, obter_data
+
+def gerar_nota_fiscal(cliente, carrinho: Carrinho, id_turno=None):
     """
-    Registra a venda no banco de dados e exibe a nota fiscal.
-    Retorna o objeto Venda registrado.
+    Registra a venda (itens + baixa de estoque, numa transação só) e exibe a nota fiscal.
+    As reservas do carrinho viram baixa de estoque no mesmo commit.
+    Retorna o objeto Venda registrado (com a fila ligada, a VendaNaFila).
     """
-    # Agrupa os itens para a baixa de estoque e registro.
-    df_compras = pd.DataFrame(itens_comprados)
-
-    df_agrupado = df_compras.groupby(['id_produto', 'nome', 'preco'], as_index=False).agg({
-        'quantidade':'sum',
-        'total_item':'sum'
-    })
-
-    # Registra a Venda no DB 
-    itens_para_registro = []
-    for _, row in df_agrupado.iterrows():
-        itens_para_registro.append({
-            'id_produto': int(row['id_produto']),
-            'quantidade': int(row['quantidade']),
-            'preco': float(row['preco'])
-        })
-        
-    venda_registrada = registrar_venda(cliente, itens_para_registro)
+    # Registra a Venda no DB (a baixa de estoque acontece na mesma transação);
+    # com a fila ligada, só enfileira e a nota sai com o número provisório
+    na_fila = fila_ativa() is not None
+    if na_fila:
+        venda_registrada = registrar_venda_na_fila(cliente, carrinho.itens_para_registro(), carrinho.id, id_turno)
+    else:
+        venda_registrada = registrar_venda(cliente, carrinho.itens_para_registro(), carrinho.id, id_turno)
     
     if not venda_registrada:
         print("ERRO: Falha ao registrar a venda no banco de dados.")
         return None
+    numero = (f"Venda provisória: {venda_registrada.numero_provisorio}" if na_fila
+              else f"Venda ID: {venda_registrada.id}")
 
-    # Faz a Baixa de Estoque Otimizada
-    for _, row in df_agrupado.iterrows():
-        id_produto = int(row['id_produto'])
-        quantidade_vendida = int(row['quantidade'])
-        atualizar_estoque(id_produto, -quantidade_vendida) 
-
-    # Exibe a Nota Fiscal (usando o df_agrupado para display)
-    total_compra = float(df_agrupado['total_item'].sum())
-
-    tabela_nota = []
-    for i, row in df_agrupado.iterrows():
-        tabela_nota.append([
-            i + 1,
-            row['nome'],
-            int(row['quantidade']),
-            f"R$ {row['preco']:.2f}",
-            f"R$ {row['total_item']:.2f}"
-        ])
+    # Exibe a Nota Fiscal
+    tabela_nota = [
+        [i, item.nome, item.quantidade, f"R$ {item.preco:.2f}", f"R$ {item.total:.2f}"]
+        for i, item in enumerate(carrinho, start=1)
+    ]
 
     print("\n" + "="*60)
-    print(f"NOTA FISCAL — {cliente.nome} (Venda ID: {venda_registrada.id})")
+    print(f"NOTA FISCAL — {cliente.nome} ({numero})")
     print(f"Data: {obter_data()}\n")
     print(tabulate(tabela_nota, headers=["Item", "Produto", "Qtd", "Preço Unit.", "Total"], tablefmt="grid"))
-    print(f"\nTotal da compra: R$ {total_compra:.2f}")
+    print(f"\nTotal da compra: R$ {carrinho.total:.2f}")
     print("="*60)
 
     return venda_registrada
     
 
 
-def atender_cliente(cliente):
-    """
-    Inicia o atendimento de um cliente, registra os itens comprados e gera a nota fiscal.
-    Retorna (total, df_agrupado) onde df_agrupado será usado para baixar o estoque.
-    """
-    print(f"\n=== Iniciando atendimento do {cliente.nome} (ID: {cliente.id}) ===")
-
-    itens_comprados = []
-
-    while True:
-        print("\n--- Novo Item ---")
-        id_produto = entrar_inteiro("Digite o ID do produto (ou 0 para finalizar): ", min_val=0)
-
-        if id_produto == 0:
-            break
-
-        produto = pesquisar_produto(id_produto)
-        if not produto:
-            print("Produto não encontrado.")
-            continue
-
-        print(f"Produto: {produto.nome} — Estoque: {produto.quantidade} — Preço: R$ {produto.preco:.2f}")
-
-        if produto.quantidade == 0:
-            print("Erro: Produto sem estoque.")
-            continue
+def escolher_produto_pela_busca(texto: str):
+    """Busca pelo nome, mostra os resultados numerados e devolve o escolhido (None se nenhum)."""
+    resultados, muitos = buscar_produtos(texto)
+    if not resultados:
+        print(f"Nenhum produto encontrado para '{texto}'.")
+        return None
 
-        quantidade = entrar_inteiro("Quantidade: ", min_val=1)
+    tabela = [[i, p.id, p.nome, f"R$ {p.preco:.2f}", p.quantidade] for i, p in enumerate(resultados, start=1)]
+    print(tabulate(tabela, headers=["Nº", "ID", "Produto", "Preço", "Estoque"], tablefmt="github"))
+    if muitos:
+        print("Muitos produtos com essas palavras: digite mais palavras para refinar.")
 
-        if quantidade <= 0:
-            print("Quantidade inválida.")
-            continue
+    escolha = entrar_inteiro("Nº do produto (0 = nenhum): ", min_val=0)
+    if escolha == 0:
+        return None
+    if escolha > len(resultados):
+        print("Nº fora da lista.")
+        return None
+    return pesquisar_produto(resultados[escolha - 1].id)
 
-        if quantidade > produto.quantidade:
-            print(f"Erro: Estoque insuficiente. Máximo disponível: {produto.quantidade}")
-            continue
 
-        # registra a compra sem fazer baixa de estoque)
-        itens_comprados.append({
-            'id_produto': produto.id,
-            'nome': produto.nome,
-            'quantidade': quantidade,
-            'preco': produto.preco,
-            'total_item': produto.preco * quantidade
-        })
+def atender_cliente(cliente, id_turno=None):
+    """
+    Inicia o atendimento de um cliente, registra os itens comprados e gera a nota fiscal.
+    Cada item passado fica reservado para o carrinho (sem baixar o estoque);
+    a baixa só acontece no registro da venda. Se o atendimento não terminar
+    em venda, as reservas são liberadas (ou expiram, se o processo cair;
+    com o diário de vendas ligado, são liberadas no boot seguinte).
+    """
+    print(f"\n=== Iniciando atendimento do {cliente.nome} (ID: {cliente.id}) ===")
 
-        print(f"{quantidade}x {produto.nome} adicionado(s) ao carrinho.")
-        atualizar_estoque(produto.id,-quantidade) #atualizei aqui
+    carrinho = Carrinho()
+    venda_registrada = None
+
+    try:
+        while True:
+            print("\n--- Novo Item ---")
+            entrada = input("Código de barras, ID ou nome do produto (ou 0 para finalizar): ").strip()
+            digitos = "".join(entrada.split())
+
+            if digitos == "0":
+                break
+
+            # 13 dígitos: leitura do scanner (EAN-13); menos que isso: ID do produto; texto: busca pelo nome
+            if len(digitos) == 13 and digitos.isdigit():
+                if not ean13_valido(digitos):
+                    print("Código de barras inválido (dígito verificador não confere). Passe de novo.")
+                    continue
+                produto = pesquisar_por_codigo(digitos)
+            elif digitos.isdigit():
+                produto = pesquisar_produto(int(digitos))
+            elif entrada:
+                produto = escolher_produto_pela_busca(entrada)
+                if produto is None:
+                    continue
+            else:
+                print("Erro: Digite um código de barras, um ID ou parte do nome do produto.")
+                continue
+
+            if not produto:
+                print("Produto não encontrado.")
+                continue
+
+            disponivel = produto.quantidade - carrinho.quantidade_de(produto.id)
+            print(f"Produto: {produto.nome} — Estoque: {disponivel} — Preço: R$ {produto.preco:.2f}")
+
+            if disponivel <= 0:
+                print("Erro: Produto sem estoque.")
+                continue
+
+            quantidade = entrar_inteiro("Quantidade: ", min_val=1)
+
+            if quantidade <= 0:
+                print("Quantidade inválida.")
+                continue
+
+            if quantidade > disponivel:
+                print(f"Erro: Estoque insuficiente. Máximo disponível: {disponivel}")
+                continue
+
+            # segura o estoque para este carrinho (a baixa é feita no registrar_venda)
+            if not reservar_item(carrinho.id, produto.id, quantidade):
+                print("Erro: Estoque insuficiente (itens reservados em outro caixa).")
+                continue
+
+            anotar_reserva(carrinho.id, produto.id, quantidade)
+            carrinho.adicionar(produto.id, produto.nome, produto.preco, quantidade)
+            print(f"{quantidade}x {produto.nome} adicionado(s) ao carrinho. Subtotal: R$ {carrinho.total:.2f}")
+
+        if carrinho:
+            venda_registrada = gerar_nota_fiscal(cliente, carrinho, id_turno)
+            return venda_registrada
+        else:
+            print("\nNenhum produto comprado.")
+            
+            return None
+
+    finally:
+        # carrinho abandonado ou venda recusada: devolve o estoque segurado
+        if venda_registrada is None and carrinho:
+            liberar_carrinho(carrinho.id)
+            anotar_liberacao(carrinho.id)
+
+TAMANHO_PAGINA = 20
 
-    if itens_comprados:
-        return gerar_nota_fiscal(cliente, itens_comprados)
-    else:
-        print("\nNenhum produto comprado.")
-        
-        return None
 
 def listar_as_vendas():
-    print("\n--- VENDAS REGISTRADAS ---")
-    vendas = consultar_vendas()
+    """
+    Navegador de vendas paginado (mais recentes primeiro).
+    Comandos: N próxima página, P anterior, F filtros, L limpa filtros,
+    um ID de venda mostra os detalhes, 0 volta.
+    """
+    filtros = {}
+    descricao_filtros = ""
+    pagina_atual = consultar_pagina_vendas(TAMANHO_PAGINA)
+    num_pagina = 1
 
-    if not vendas:
+    if not pagina_atual:
+        print("\n--- VENDAS REGISTRADAS ---")
         print("Nenhuma venda registrada.")
         return
 
-    # TABELA PRINCIPAL
-    tabela = []
-    for v in vendas:
-        total = sum(float(it.quantidade) * float(it.preco_unitario) for it in (v.itens or []))
-        cliente_nome = v.cliente.nome if getattr(v, "cliente", None) else f"ID {v.id_cliente}"
-
-        tabela.append([
-            v.id,
-            v.data_hora.strftime('%d/%m/%Y %H:%M'),
-            cliente_nome,
-            f"R$ {total:.2f}"
-        ])
-
-    print()
-    print(tabulate(
-        tabela,
-        headers=["ID", "Data/Hora", "Cliente", "Total"],
-        tablefmt="github"
-    ))
-
-    # ESCOLHA DA VENDA
-    id_venda = entrar_inteiro("\nDigite o ID da venda para ver detalhes (0 para voltar): ", min_val=0)
-    if id_venda == 0:
-        return
-
-    venda = next((x for x in vendas if x.id == id_venda), None)
-    if not venda:
-        print("Venda não encontrada.")
-        return
-    mostrar_detalhes_venda(venda)
+    while True:
+        print(f"\n--- VENDAS REGISTRADAS (página {num_pagina}) ---")
+        if descricao_filtros:
+            print(f"Filtros: {descricao_filtros}")
+
+        if not pagina_atual:
+            print("Nenhuma venda encontrada.")
+        else:
+            # TABELA PRINCIPAL (total já vem somado do banco)
+            tabela = []
+            for v in pagina_atual:
+                cliente_nome = v.cliente_nome or f"ID {v.id_cliente}"
+
+                tabela.append([
+                    v.id,
+                    v.data_hora.strftime('%d/%m/%Y %H:%M'),
+                    cliente_nome,
+                    f"R$ {v.total:.2f}"
+                ])
+
+            print()
+            print(tabulate(
+                tabela,
+                headers=["ID", "Data/Hora", "Cliente", "Total"],
+                tablefmt="github"
+            ))
+
+        comando = input("\n[N] próxima  [P] anterior  [F] filtrar  [L] limpar filtros  [ID] detalhes  [0] voltar: ").strip().upper()
+
+        if comando == "0":
+            return
+
+        elif comando == "N":
+            if not pagina_atual:
+                continue
+            ultima = pagina_atual[-1]
+            proxima = consultar_pagina_vendas(TAMANHO_PAGINA, apos=(ultima.data_hora, ultima.id), **filtros)
+            if proxima:
+                pagina_atual = proxima
+                num_pagina += 1
+            else:
+                print("Você já está na última página.")
+
+        elif comando == "P":
+            if not pagina_atual or num_pagina == 1:
+                print("Você já está na primeira página.")
+                continue
+            primeira = pagina_atual[0]
+            anterior = consultar_pagina_vendas(TAMANHO_PAGINA, antes=(primeira.data_hora, primeira.id), **filtros)
+            if anterior:
+                pagina_atual = anterior
+                num_pagina -= 1
+
+        elif comando == "F":
+            id_cliente = entrar_inteiro("ID do cliente (0 = todos): ", min_val=0)
+            data_inicio = entrar_data("Data inicial dd/mm/aaaa (ENTER = sem limite): ")
+            data_fim = entrar_data("Data final dd/mm/aaaa (ENTER = sem limite): ")
+            filtros = {
+                "id_cliente": id_cliente or None,
+                "data_inicio": data_inicio,
+                # data final inclusiva: vai até o fim do dia
+                "data_fim": data_fim + timedelta(days=1) if data_fim else None,
+            }
+            descricao_filtros = ", ".join(filter(None, [
+                f"cliente {id_cliente}" if id_cliente else "",
+                f"de {data_inicio:%d/%m/%Y}" if data_inicio else "",
+                f"até {data_fim:%d/%m/%Y}" if data_fim else "",
+            ]))
+            pagina_atual = consultar_pagina_vendas(TAMANHO_PAGINA, **filtros)
+            num_pagina = 1
+
+        elif comando == "L":
+            filtros = {}
+            descricao_filtros = ""
+            pagina_atual = consultar_pagina_vendas(TAMANHO_PAGINA)
+            num_pagina = 1
+
+        elif comando.isdigit():
+            venda = buscar_venda(int(comando))
+            if not venda:
+                print("Venda não encontrada.")
+                continue
+            mostrar_detalhes_venda(venda)
+
+        else:
+            print("Opção inválida.")
 
 
     
@@ -0,0 +1,90 @@
+# verificar_diario.py
+"""
+Confere que uma venda do diário (diario_vendas) que não pôde ser gravada no
+boot continua no diário até um boot conseguir gravá-la.
+
+Num banco temporário: uma venda vai para o diário, a releitura do boot
+falha (banco ocupado), o caixa abre um diário novo e fecha (limpo, e
+também trocando de segmento), e o boot seguinte tem que gravar a venda.
+
+    python verificar_diario.py      # sai com código 1 se a venda se perder
+"""
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from commons.medicao import banco_temporario
+
+
+def verificar(pasta_diario: str, tamanho_segmento: int) -> list[str]:
+    """Um ciclo venda → boot com erro → diário novo fechado → boot. Retorna os problemas."""
+    from sqlalchemy import func, select
+    from sqlalchemy.exc import OperationalError
+    import crud_vendas
+    from commons.db import get_session
+    from commons.models import Venda
+    from diario_vendas import Diario, _segmentos, reaplicar_diario
+
+    chave = f"verificacao-{tamanho_segmento}"
+    diario = Diario(pasta_diario)
+    diario.anotar_venda(chave, 1, [{"id_produto": 1, "quantidade": 1, "preco": 2.0}], None, None, datetime.now())
+    diario.fechar()
+
+    def banco_ocupado(*args, **kwargs):
+        raise OperationalError("INSERT INTO vendas ...", {}, sqlite3.OperationalError("database is locked"))
+
+    efetivar_venda = crud_vendas.efetivar_venda
+    crud_vendas.efetivar_venda = banco_ocupado
+    try:
+        reaplicar_diario(pasta_diario)
+    finally:
+        crud_vendas.efetivar_venda = efetivar_venda
+
+    # o caixa sobe mesmo assim, passa carrinhos (sem venda) e fecha
+    diario = Diario(pasta_diario, tamanho_segmento)
+    for n in range(20):
+        diario.anotar_reserva(f"carrinho-{n}", 1, 1)
+        diario.anotar_liberacao(f"carrinho-{n}")
+    diario.fechar()
+
+    problemas = []
+    contagem = reaplicar_diario(pasta_diario)
+    if not contagem or contagem["reaplicadas"] != 1:
+        problemas.append(f"segmento de {tamanho_segmento} bytes: a venda sumiu do diário ({contagem})")
+    with get_session() as session:
+        if not session.execute(select(func.count(Venda.id)).where(Venda.chave == chave)).scalar():
+            problemas.append(f"segmento de {tamanho_segmento} bytes: a venda não chegou ao banco")
+    if _segmentos(Path(pasta_diario)):
+        problemas.append(f"segmento de {tamanho_segmento} bytes: o diário não foi apagado depois de gravado")
+    return problemas
+
+
+def main():
+    problemas = []
+    with banco_temporario("diario_") as pasta:
+        from commons.db import get_session, init_db
+        from commons.models import Cliente, Produto
+
+        init_db()
+        with get_session() as session:
+            session.add(Cliente(nome="Cliente teste"))
+            session.add(Produto(nome="Produto teste", quantidade=100, preco=2.0))
+            session.commit()
+        # fechar() limpo e fechar() depois de trocar de segmento
+        for tamanho_segmento in (4 << 20, 256):
+            problemas += verificar(f"{pasta}/{tamanho_segmento}", tamanho_segmento)
+
+    if not problemas:
+        print("OK: venda que falhou no boot continuou no diário e foi gravada no boot seguinte.")
+        raise SystemExit(0)
+
+    print(f"{len(problemas)} problema(s) no diário:\n")
+    for problema in problemas:
+        print(f"- {problema}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
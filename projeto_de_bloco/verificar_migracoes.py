@@ -0,0 +1,163 @@
+# verificar_migracoes.py
+"""
+Confere as migrações (commons/migracoes.py) num banco com o schema original
+do projeto, antes de qualquer passo de MIGRACOES.
+
+Cria um banco temporário com as tabelas da primeira versão e produtos de
+nome repetido, roda o init_db() do boot e confere que:
+  - o banco termina na versão SCHEMA_VERSAO, com os nomes repetidos
+    desempatados pelo id (o índice único do nome é criado depois disso);
+  - colunas e índices ficam iguais aos de um banco criado do zero;
+  - os dados antigos continuam lá e entram na busca por nome.
+
+    python verificar_migracoes.py      # sai com código 1 se algo não bater
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+
+# Schema da primeira versão do projeto (antes de PRAGMA user_version)
+_SCHEMA_ORIGINAL = """
+CREATE TABLE fornecedores (
+    id_fornecedor INTEGER NOT NULL, nome VARCHAR NOT NULL,
+    PRIMARY KEY (id_fornecedor), UNIQUE (nome)
+);
+CREATE TABLE produtos (
+    id INTEGER NOT NULL, nome VARCHAR NOT NULL, quantidade INTEGER NOT NULL, preco FLOAT NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE clientes (
+    id INTEGER NOT NULL, nome VARCHAR NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE produto_fornecedor (
+    id_produto INTEGER NOT NULL, id_fornecedor INTEGER NOT NULL,
+    PRIMARY KEY (id_produto, id_fornecedor),
+    FOREIGN KEY(id_produto) REFERENCES produtos (id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY(id_fornecedor) REFERENCES fornecedores (id_fornecedor) ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE TABLE vendas (
+    id INTEGER NOT NULL, data_hora DATETIME, id_cliente INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(id_cliente) REFERENCES clientes (id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE TABLE itens_venda (
+    id INTEGER NOT NULL, quantidade INTEGER NOT NULL, preco_unitario FLOAT NOT NULL,
+    id_venda INTEGER, id_produto INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(id_venda) REFERENCES vendas (id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY(id_produto) REFERENCES produtos (id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+INSERT INTO clientes (id, nome) VALUES (1, 'Cliente 1');
+INSERT INTO produtos (id, nome, quantidade, preco) VALUES
+    (1, 'Leite Em Pó Ninho', 5, 17.7),
+    (2, 'Café Pilão 500g', 8, 19.9),
+    (3, 'Leite Em Pó Ninho', 2, 18.5),
+    (4, 'Leite Em Pó Ninho', 1, 16.0);
+INSERT INTO vendas (id, data_hora, id_cliente) VALUES (1, '2024-05-02 10:00:00.000000', 1);
+INSERT INTO itens_venda (id, quantidade, preco_unitario, id_venda, id_produto) VALUES (1, 1, 17.7, 1, 3);
+"""
+
+
+def _estrutura(caminho: str) -> dict:
+    """{tabela: (colunas, {índice: (único, colunas)})} das tabelas comuns (sem as internas do SQLite/FTS5)."""
+    conn = sqlite3.connect(caminho)
+    try:
+        estrutura = {}
+        tabelas = [linha[0] for linha in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%' "
+            "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'produtos_busca_%'")]
+        for tabela in tabelas:
+            colunas = frozenset(linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})"))
+            indices = {}
+            for _, nome, unico, origem, _ in conn.execute(f"PRAGMA index_list({tabela})"):
+                if origem != "c":   # os das constraints (PK/UNIQUE) vêm no CREATE TABLE
+                    continue
+                indices[nome] = (bool(unico), tuple(linha[2] for linha in conn.execute(f"PRAGMA index_info({nome})")))
+            estrutura[tabela] = (colunas, indices)
+        return estrutura
+    finally:
+        conn.close()
+
+
+def verificar(pasta: str) -> list[str]:
+    antigo = os.path.join(pasta, "antigo.db")
+    novo = os.path.join(pasta, "novo.db")
+    conn = sqlite3.connect(antigo)
+    conn.executescript(_SCHEMA_ORIGINAL)
+    conn.close()
+
+    # o mesmo caminho do boot: o engine de commons.db aponta para o banco antigo
+    os.environ["MERCADO_DB_URL"] = f"sqlite:///{antigo}"
+    from sqlalchemy import create_engine
+    from commons.db import Base, engine, init_db
+    from commons.migracoes import SCHEMA_VERSAO, migrar
+
+    problemas = []
+    try:
+        init_db()
+    except Exception as erro:
+        engine.dispose()
+        return [f"init_db falhou no banco antigo: {erro}"]
+    engine.dispose()
+
+    # banco criado do zero, para comparar
+    engine_novo = create_engine(f"sqlite:///{novo}")
+    Base.metadata.create_all(bind=engine_novo)
+    migrar(engine_novo)
+    engine_novo.dispose()
+
+    conn = sqlite3.connect(antigo)
+    try:
+        versao = conn.execute("PRAGMA user_version").fetchone()[0]
+        if versao != SCHEMA_VERSAO:
+            problemas.append(f"versão {versao}, esperada {SCHEMA_VERSAO}")
+        nomes = dict(conn.execute("SELECT id, nome FROM produtos"))
+        esperados = {1: "Leite Em Pó Ninho", 2: "Café Pilão 500g",
+                     3: "Leite Em Pó Ninho (3)", 4: "Leite Em Pó Ninho (4)"}
+        if nomes != esperados:
+            problemas.append(f"nomes dos produtos: {nomes}")
+        itens = conn.execute("SELECT id_produto FROM itens_venda WHERE id_venda = 1").fetchall()
+        if itens != [(3,)]:
+            problemas.append(f"itens da venda antiga: {itens}")
+        achados = {linha[0] for linha in conn.execute(
+            "SELECT rowid FROM produtos_busca WHERE produtos_busca MATCH '\"leite\"* \"po\"*'")}
+        if achados != {1, 3, 4}:
+            problemas.append(f"busca por nome depois da migração achou {sorted(achados)}")
+    finally:
+        conn.close()
+
+    migrado, do_zero = _estrutura(antigo), _estrutura(novo)
+    for tabela in sorted(set(migrado) | set(do_zero)):
+        if tabela not in migrado or tabela not in do_zero:
+            problemas.append(f"tabela {tabela} só existe no banco {'migrado' if tabela in migrado else 'novo'}")
+            continue
+        colunas_m, indices_m = migrado[tabela]
+        colunas_n, indices_n = do_zero[tabela]
+        for coluna in sorted(colunas_n ^ colunas_m):
+            problemas.append(f"coluna {tabela}.{coluna} só existe no banco {'migrado' if coluna in colunas_m else 'novo'}")
+        for nome in sorted(set(indices_m) | set(indices_n)):
+            if indices_m.get(nome) != indices_n.get(nome):
+                problemas.append(f"índice {nome}: migrado {indices_m.get(nome)} x novo {indices_n.get(nome)}")
+    return problemas
+
+
+def main():
+    # Nunca roda contra o banco de verdade
+    with tempfile.TemporaryDirectory(prefix="migracoes_") as pasta:
+        problemas = verificar(pasta)
+
+    if not problemas:
+        print("OK: banco antigo migrado, igual a um banco novo.")
+        raise SystemExit(0)
+
+    print(f"{len(problemas)} problema(s) na migração:\n")
+    for problema in problemas:
+        print(f"- {problema}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# verificar_planos.py
+"""
+Confere o plano (EXPLAIN QUERY PLAN) de todas as consultas do caixa, do SIG,
+dos crud_* e dos relatórios.
+
+Cria um banco temporário, roda cada cenário (respondendo os input() com
+respostas prontas), captura todo SQL emitido e falha se aparecer um SCAN
+de tabela que não esteja na lista de varreduras esperadas do cenário
+(ex.: "listar produtos" lê a tabela inteira de propósito). Percorrer um
+índice em ordem numa consulta com LIMIT (paginação) não conta como varredura.
+
+    python verificar_planos.py          # sai com código 1 se houver varredura inesperada
+    python verificar_planos.py -v       # mostra o plano de cada consulta
+    python verificar_planos.py --consultas  # comandos SQL e conexões de cada cenário,
+                                            # com e sem unidade de trabalho
+"""
+from __future__ import annotations
+
+import builtins
+import contextlib
+import io
+import re
+import sys
+
+from commons.medicao import banco_temporario
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def _cenarios():
+    import crud_clientes
+    import crud_fornecedores
+    import crud_produtos
+    import crud_reservas
+    import crud_turnos
+    import crud_vendas
+    import relatorios
+    import vendas
+    from datetime import datetime, timedelta
+    from sig import clientes_menu, produtos_menu
+
+    turno = crud_turnos.abrir_turno(9, "Verificação")
+    agora = datetime.now()
+
+    # (nome, função, respostas para input(), tabelas que podem ser varridas)
+    return [
+        # ---- caixa ----
+        ("caixa: buscar cliente", lambda: crud_clientes.buscar_cliente(1), [], set()),
+        ("caixa: cadastrar cliente", lambda: crud_clientes.cadastrar_cliente(""), [], set()),
+        ("caixa: pesquisar produto", lambda: crud_produtos._carregar_produto(1), [], set()),
+        ("caixa: código de barras", lambda: crud_produtos._id_pelo_codigo("7891000100103"), [], set()),
+        ("caixa: índice de códigos", crud_produtos.carregar_indice_codigos, [], set()),
+        ("caixa: buscar pelo nome", lambda: crud_produtos.buscar_produtos("prod"), [], set()),
+        ("caixa: reservar item", lambda: crud_reservas.reservar_item("verif", 2, 1), [], set()),
+        ("caixa: disponível p/ venda", lambda: crud_reservas.disponivel_para_venda(2), [], set()),
+        ("caixa: registrar venda", lambda: crud_vendas.efetivar_venda(
+            1, [{'id_produto': 2, 'quantidade': 1, 'preco': 1.0}], "verif", turno.id), [], set()),
+        ("caixa: venda pela fila", lambda: _venda_pela_fila(9, turno.id), [], set()),
+        ("caixa: liberar carrinho", lambda: crud_reservas.liberar_carrinho("outro"), [], set()),
+        ("caixa: varrer reservas", crud_reservas.varrer_reservas_expiradas, [], set()),
+        ("caixa: atualizar estoque", lambda: crud_produtos.atualizar_estoque(3, 1), [], set()),
+        ("caixa: abrir turno", lambda: crud_turnos.abrir_turno(9, "x"), [], set()),
+        ("caixa: fechar caixa", lambda: relatorios.fechar_caixa(turno.id), [], set()),
+        ("caixa: produtos sem estoque", crud_produtos.consultar_produtos_sem_estoque, [], set()),
+        # o que o main.py faz na opção 1: cliente, dois produtos, reservas e a venda
+        ("caixa: atendimento completo", lambda: vendas.atender_cliente(crud_clientes.buscar_cliente(1), turno.id),
+         ["3", "1", "4", "1", "0"], set()),
+
+        # ---- carga inicial ----
+        # as contagens do fim e a troca das associações leem as tabelas inteiras
+        ("boot: carregar fornecedores", lambda: crud_fornecedores.carregar_fornecedores_iniciais(forcar=True), [],
+         {"fornecedores", "produto_fornecedor"}),
+
+        # ---- atualização do catálogo com os caixas abertos ----
+        ("atualizador: aplicar mudanças", lambda: crud_produtos.aplicar_mudancas_catalogo([
+            {"nome": "Produto 5", "preco": 9.0, "diferenca_qtd": 2},
+            {"nome": "Produto raspado novo", "preco": 1.0, "quantidade": 3}], pausa=0), [], set()),
+
+        # ---- listagem de vendas ----
+        ("vendas: primeira página", lambda: crud_vendas.consultar_pagina_vendas(20), [], set()),
+        ("vendas: próxima página", lambda: crud_vendas.consultar_pagina_vendas(20, apos=(agora, 10)), [], set()),
+        ("vendas: página anterior", lambda: crud_vendas.consultar_pagina_vendas(20, antes=(agora, 10)), [], set()),
+        ("vendas: filtro cliente", lambda: crud_vendas.consultar_pagina_vendas(20, id_cliente=1), [], set()),
+        ("vendas: filtro datas", lambda: crud_vendas.consultar_pagina_vendas(
+            20, data_inicio=agora - timedelta(days=7), data_fim=agora), [], set()),
+        ("vendas: detalhe", lambda: crud_vendas.buscar_venda(1), [], set()),
+        ("vendas: navegador", vendas.listar_as_vendas, ["N", "P", "1", "0"], set()),
+
+        # ---- SIG clientes ----
+        # rankings agregam todos os clientes, mas sobre o resumo diário (não sobre itens_venda)
+        ("sig: clientes com compras", clientes_menu.listar_clientes_com_compras, [],
+         {"clientes", "resumo_vendas_cliente_dia"}),
+        ("sig: compras de um cliente", clientes_menu.clientes_com_compras_consultar_cliente, ["1", "1"],
+         {"clientes", "resumo_vendas_cliente_dia"}),
+        ("sig: clientes sem compras", clientes_menu.clientes_sem_compras, [], {"clientes"}),
+        ("sig: top clientes (compras)", lambda: clientes_menu.top_clientes_por_numero_compras(5), [],
+         {"clientes", "resumo_vendas_cliente_dia"}),
+        ("sig: top clientes (gasto)", lambda: clientes_menu.top_clientes_por_total_gasto(5), [],
+         {"clientes", "resumo_vendas_cliente_dia"}),
+        ("sig: listar clientes", clientes_menu.crud_listar_clientes, [], {"clientes"}),
+        ("sig: excluir cliente", clientes_menu.crud_excluir_cliente, ["999"], set()),
+
+        # ---- SIG produtos ----
+        ("sig: listar produtos", produtos_menu.listar_produtos, [],
+         {"produtos", "fornecedores", "produto_fornecedor"}),
+        ("sig: cadastrar produto", produtos_menu.cadastrar_produto,
+         ["Produto novo", "1", "1.0", "7891000100103", "1"], {"fornecedores"}),
+        ("sig: atualizar produto", produtos_menu.atualizar_produto, ["1", "", "", "", "", "2", "1"],
+         {"fornecedores"}),
+        ("sig: atribuir códigos", crud_produtos.atribuir_codigos_internos, [], set()),
+        ("sig: excluir produto", produtos_menu.excluir_produto, ["999"], set()),
+        ("sig: buscar produto", produtos_menu.buscar_produto_por_nome, ["produto 1"], set()),
+        ("sig: mais/menos vendidos", produtos_menu.consultar_mais_menos_vendidos, ["5"], {"produtos"}),
+        ("sig: pouco estoque", produtos_menu.consultar_pouco_estoque, ["2"], set()),
+        ("sig: fornecedores do produto", produtos_menu.fornecedores_de_um_produto, ["1"], set()),
+    ]
+
+
+def _venda_pela_fila(id_produto: int, id_turno: int) -> None:
+    from fila_vendas import FilaVendas
+
+    fila = FilaVendas()
+    fila.enviar(1, [{'id_produto': id_produto, 'quantidade': 1, 'preco': 1.0}], id_turno=id_turno)
+    fila.parar()
+
+
+def _preparar_banco():
+    from commons.db import engine, engine_leitura, get_session, init_db
+    from commons.models import Cliente, Fornecedor, Produto, ProdutoFornecedor
+    from crud_vendas import efetivar_venda
+
+    init_db()
+    with get_session() as session:
+        session.add_all([Cliente(nome=f"Cliente {i}") for i in range(1, 4)])
+        session.add_all([Produto(nome=f"Produto {i}", quantidade=i % 5, preco=float(i)) for i in range(1, 21)])
+        session.add_all([Fornecedor(nome=f"fornecedor {i}") for i in range(1, 3)])
+        session.flush()
+        session.add_all([ProdutoFornecedor(id_produto=i, id_fornecedor=1 + i % 2) for i in range(1, 21)])
+        session.commit()
+    efetivar_venda(1, [{'id_produto': 4, 'quantidade': 1, 'preco': 4.0}])
+
+    # Sem estatísticas o SQLite planeja como se as tabelas fossem grandes,
+    # que é o caso que interessa (com 20 linhas ele prefere varrer mesmo).
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS sqlite_stat1")
+    engine.dispose()
+    engine_leitura.dispose()
+
+
+@contextlib.contextmanager
+def _respostas(respostas: list[str]):
+    fila = iter(respostas)
+    original = builtins.input
+
+    def _input(_mensagem=""):
+        try:
+            return next(fila)
+        except StopIteration:
+            raise EOFError("cenário pediu mais respostas do que as previstas")
+
+    builtins.input = _input
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def verificar(verboso: bool = False) -> list[tuple[str, str, str]]:
+    """Roda todos os cenários. Retorna (cenário, sql, linha do plano) de cada varredura inesperada."""
+    from sqlalchemy import event, inspect
+    from commons.db import engine, engine_leitura
+
+    _preparar_banco()
+    tabelas = set(inspect(engine).get_table_names())
+
+    capturadas: list[tuple[str, object]] = []
+
+    def _capturar(_conn, _cursor, statement, parameters, _context, executemany):
+        comando = statement.lstrip().split(None, 1)[0].upper()
+        if comando in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"):
+            capturadas.append((statement, parameters[0] if executemany and parameters else parameters))
+
+    # relatórios vão pelo engine de leitura (get_read_session): escuta os dois
+    engines = {engine, engine_leitura}
+    for e in engines:
+        event.listen(e, "before_cursor_execute", _capturar)
+    problemas = []
+    try:
+        for nome, funcao, respostas, permitidas in _cenarios():
+            capturadas.clear()
+            with _respostas(respostas), contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    funcao()
+                except EOFError as e:
+                    problemas.append((nome, "", str(e)))
+
+            with engine.connect() as conn:
+                for sql, params in list(capturadas):
+                    plano = [linha[-1] for linha in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+                    if verboso:
+                        print(f"[{nome}] {' '.join(sql.split())[:110]}")
+                        for linha in plano:
+                            print(f"      {linha}")
+                    for linha in plano:
+                        m = _SCAN.match(linha)
+                        if not m or m.group(1) not in tabelas or m.group(1) in permitidas:
+                            continue
+                        # percorrer um índice em ordem com LIMIT (paginação) lê só a página
+                        if "INDEX" in linha and " LIMIT " in sql.upper():
+                            continue
+                        problemas.append((nome, " ".join(sql.split()), linha))
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", _capturar)
+    return problemas
+
+
+def medir_consultas(com_unidade: bool) -> list[tuple[str, int, int]]:
+    """(cenário, comandos SQL, conexões tiradas do pool) de cada cenário."""
+    from commons.db import contar_consultas, unidade_de_trabalho
+
+    _preparar_banco()
+    medidas = []
+    for nome, funcao, respostas, _permitidas in _cenarios():
+        if not com_unidade:
+            # as ações do SIG já vêm com @unidade_de_trabalho(): mede a função sem ela
+            funcao = getattr(funcao, "__wrapped__", funcao)
+        with _respostas(respostas), contextlib.redirect_stdout(io.StringIO()), contar_consultas() as contador:
+            with unidade_de_trabalho() if com_unidade else contextlib.nullcontext():
+                funcao()
+        medidas.append((nome, contador.consultas, contador.conexoes))
+    return medidas
+
+
+def comparar_consultas() -> None:
+    """Roda os cenários sem e com unidade de trabalho, cada vez num banco novo (outro processo)."""
+    import json
+    import subprocess
+    from tabulate import tabulate
+
+    medidas = {}
+    for modo in ("sem", "com"):
+        saida = subprocess.run([sys.executable, __file__, "--medir-consultas", modo],
+                               capture_output=True, text=True, check=True).stdout
+        medidas[modo] = json.loads(saida.splitlines()[-1])
+
+    tabela = [
+        [nome, consultas, com[1], conexoes, com[2]]
+        for (nome, consultas, conexoes), com in zip(medidas["sem"], medidas["com"])
+    ]
+    tabela.append(["TOTAL"] + [sum(linha[i] for linha in tabela) for i in range(1, 5)])
+    print(tabulate(tabela, headers=["Cenário", "SQL sem", "SQL com", "Conexões sem", "Conexões com"],
+                   tablefmt="fancy_grid"))
+
+
+def main():
+    verboso = "-v" in sys.argv[1:]
+
+    if "--consultas" in sys.argv[1:]:
+        comparar_consultas()
+        return
+
+    with banco_temporario("planos_", arquivo="planos.db"):
+        if "--medir-consultas" in sys.argv[1:]:
+            import json
+            modo = sys.argv[sys.argv.index("--medir-consultas") + 1]
+            print(json.dumps(medir_consultas(modo == "com")))
+            return
+
+        problemas = verificar(verboso)
+    if not problemas:
+        print("OK: nenhuma varredura de tabela inesperada.")
+        raise SystemExit(0)
+
+    print(f"{len(problemas)} consulta(s) com varredura inesperada:\n")
+    for nome, sql, linha in problemas:
+        print(f"- [{nome}] {linha}\n    {sql[:200]}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,105 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import re
+from __future__ import annotations
 
-URL = "https://pedrovncs.github.io/lindosprecos/produtos.html"
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
 
-def realizar_web_scraping() -> pd.DataFrame | None:
-    print(f"Iniciando web scraping da URL: {URL}")
-    try:
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao acessar a URL: {e}")
-        return None
-
-    soup = BeautifulSoup(response.content, 'html.parser')
-
-    
-    produtos_html = soup.select("#produtos-lista .product-card")
-
-    dados_produtos = []
-
-    for produto_html in produtos_html:
-        try:
-            nome_tag = produto_html.find('h5', class_='card-title')
-            preco_tag = produto_html.find('p', class_='card-price')
-            qtd_tag   = produto_html.find('p', attrs={'data-qtd': True})
-
-            if not (nome_tag and preco_tag and qtd_tag):
-                continue
-
-            nome = nome_tag.get_text(strip=True)
-            preco_text = preco_tag.get('data-preco') or preco_tag.get_text(strip=True)
-            preco_limpo = (
-                preco_text
-                .replace('R$', '')
-                .replace('\xa0', '')
-                .replace(',', '.')
-                .strip()
-            )
-            preco = float(re.search(r'[\d\.]+', preco_limpo).group())
-
-            
-            qtd = int(qtd_tag['data-qtd'])
-
-            dados_produtos.append({
-                'nome': nome,
-                'quantidade': qtd,
-                'preco': preco,
-            })
+from commons.db import get_session, init_db, trava_carga
+from commons.fontes import hash_arquivo, registrar_carga, ultima_carga
+from crud_produtos import CSV_PRODUTOS, _ler_csv_em_lotes
+from motor_scraping import FonteProdutos, MotorScraping
 
-        except Exception as e:
-            # print(f"Erro ao processar um produto: {e}")
-            continue
+URL = os.environ.get("MERCADO_URL_PRODUTOS", "https://pedrovncs.github.io/lindosprecos/produtos.html")
+FONTE_SCRAPING = "web_scraping"
 
-    if not dados_produtos:
-        print("Nenhum produto encontrado na página.")
-        return None
+# Outros sites/fornecedores: lista JSON com os campos de FonteProdutos
+# (nome, url com {pagina}, seletores, max_paginas...). Sem o arquivo, só a URL acima.
+ARQUIVO_FONTES = Path(__file__).parent / "dados" / "fontes_produtos.json"
 
-    print(f"{len(dados_produtos)} produtos extraídos com sucesso.")
-    return pd.DataFrame(dados_produtos)
+# Mesmo com requisição condicional (304) cada boot faria uma ida à rede:
+# consulta os sites de novo só quando a última raspagem tem mais que isso.
+INTERVALO_SCRAPING = timedelta(hours=6)
 
 
-def salvar_produtos_csv(df: pd.DataFrame, caminho: str = 'dados/produtos.csv'):
+def carregar_fontes() -> list[FonteProdutos]:
     try:
-        df.to_csv(caminho, index=False)
-        print(f"Produtos salvos em {caminho} com sucesso.")
-    except Exception as e:
-        print(f"Erro ao salvar CSV: {e}")
+        definicoes = json.loads(ARQUIVO_FONTES.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return [FonteProdutos("lindosprecos", URL)]
+    return [FonteProdutos(**definicao) for definicao in definicoes]
+
+
+def _codigos_do_csv(caminho: str | Path) -> dict[str, str]:
+    """nome → codigo_barras das linhas do produtos.csv atual que têm código (o site não traz)."""
+    if not os.path.exists(caminho):
+        return {}
+    codigos = {}
+    for lote in _ler_csv_em_lotes(caminho, 5000):
+        for nome, _, _, codigo in lote:
+            if codigo.strip():
+                codigos[nome.strip()] = codigo.strip()
+    return codigos
+
+
+def atualizar_catalogo_web(caminho: str | Path = CSV_PRODUTOS, forcar: bool = False,
+                           intervalo: timedelta = INTERVALO_SCRAPING,
+                           avisar: Callable[[str], object] = print) -> bool:
+    """
+    Raspa as fontes e regrava o produtos.csv, a não ser que a última raspagem
+    seja mais nova que `intervalo` (e o CSV ainda exista) ou que todas
+    as páginas respondam 304 (iguais às do cache).
+    Os produtos vão para o CSV à medida que as páginas chegam; o codigo_barras
+    que a loja pôs no CSV atual segue com o produto de mesmo nome.
+    As mensagens vão para `avisar` (a tela, ou o log do atualizador).
+    Retorna False se o produtos.csv não mudou.
+    """
+    with get_session() as session:
+        carga = ultima_carga(session, FONTE_SCRAPING)
+
+    if not forcar and carga and os.path.exists(caminho):
+        idade = datetime.now() - carga.carregado_em
+        if idade < intervalo:
+            avisar(f"Web scraping pulado: catálogo raspado há {int(idade.total_seconds() // 60)} min.")
+            return False
+
+    motor = MotorScraping(carregar_fontes(), forcar=forcar, avisar=avisar)
+    avisar(f"Iniciando web scraping de: {', '.join(f.nome for f in motor.fontes)}")
+
+    codigos = _codigos_do_csv(caminho)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(["nome", "quantidade", "preco", "codigo_barras"])
+        for produto in motor.produtos():
+            escritor.writerow([produto['nome'], produto['quantidade'], produto['preco'],
+                               codigos.get(produto['nome'].strip(), "")])
+    avisar(motor.resumo())
+
+    if not motor.produtos_unicos:
+        os.remove(temporario)
+        avisar("\nAviso: Não foi possível realizar o web scraping.")
+        return False
+
+    mudou = not (motor.todas_inalteradas and os.path.exists(caminho))
+    if not mudou:
+        # 304 em tudo: o produtos.csv atual já veio destas páginas; só renova a hora da raspagem
+        os.remove(temporario)
+        avisar("Páginas de produtos sem mudança (304): CSV e importação mantidos.")
+    else:
+        os.replace(temporario, caminho)
+        avisar(f"{motor.produtos_unicos} produtos salvos em {caminho}.")
+
+    # Com página falhando, não marca a raspagem: o próximo boot tenta de novo
+    if not motor.falhas:
+        with trava_carga, get_session() as session:
+            registrar_carga(session, FONTE_SCRAPING, hash_arquivo(caminho))
+            session.commit()
+    return mudou
 
 
 if __name__ == '__main__':
-    df = realizar_web_scraping()
-    if df is not None:
-        salvar_produtos_csv(df)
+    init_db()
+    atualizar_catalogo_web(forcar=True)